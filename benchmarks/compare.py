@@ -0,0 +1,52 @@
+"""Compares two benchmark result files and flags regressions.
+
+    python -m benchmarks.compare benchmarks/results/<old>.json benchmarks/results/<new>.json
+
+Exits with status 1 if any case got slower, or used more peak memory, by more
+than the threshold.
+"""
+
+import argparse
+import json
+import sys
+
+
+def load_results(path: str) -> dict[tuple[str, int], dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        report = json.load(f)
+    return {(result["case"], result["rows"]): result for result in report["results"]}
+
+
+def compare(base: dict[tuple[str, int], dict], new: dict[tuple[str, int], dict], threshold: float) -> list[str]:
+    """Prints a comparison table and returns a description of each regression."""
+    regressions = []
+    print(f"{'case':>9} {'rows':>11} {'seconds':>19} {'change':>8} {'peak MB':>17} {'change':>8}")
+    for key in sorted(base.keys() & new.keys(), key=lambda key: (key[1], key[0])):
+        old, cur = base[key], new[key]
+        time_change = cur["seconds"] / old["seconds"] - 1
+        memory_change = cur["peak_rss_mb"] / old["peak_rss_mb"] - 1
+        print(f"{key[0]:>9} {key[1]:>11,} {old['seconds']:>9.3f}{cur['seconds']:>10.3f} {time_change:>+8.1%} "
+              f"{old['peak_rss_mb']:>8.1f}{cur['peak_rss_mb']:>9.1f} {memory_change:>+8.1%}")
+        if time_change > threshold:
+            regressions.append(f"{key[0]} at {key[1]:,} rows is {time_change:.1%} slower")
+        if memory_change > threshold:
+            regressions.append(f"{key[0]} at {key[1]:,} rows uses {memory_change:.1%} more memory")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative slowdown or memory growth reported as a regression.")
+    args = parser.parse_args()
+
+    regressions = compare(load_results(args.base), load_results(args.new), args.threshold)
+    for regression in regressions:
+        print(f"Regression: {regression}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
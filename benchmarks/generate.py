@@ -0,0 +1,118 @@
+"""Generates synthetic flights.csv and airlines.csv files in the layout of data/."""
+
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+# Same messy headers, in the same order, as data/flights.csv and data/airlines.csv.
+FLIGHTS_COLUMNS = [
+    'airlie_id', 'flght#', 'departure_dt', 'arrival_dt', 'dep_time', 'arrivl_time', 'booking_cd',
+    'passngr_nm', 'seat_no', 'class', 'fare', 'extras', 'loyalty_pts', 'status', 'gate', 'terminal',
+    'baggage_claim', 'duration_hrs', 'layovers', 'layover_locations', 'aircraft_type', 'pilot',
+    'cabin_crew', 'inflight_ent', 'meal_option', 'wifi', 'window_seat', 'aisle_seat',
+    'emergency_exit_row', 'number_of_stops', 'reward_program_member',
+]
+AIRLINES_COLUMNS = ['airlie_id', 'airline_name']
+
+AIRLINES = 20
+CHUNK_ROWS = 100_000
+YEAR_START = np.datetime64('2023-01-01T00:00:00')
+SECONDS_PER_YEAR = 365 * 24 * 3600
+
+
+def _letters(rng: np.random.Generator, n: int, length: int, prefix: str = '') -> np.ndarray:
+    """Random uppercase codes such as 'GateZN', built without a Python loop per row."""
+    codes = rng.integers(ord('A'), ord('Z') + 1, size=(n, length), dtype=np.uint8)
+    codes = codes.view(f'S{length}').ravel().astype(str)
+    if not prefix:
+        # read_csv would parse this code as missing.
+        codes[codes == 'NULL'] = 'NULA'
+        return codes
+    return np.char.add(prefix, codes)
+
+
+def _choice(rng: np.random.Generator, n: int, values: list) -> np.ndarray:
+    return np.asarray(values, dtype=object)[rng.integers(0, len(values), size=n)]
+
+
+def _times(seconds: np.ndarray) -> np.ndarray:
+    """Formats seconds since midnight as HH:MM:SS."""
+    stamps = np.datetime_as_string(np.datetime64('1970-01-01T00:00:00') + seconds.astype('timedelta64[s]'))
+    stamps = stamps.astype('U19')
+    # Keep characters 11-18 of 'YYYY-MM-DDTHH:MM:SS'.
+    return stamps.view('U1').reshape(len(seconds), 19)[:, 11:].copy().view('U8').ravel()
+
+
+def flights_chunk(rng: np.random.Generator, start: int, n: int, missing_rate: float = 0.01) -> pd.DataFrame:
+    """Builds n flight rows with unique flight numbers starting after start."""
+    departure = YEAR_START + rng.integers(0, SECONDS_PER_YEAR, size=n).astype('timedelta64[s]')
+    arrival = departure + rng.integers(3_600, 12 * 3_600, size=n).astype('timedelta64[s]')
+    fare = np.round(rng.uniform(50, 1000, size=n), 2)
+    fare[rng.random(n) < missing_rate] = np.nan
+    loyalty = np.where(rng.random(n) < 0.7, 0, rng.integers(0, 5000, size=n)).astype('float64')
+    loyalty[rng.random(n) < missing_rate] = np.nan
+
+    return pd.DataFrame({
+        'airlie_id': rng.integers(1, AIRLINES + 1, size=n),
+        'flght#': np.arange(start + 1, start + n + 1),
+        # to_csv writes datetimes as 'YYYY-MM-DD HH:MM:SS'.
+        'departure_dt': departure,
+        'arrival_dt': arrival,
+        'dep_time': _times(rng.integers(0, 86_400, size=n)),
+        'arrivl_time': _times(rng.integers(0, 86_400, size=n)),
+        'booking_cd': _letters(rng, n, 4),
+        'passngr_nm': _letters(rng, n, 5, 'Name_'),
+        'seat_no': _letters(rng, n, 3, 'Seat'),
+        'class': _choice(rng, n, ['Economy', 'Business', 'First']),
+        'fare': fare,
+        'extras': _choice(rng, n, ['Extra Baggage', 'Meal', 'No Extras']),
+        # Nullable ints are written without a trailing '.0', as in the source exports.
+        'loyalty_pts': pd.array(loyalty, dtype='Int64'),
+        'status': _choice(rng, n, ['Confirmed', 'Cancelled', 'Pending']),
+        'gate': _letters(rng, n, 2, 'Gate'),
+        'terminal': _choice(rng, n, ['A', 'B', 'C', 'D']),
+        'baggage_claim': _letters(rng, n, 3, 'Claim'),
+        'duration_hrs': np.round(rng.uniform(1, 12, size=n), 2),
+        'layovers': rng.integers(0, 3, size=n),
+        'layover_locations': _letters(rng, n, 3, 'LOC'),
+        'aircraft_type': _letters(rng, n, 3, 'Type'),
+        'pilot': _letters(rng, n, 4, 'Pilot_'),
+        'cabin_crew': _letters(rng, n, 4, 'Crew_'),
+        'inflight_ent': _choice(rng, n, ['Yes', 'No']),
+        'meal_option': _choice(rng, n, ['No Meal', 'Non-Vegetarian', 'Vegan', 'Vegetarian']),
+        'wifi': _choice(rng, n, ['Available', 'Not Available']),
+        'window_seat': _choice(rng, n, [True, False]),
+        'aisle_seat': _choice(rng, n, [True, False]),
+        'emergency_exit_row': _choice(rng, n, [True, False]),
+        'number_of_stops': rng.integers(0, 3, size=n),
+        'reward_program_member': _choice(rng, n, ['Yes', 'No']),
+    }, columns=FLIGHTS_COLUMNS)
+
+
+def generate(data_dir: str, rows: int, seed: int = 0, missing_rate: float = 0.01) -> None:
+    """Writes flights.csv with rows rows and airlines.csv into data_dir.
+
+    The output depends only on rows, seed and missing_rate, and is written chunk
+    by chunk, so memory use does not depend on rows.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    pd.DataFrame({
+        'airlie_id': np.arange(1, AIRLINES + 1),
+        'airline_name': [f'Airline {i}' for i in range(1, AIRLINES + 1)],
+    }, columns=AIRLINES_COLUMNS).to_csv(os.path.join(data_dir, 'airlines.csv'), index=False)
+
+    with open(os.path.join(data_dir, 'flights.csv'), 'w', newline='') as f:
+        for start in range(0, rows, CHUNK_ROWS):
+            chunk = flights_chunk(rng, start, min(CHUNK_ROWS, rows - start), missing_rate)
+            chunk.to_csv(f, index=False, header=start == 0)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate synthetic flight data.")
+    parser.add_argument('data_dir')
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    generate(args.data_dir, args.rows, args.seed)
@@ -0,0 +1,233 @@
+"""Runs the benchmark suite and writes the results as JSON.
+
+Every (case, size) pair runs in a fresh process, so that peak memory is measured
+per case. Gemini is replaced by the stubs in benchmarks.stubs, so runs are
+offline and deterministic.
+
+    python -m benchmarks.run --rows 10000 100000
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Iterable, Iterator
+from unittest.mock import patch
+
+from benchmarks.generate import generate
+
+SIZES = (10_000, 100_000, 1_000_000, 10_000_000)
+CASES = ("extract", "transform", "load", "clean", "analyze")
+DATA_ROOT = os.path.join(".cache", "benchmarks")
+RESULTS_DIR = os.path.join("benchmarks", "results")
+CLEAN_CHUNKSIZE = 100_000
+
+
+class _Timed:
+    """Wraps an iterator and accumulates the time spent producing its items.
+
+    Subtracting it from a consumer's total gives the time spent in the consumer
+    alone, so each pipeline stage can be timed without materializing its input.
+    """
+
+    def __init__(self, iterable: Iterable):
+        self._iterator = iter(iterable)
+        self.seconds = 0.0
+
+    def __iter__(self) -> Iterator:
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            return next(self._iterator)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def _extract(data_dir: str, work_dir: str):
+    from src.etl.extractors.csv_extractor import CsvExtractor
+    from src.etl.watermarks import WatermarkStore
+
+    watermarks = WatermarkStore(os.path.join(work_dir, "watermarks.json"))
+    return CsvExtractor(os.path.join(data_dir, "flights.csv"), source="csv", watermarks=watermarks).extract()
+
+
+def _transform(records: Iterable):
+    from src.etl.transformers.ontology_transformer import OntologyTransformer
+    from benchmarks.stubs import StubSchemaMapper
+
+    return OntologyTransformer(StubSchemaMapper(), batch_size=1000, emit="rows").transform(records)
+
+
+def bench_extract(data_dir: str, work_dir: str) -> dict:
+    start = time.perf_counter()
+    rows = sum(1 for _ in _extract(data_dir, work_dir))
+    return {"seconds": time.perf_counter() - start, "records": rows}
+
+
+def bench_transform(data_dir: str, work_dir: str) -> dict:
+    upstream = _Timed(_extract(data_dir, work_dir))
+    start = time.perf_counter()
+    rows = sum(len(item.rows) if hasattr(item, "rows") else 1 for item in _transform(upstream))
+    return {"seconds": time.perf_counter() - start - upstream.seconds, "records": rows}
+
+
+def bench_load(data_dir: str, work_dir: str) -> dict:
+    from src.etl.loaders.sqlite_loader import FAST_WRITE_PRAGMAS, SqliteLoader
+
+    loader = SqliteLoader(os.path.join(work_dir, "warehouse.db"), pragmas=FAST_WRITE_PRAGMAS)
+    upstream = _Timed(_transform(_extract(data_dir, work_dir)))
+    start = time.perf_counter()
+    loader.load(upstream)
+    seconds = time.perf_counter() - start - upstream.seconds
+    with loader.engine.connect() as connection:
+        rows = connection.exec_driver_sql("SELECT COUNT(*) FROM flights").scalar()
+    return {"seconds": seconds, "records": rows}
+
+
+def bench_clean(data_dir: str, work_dir: str) -> dict:
+    from src import cleaning_agent
+    from benchmarks.stubs import stub_column_mapping
+
+    for name in ("flights.csv", "airlines.csv"):
+        shutil.copy(os.path.join(data_dir, name), work_dir)
+    with patch.object(cleaning_agent, "get_column_mapping_from_gemini", stub_column_mapping):
+        start = time.perf_counter()
+        cleaning_agent.clean_data(data_dir=work_dir, chunksize=CLEAN_CHUNKSIZE)
+        seconds = time.perf_counter() - start
+    return {"seconds": seconds, "chunksize": CLEAN_CHUNKSIZE}
+
+
+def bench_analyze(data_dir: str, work_dir: str) -> dict:
+    """Answers every benchmark question once, against data cleaned beforehand (untimed)."""
+    from src import analysis_agent, cleaning_agent
+    from src.disk_cache import DiskCache
+    from benchmarks.stubs import ANALYSIS_QUESTIONS, stub_column_mapping, stub_llm_client
+
+    for name in ("flights.csv", "airlines.csv"):
+        shutil.copy(os.path.join(data_dir, name), work_dir)
+    with patch.object(cleaning_agent, "get_column_mapping_from_gemini", stub_column_mapping):
+        cleaning_agent.clean_data(data_dir=work_dir, chunksize=CLEAN_CHUNKSIZE)
+
+    with patch.object(analysis_agent, "create_model", stub_llm_client):
+        session = analysis_agent.AnalysisSession(
+            data_dir=work_dir,
+            query_cache=DiskCache(os.path.join(work_dir, "queries")),
+            result_cache=DiskCache(os.path.join(work_dir, "results")),
+        )
+        timings = []
+        for question in ANALYSIS_QUESTIONS:
+            start = time.perf_counter()
+            answer = session.ask(question)
+            timings.append(time.perf_counter() - start)
+            if answer.startswith("Error"):
+                raise RuntimeError(f"{question!r} failed: {answer}")
+    return {"seconds": sum(timings), "questions": len(timings), "first_question_seconds": timings[0]}
+
+
+BENCHMARKS = {
+    "extract": bench_extract,
+    "transform": bench_transform,
+    "load": bench_load,
+    "clean": bench_clean,
+    "analyze": bench_analyze,
+}
+
+
+def _run_case(case: str, rows: int, data_dir: str) -> dict:
+    """Runs one benchmark in the current (fresh) process."""
+    import src.analysis_agent, src.cleaning_agent, src.etl.loaders.sqlite_loader  # noqa: F401 - baseline imports
+
+    baseline = _peak_rss_mb()
+    with tempfile.TemporaryDirectory() as work_dir:
+        # Keep the benchmark's own output away from the repository caches.
+        with patch("src.config.CACHE_DIR", os.path.join(work_dir, "cache")):
+            result = BENCHMARKS[case](data_dir, work_dir)
+    peak = _peak_rss_mb()
+    return {
+        "case": case,
+        "rows": rows,
+        **result,
+        "rows_per_second": rows / result["seconds"] if result["seconds"] else None,
+        "baseline_rss_mb": round(baseline, 1),
+        "peak_rss_mb": round(peak, 1),
+    }
+
+
+def dataset(rows: int, seed: int = 0, root: str = DATA_ROOT) -> str:
+    """Returns a directory holding generated data for rows, generating it on first use."""
+    data_dir = os.path.join(root, f"{rows}-{seed}")
+    marker = os.path.join(data_dir, ".complete")
+    if not os.path.exists(marker):
+        print(f"Generating {rows:,} rows in {data_dir} ...")
+        generate(data_dir, rows, seed)
+        open(marker, "w").close()
+    return data_dir
+
+
+def _git(*args: str) -> str | None:
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes: Iterable[int], cases: Iterable[str], seed: int = 0, data_root: str = DATA_ROOT) -> dict:
+    """Runs every case at every size, each in its own process, and returns the report."""
+    results = []
+    for rows in sizes:
+        data_dir = dataset(rows, seed, data_root)
+        for case in cases:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                result = pool.submit(_run_case, case, rows, data_dir).result()
+            print(f"{case:>9} {rows:>11,} rows: {result['seconds']:8.2f}s "
+                  f"{result['rows_per_second'] or 0:12,.0f} rows/s {result['peak_rss_mb']:8.1f} MB peak")
+            results.append(result)
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "seed": seed,
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the ETL, cleaning and analysis paths.")
+    parser.add_argument("--rows", type=int, nargs="+", default=list(SIZES[:2]),
+                        help=f"Dataset sizes to run, e.g. {' '.join(map(str, SIZES))}.")
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=list(CASES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-root", default=DATA_ROOT, help="Where generated datasets are kept.")
+    parser.add_argument("--output", help="Results file. Defaults to benchmarks/results/<commit>.json.")
+    args = parser.parse_args()
+
+    report = run(args.rows, args.cases, args.seed, args.data_root)
+    output = args.output or os.path.join(RESULTS_DIR, f"{(report['commit'] or 'unknown')[:12]}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Deterministic, offline stand-ins for the Gemini-backed components."""
+
+import json
+from pydantic import BaseModel
+from src.etl.models import Flight
+from src.llm_client import FunctionTransport, LLMClient
+
+# Column mappings Gemini would return for the generated headers.
+ETL_FLIGHT_MAPPING = {
+    'airlie_id': 'airline_id', 'flght#': 'flight_number', 'departure_dt': 'departure_datetime',
+    'arrival_dt': 'arrival_datetime', 'dep_time': 'departure_time', 'arrivl_time': 'arrival_time',
+    'booking_cd': 'booking_code', 'passngr_nm': 'name', 'seat_no': 'seat_number',
+    'class': 'class_of_service', 'fare': 'fare', 'extras': 'extras', 'loyalty_pts': 'loyalty_points',
+    'status': 'status', 'gate': 'gate', 'terminal': 'terminal', 'baggage_claim': 'baggage_claim',
+    'duration_hrs': 'duration_hours', 'layovers': 'layovers', 'layover_locations': 'layover_locations',
+    'aircraft_type': 'aircraft_type', 'pilot': 'pilot', 'cabin_crew': 'cabin_crew',
+    'inflight_ent': 'in_flight_entertainment', 'meal_option': 'meal_option', 'wifi': 'wifi_available',
+    'window_seat': 'window_seat', 'aisle_seat': 'aisle_seat', 'emergency_exit_row': 'emergency_exit_row',
+    'number_of_stops': 'number_of_stops', 'reward_program_member': 'reward_program_member',
+}
+ETL_AIRLINE_MAPPING = {'airlie_id': 'airline_id', 'airline_name': 'name'}
+
+CLEANING_FLIGHT_MAPPING = {
+    'airlie_id': 'airline_id', 'flght#': 'flight_number', 'departure_dt': 'departure_datetime',
+    'arrival_dt': 'arrival_datetime', 'status': 'booking_status', 'class': 'cabin_class', 'fare': 'fare',
+    'loyalty_pts': 'loyalty_points', 'duration_hrs': 'flight_duration_hours', 'window_seat': 'is_window_seat',
+    'aisle_seat': 'is_aisle_seat', 'reward_program_member': 'is_reward_program_member',
+}
+CLEANING_AIRLINE_MAPPING = {'airlie_id': 'airline_id', 'airline_name': 'airline_name'}
+
+# Questions asked of the analysis agent, with the query the stub model answers each with.
+ANALYSIS_QUESTIONS = {
+    "Which airline has the most flights listed?": (
+        "flights_df.merge(airlines_df, on='airline_id')['airline_name'].value_counts().idxmax()",
+        "The airline with the most flights is {result}.",
+    ),
+    "What is the average fare by cabin class?": (
+        "flights_df.groupby('cabin_class')['fare'].mean().round(2).to_dict()",
+        "The average fares are {result}.",
+    ),
+    "What share of bookings are cancelled?": (
+        "round((flights_df['booking_status'] == 'Cancelled').mean() * 100, 2)",
+        "{result}% of bookings are cancelled.",
+    ),
+    "How many loyalty points do reward members hold in total?": (
+        "int(flights_df.loc[flights_df['is_reward_program_member'], 'loyalty_points'].sum())",
+        "Reward members hold {result} loyalty points.",
+    ),
+    "What is the longest flight in hours?": (
+        "flights_df['flight_duration_hours'].max()",
+        "The longest flight takes {result} hours.",
+    ),
+}
+
+
+class StubSchemaMapper:
+    """Returns fixed mappings for the generated headers without calling Gemini."""
+
+    def get_schema_mapping(self, source_columns: list[str], target_schema: type[BaseModel]) -> dict:
+        mapping = ETL_FLIGHT_MAPPING if target_schema is Flight else ETL_AIRLINE_MAPPING
+        return {column: mapping[column] for column in source_columns if column in mapping}
+
+
+def stub_column_mapping(raw_columns: list[str], ideal_schema: dict) -> dict:
+    """Stands in for cleaning_agent.get_column_mapping_from_gemini."""
+    mapping = CLEANING_FLIGHT_MAPPING if 'fare' in ideal_schema else CLEANING_AIRLINE_MAPPING
+    return {column: mapping[column] for column in raw_columns if column in mapping}
+
+
+def stub_analysis_response(prompt: str) -> str:
+    """Answers analysis prompts with the query listed in ANALYSIS_QUESTIONS."""
+    # The prompt's worked example quotes a question too; match only the one asked.
+    asked = prompt.split("Natural Language Question:", 1)[-1].split("`flights_df` Head:", 1)[0]
+    for question, (query, response_template) in ANALYSIS_QUESTIONS.items():
+        if question in asked:
+            return json.dumps({"query": query, "response_template": response_template})
+    return json.dumps({"error": "Unknown benchmark question"})
+
+
+def stub_llm_client() -> LLMClient:
+    """Stands in for analysis_agent.create_model."""
+    return LLMClient(FunctionTransport(stub_analysis_response))
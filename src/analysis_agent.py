@@ -1,8 +1,26 @@
-import pandas as pd
-import google.generativeai as genai
-import json
+from __future__ import annotations
+
+import os
+import re
+import sqlite3
+import time
+from typing import TYPE_CHECKING
+from urllib.parse import quote
 from dotenv import load_dotenv
-from .config import GEMINI_MODEL, GEMINI_API_KEY
+from . import config
+from .config import GEMINI_MODEL
+from .columnar_store import categorize, decategorize, manifest_path, read_columnar, store_exists
+from .disk_cache import DiskCache, get_query_cache, get_result_cache
+from .lazy import lazy_import
+
+if TYPE_CHECKING:
+    from .llm_client import LLMClient
+
+# Loaded on first use, so that cached answers are returned without importing
+# pandas or the LLM client.
+pd = lazy_import("pandas")
+llm_client = lazy_import("src.llm_client")
+query_executor = lazy_import("src.query_executor")
 
 load_dotenv()
 
@@ -18,6 +36,20 @@ BLOCKED_KEYWORDS = {
     "subprocess",
 }
 
+# Words that do not change what a question asks for.
+FILLER_WORDS = {"please", "the", "a", "an"}
+
+
+def normalize_question(question: str) -> str:
+    """Reduces a question to a canonical form so trivial rephrasings share cache entries."""
+    words = re.findall(r"[a-z0-9_]+", question.lower())
+    return " ".join(word for word in words if word not in FILLER_WORDS)
+
+
+def schema_fingerprint(*dfs: pd.DataFrame) -> str:
+    """Hashes the column names and dtypes of the given DataFrames."""
+    return DiskCache.make_key([[(str(col), str(dtype)) for col, dtype in df.dtypes.items()] for df in dfs])
+
 
 def is_query_safe(query: str) -> bool:
     """Checks if the generated query is safe to execute."""
@@ -32,12 +64,20 @@ def is_query_safe(query: str) -> bool:
     return True
 
 
+def create_model() -> LLMClient:
+    """Returns the shared LLM client for the analysis model."""
+    return llm_client.get_client(GEMINI_MODEL)
+
+
 def get_analysis_from_gemini(
-    question: str, flights_df_head: str, airlines_df_head: str
+    question: str,
+    flights_df_head: str,
+    airlines_df_head: str,
+    model: LLMClient | None = None,
 ) -> dict:
     """Gets a pandas query and a response template from Gemini."""
-    genai.configure(api_key=GEMINI_API_KEY)
-    model = genai.GenerativeModel(GEMINI_MODEL)
+    if model is None:
+        model = create_model()
 
     prompt = f"""
     You are a data analysis expert. Given a natural language question and the heads of two pandas DataFrames
@@ -69,41 +109,517 @@ def get_analysis_from_gemini(
     Generate only the JSON object. 
     """
 
-    response = model.generate_content(prompt)
-    cleaned_response = response.text.strip().replace("```json", "").replace("```", "")
-    return json.loads(cleaned_response)
+    return model.generate_json(prompt)
 
 
-def analyze_question(question: str):
-    """Analyzes a question and returns the answer."""
-    try:
-        flights_df = pd.read_csv("data/cleaned_flights.csv")
-        airlines_df = pd.read_csv("data/cleaned_airlines.csv")
-    except FileNotFoundError as e:
-        return f"Error reading data files: {e}"
+def get_sql_from_gemini(
+    question: str,
+    warehouse_schema: str,
+    model: LLMClient | None = None,
+) -> dict:
+    """Gets a read-only SQLite query and a response template from Gemini."""
+    if model is None:
+        model = create_model()
 
-    flights_df_head = flights_df.head().to_string()
-    airlines_df_head = airlines_df.head().to_string()
+    prompt = f"""
+    You are a data analysis expert. Given a natural language question and the schema of a SQLite
+    database, generate a JSON object with two keys:
+    1.  `sql`: A single read-only SQLite SELECT statement that computes the answer.
+    2.  `response_template`: A natural language string with a placeholder `{{result}}` where the answer should be inserted.
 
-    analysis = get_analysis_from_gemini(question, flights_df_head, airlines_df_head)
-    if "error" in analysis:
-        return f"Error: {analysis['error']}"
+    Let the database do the work: aggregate and filter in SQL and return only the rows needed for the answer.
+    Prefer the summary tables (flight_status_counts, class_fare_stats, loyalty_points_by_membership)
+    over scanning `flights` whenever they hold what the question needs.
+    Query the `flights` view, not the `flight_facts` and `lookup_*` tables it is built from.
 
-    query = analysis.get("query")
-    response_template = analysis.get("response_template")
+    Natural Language Question:
+    {question}
 
-    print("--- Generated Query ---")
-    print(query)
-    print("-----------------------")
+    Database schema and sample rows:
+    ```
+    {warehouse_schema}
+    ```
 
-    if not is_query_safe(query):
-        return "Error: The generated query is not allowed for security reasons."
+    Example for "Which airline has the most flights listed?":
+    {{
+        "sql": "SELECT a.name FROM flights f JOIN airlines a ON a.airline_id = f.airline_id GROUP BY a.airline_id ORDER BY COUNT(*) DESC LIMIT 1",
+        "response_template": "The airline with the most flights is {{result}}."
+    }}
+    For queries that don't relate to the database, send an appropriate error response.
+    example: {{"error: "Response message"}}
 
+    Generate only the JSON object.
+    """
+
+    return model.generate_json(prompt)
+
+
+# Dashboard questions answered from the summary tables SqliteLoader maintains,
+# as (pattern over the whole normalized question, SQL, response template). The
+# patterns are matched in full, so a question adding a filter (an airline, a
+# date, a status, a membership) is left to Gemini rather than answered unfiltered.
+SUMMARY_QUESTIONS = [
+    (
+        r"(which|what) airline (has|had|operates) most flights( listed| overall| in total)?",
+        "SELECT COALESCE(a.name, s.airline_id) FROM flight_status_counts s "
+        "LEFT JOIN airlines a ON a.airline_id = s.airline_id "
+        "GROUP BY s.airline_id ORDER BY SUM(s.flights) DESC LIMIT 1",
+        "The airline with the most flights is {result}.",
+    ),
+    (
+        r"((how many|number of) )?flights (per|by|for each|for every) airline"
+        r"|how many flights (does each airline (have|operate)|each airline (has|operates))",
+        "SELECT COALESCE(a.name, s.airline_id) AS airline, SUM(s.flights) AS flights "
+        "FROM flight_status_counts s LEFT JOIN airlines a ON a.airline_id = s.airline_id "
+        "GROUP BY s.airline_id ORDER BY flights DESC",
+        "Flights per airline:\n{result}",
+    ),
+    (
+        r"((what is|what s|what are|show) )?cancell?ation rates?( (per|by|for each|for every) airline)?",
+        "SELECT COALESCE(a.name, s.airline_id) AS airline, "
+        "ROUND(100.0 * SUM(CASE WHEN s.status = 'Cancelled' THEN s.flights ELSE 0 END) / SUM(s.flights), 2) "
+        "AS cancellation_rate_pct "
+        "FROM flight_status_counts s LEFT JOIN airlines a ON a.airline_id = s.airline_id "
+        "GROUP BY s.airline_id ORDER BY cancellation_rate_pct DESC",
+        "Cancellation rate by airline (%):\n{result}",
+    ),
+    (
+        r"((what is|what s|what are|show) )?average fares? (per|by|for each|for every) (cabin )?class( of service)?",
+        "SELECT class_of_service, ROUND(fare_sum / fare_count, 2) AS average_fare "
+        "FROM class_fare_stats WHERE fare_count > 0 ORDER BY average_fare DESC",
+        "Average fare by class:\n{result}",
+    ),
+    (
+        r"((what are|what is|show) )?(average )?loyalty points (per|by) (reward (program )?)?membership",
+        "SELECT CASE reward_program_member WHEN 1 THEN 'member' ELSE 'non-member' END AS reward_program, "
+        "ROUND(1.0 * points_sum / points_count, 2) AS average_loyalty_points "
+        "FROM loyalty_points_by_membership WHERE points_count > 0 ORDER BY reward_program_member DESC",
+        "Average loyalty points by reward program membership:\n{result}",
+    ),
+    (
+        r"how many flights( are there| in total| total)?",
+        "SELECT COALESCE(SUM(flights), 0) FROM flight_status_counts",
+        "There are {result} flights.",
+    ),
+]
+
+
+def match_summary_question(question: str) -> tuple[str, str] | None:
+    """Returns the (SQL, response template) answering a question from the summary tables, if any."""
+    normalized = normalize_question(question)
+    for pattern, sql, response_template in SUMMARY_QUESTIONS:
+        if re.fullmatch(pattern, normalized):
+            return sql, response_template
+    return None
+
+
+def is_sql_safe(sql: str) -> bool:
+    """Checks that the generated SQL is a single SELECT (or WITH ... SELECT) statement."""
+    statement = sql.strip().rstrip(";").strip()
+    if not statement or ";" in statement:
+        return False
+    first_word = statement.split(None, 1)[0].lower()
+    return first_word in ("select", "with")
+
+
+def connect_readonly(db_path: str) -> sqlite3.Connection:
+    """Opens a SQLite database that cannot be written through this connection."""
+    conn = sqlite3.connect(f"file:{quote(os.path.abspath(db_path))}?mode=ro", uri=True)
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+def run_readonly_query(
+    db_path: str,
+    sql: str,
+    max_rows: int = config.SQL_MAX_ROWS,
+    timeout_seconds: float = config.SQL_TIMEOUT_SECONDS,
+) -> tuple[list[str], list[tuple], bool]:
+    """Runs a query on a read-only connection with row and time limits.
+
+    Returns:
+        The column names, at most max_rows rows, and whether rows were cut off.
+
+    Raises:
+        sqlite3.OperationalError: If the query fails or runs longer than timeout_seconds.
+    """
+    conn = connect_readonly(db_path)
     try:
+        deadline = time.monotonic() + timeout_seconds
+        # A non-zero return from the handler interrupts the running statement.
+        conn.set_progress_handler(lambda: int(time.monotonic() > deadline), 1000)
+        cursor = conn.execute(sql)
+        rows = cursor.fetchmany(max_rows + 1)
+        columns = [description[0] for description in cursor.description or ()]
+    finally:
+        conn.close()
+    return columns, rows[:max_rows], len(rows) > max_rows
+
+
+def format_sql_result(columns: list[str], rows: list[tuple]) -> object:
+    """Renders a query result: a single value as itself, anything else as a table."""
+    if len(rows) == 1 and len(columns) == 1:
+        return rows[0][0]
+    return pd.DataFrame(rows, columns=columns).to_string(index=False)
+
+
+def _fingerprint_key(data_version: str) -> str:
+    return DiskCache.make_key("schema_fingerprint", data_version)
+
+
+class AnalysisSession:
+    """Answers questions against cleaned data that is loaded once and kept warm.
+
+    The DataFrames, their head previews and the Gemini model are reused across
+    questions. Generated queries are evaluated by a QueryExecutor, whose worker
+    processes share the loaded frames and run each query under the time, CPU
+    and memory limits from config; with query_workers=0 they are evaluated in
+    this process instead. Columnar stores written by the cleaning agent are preferred over
+    CSV, as they are memory-mapped and keep their dtypes; low-cardinality string
+    columns of CSV files are converted to categories. Queries see those columns
+    decoded to plain values. The data is re-read only when its modification
+    time or size changes.
+
+    Answers are cached at two levels. The generated query and response template
+    are keyed by the normalized question and the schema fingerprint, so they
+    survive data reloads. The rendered answer is additionally keyed by the data
+    version, so it is reused only until the cleaned files change.
+    """
+
+    def __init__(
+        self,
+        data_dir: str = "data",
+        query_cache: DiskCache | None = None,
+        result_cache: DiskCache | None = None,
+        query_workers: int = config.QUERY_WORKERS,
+    ):
+        self.data_dir = data_dir
+        self.query_workers = query_workers
+        self.query_cache = query_cache if query_cache is not None else get_query_cache()
+        self.result_cache = result_cache if result_cache is not None else get_result_cache()
+        self.schema_fingerprint = ""
+        self.data_version = ""
+        self.flights_df: pd.DataFrame | None = None
+        self.airlines_df: pd.DataFrame | None = None
+        self.flights_df_head = ""
+        self.airlines_df_head = ""
+        self._signature = None
+        self._model = None
+        self._executor = None
+        self._eval_frames = None
+
+    @property
+    def model(self) -> LLMClient:
+        if self._model is None:
+            self._model = create_model()
+        return self._model
+
+    def _source(self, name: str) -> tuple[str, str]:
+        """Returns the path to stat and the path to load for a cleaned dataset."""
+        store_path = os.path.join(self.data_dir, f"{name}.cols")
+        if store_exists(store_path):
+            # The manifest is written last, so it changes whenever the store does.
+            return manifest_path(store_path), store_path
+        csv_path = os.path.join(self.data_dir, f"{name}.csv")
+        return csv_path, csv_path
+
+    def _file_signature(self) -> tuple:
+        signature = []
+        for name in ("cleaned_flights", "cleaned_airlines"):
+            stat_path, path = self._source(name)
+            stat = os.stat(stat_path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    @staticmethod
+    def _load(path: str) -> pd.DataFrame:
+        if path.endswith(".cols"):
+            return read_columnar(path)
+        return categorize(pd.read_csv(path))
+
+    def refresh(self) -> None:
+        """Loads the cleaned data if it is new or has changed since the last load."""
+        signature = self._file_signature()
+        if signature == self._signature:
+            return
+        self.flights_df = self._load(signature[0][0])
+        self.airlines_df = self._load(signature[1][0])
+        self._eval_frames = None
+        self.flights_df_head = self.flights_df.head().to_string()
+        self.airlines_df_head = self.airlines_df.head().to_string()
+        self.schema_fingerprint = schema_fingerprint(self.flights_df, self.airlines_df)
+        self.data_version = DiskCache.make_key(signature)
+        self._signature = signature
+        if self.query_workers > 0:
+            # Started now, so the workers load the frames while Gemini writes the query.
+            self.close()
+            self._executor = query_executor.QueryExecutor(
+                {"flights_df": self.flights_df, "airlines_df": self.airlines_df}, workers=self.query_workers
+            )
+        # Lets later sessions find cached answers for this data without loading it.
+        self.result_cache.set(_fingerprint_key(self.data_version), self.schema_fingerprint)
+
+    def _cache_keys(self, normalized: str, fingerprint: str, data_version: str) -> tuple[str, str]:
+        query_key = DiskCache.make_key(normalized, fingerprint, GEMINI_MODEL)
+        return query_key, DiskCache.make_key(query_key, data_version)
+
+    def ask(self, question: str) -> str:
+        """Analyzes a question and returns the answer."""
+        normalized = normalize_question(question)
+        try:
+            signature = self._file_signature()
+        except FileNotFoundError as e:
+            return f"Error reading data files: {e}"
+        if signature != self._signature:
+            # Answer from the cache, if possible, before paying for a load.
+            data_version = DiskCache.make_key(signature)
+            fingerprint = self.result_cache.get(_fingerprint_key(data_version))
+            if fingerprint is not None:
+                answer = self.result_cache.get(self._cache_keys(normalized, fingerprint, data_version)[1])
+                if answer is not None:
+                    return answer
+
+        try:
+            self.refresh()
+        except FileNotFoundError as e:
+            return f"Error reading data files: {e}"
+
+        query_key, result_key = self._cache_keys(normalized, self.schema_fingerprint, self.data_version)
+        answer = self.result_cache.get(result_key)
+        if answer is not None:
+            return answer
+
+        analysis = self.query_cache.get(query_key)
+        generated = analysis is None
+        if generated:
+            analysis = get_analysis_from_gemini(
+                question, self.flights_df_head, self.airlines_df_head, model=self.model
+            )
+            if "error" in analysis:
+                return f"Error: {analysis['error']}"
+
+        query = analysis.get("query")
+        response_template = analysis.get("response_template")
+
+        print("--- Generated Query ---")
+        print(query)
+        print("-----------------------")
+
+        if not is_query_safe(query):
+            return "Error: The generated query is not allowed for security reasons."
+        if generated:
+            self.query_cache.set(query_key, analysis)
+
+        try:
+            answer = response_template.format(result=self._evaluate(query))
+        except Exception as e:
+            return f"Error executing query: {e}"
+        self.result_cache.set(result_key, answer)
+        return answer
+
+    def _evaluate(self, query: str) -> object:
+        if self._executor is not None:
+            return self._executor.run(query)
+        if self._eval_frames is None:
+            # Decoded once per load. The query workers keep the categories shared and
+            # answer as plain columns would; one copy in this process is cheaper.
+            self._eval_frames = {"flights_df": decategorize(self.flights_df),
+                                 "airlines_df": decategorize(self.airlines_df)}
         # We are using eval here, but the guardrail should prevent malicious code.
-        result = eval(
-            query, {"flights_df": flights_df, "airlines_df": airlines_df, "pd": pd}
+        return eval(query, {**self._eval_frames, "pd": pd})
+
+    def close(self) -> None:
+        """Stops the session's query workers, if any."""
+        if self._executor is not None:
+            self._executor.close()
+            self._executor = None
+
+
+class SqlAnalysisSession:
+    """Answers questions with SQL run inside the ETL warehouse.
+
+    Aggregations and filters are pushed down to SQLite, so only the result rows
+    reach Python. Queries run on a read-only connection with the row and time
+    limits from config. Dashboard questions matching SUMMARY_QUESTIONS are read
+    straight from the summary tables without calling Gemini. Generated SQL and
+    answers use the same two-level cache as AnalysisSession, keyed on the
+    warehouse schema and file signature.
+    """
+
+    def __init__(
+        self,
+        db_path: str = config.WAREHOUSE_PATH,
+        max_rows: int = config.SQL_MAX_ROWS,
+        timeout_seconds: float = config.SQL_TIMEOUT_SECONDS,
+        query_cache: DiskCache | None = None,
+        result_cache: DiskCache | None = None,
+    ):
+        self.db_path = db_path
+        self.max_rows = max_rows
+        self.timeout_seconds = timeout_seconds
+        self.query_cache = query_cache if query_cache is not None else get_query_cache()
+        self.result_cache = result_cache if result_cache is not None else get_result_cache()
+        self.has_summaries = False
+        self.schema_fingerprint = ""
+        self.data_version = ""
+        self._statements: list[tuple] = []
+        self._warehouse_schema: str | None = None
+        self._signature = None
+        self._model = None
+
+    @property
+    def model(self) -> LLMClient:
+        if self._model is None:
+            self._model = create_model()
+        return self._model
+
+    @property
+    def warehouse_schema(self) -> str:
+        """The schema and a few sample rows per table, as shown to Gemini.
+
+        Built on first use, since cached and summary answers never need it.
+        """
+        if self._warehouse_schema is None:
+            sections = [sql for _, _, sql in self._statements]
+            conn = connect_readonly(self.db_path)
+            try:
+                for name, kind, _ in self._statements:
+                    if kind in ("table", "view"):
+                        cursor = conn.execute(f'SELECT * FROM "{name}" LIMIT 3')
+                        columns = [description[0] for description in cursor.description]
+                        sample = pd.DataFrame(cursor.fetchall(), columns=columns).to_string(index=False)
+                        sections.append(f"-- sample rows from {name}\n{sample}")
+            finally:
+                conn.close()
+            self._warehouse_schema = "\n\n".join(sections)
+        return self._warehouse_schema
+
+    def _file_signature(self) -> tuple:
+        signature = []
+        # Committed rows may sit in the WAL until a checkpoint, so it counts too.
+        for path in (self.db_path, f"{self.db_path}-wal"):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                if path == self.db_path:
+                    raise
+                continue
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def refresh(self) -> None:
+        """Reads the warehouse schema if the database has changed."""
+        signature = self._file_signature()
+        if signature == self._signature:
+            return
+        conn = connect_readonly(self.db_path)
+        try:
+            statements = conn.execute(
+                "SELECT name, type, sql FROM sqlite_master "
+                "WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' ORDER BY type DESC, name"
+            ).fetchall()
+        finally:
+            conn.close()
+        self._statements = statements
+        self._warehouse_schema = None
+        tables = {name for name, kind, _ in statements if kind == "table"}
+        self.has_summaries = {"flight_status_counts", "class_fare_stats", "loyalty_points_by_membership"} <= tables
+        self.schema_fingerprint = DiskCache.make_key([sql for _, _, sql in statements])
+        self.data_version = DiskCache.make_key(signature)
+        self._signature = signature
+
+    def ask(self, question: str) -> str:
+        """Analyzes a question with SQL and returns the answer."""
+        try:
+            self.refresh()
+        except (FileNotFoundError, sqlite3.Error) as e:
+            return f"Error reading the warehouse: {e}"
+
+        summary = match_summary_question(question) if self.has_summaries else None
+        if summary is not None:
+            try:
+                return self._run(*summary)
+            except sqlite3.Error as e:
+                return f"Error executing query: {e}"
+
+        normalized = normalize_question(question)
+        query_key = DiskCache.make_key("sql", normalized, self.schema_fingerprint, GEMINI_MODEL)
+        result_key = DiskCache.make_key(query_key, self.data_version)
+        answer = self.result_cache.get(result_key)
+        if answer is not None:
+            return answer
+
+        analysis = self.query_cache.get(query_key)
+        generated = analysis is None
+        if generated:
+            analysis = get_sql_from_gemini(question, self.warehouse_schema, model=self.model)
+            if "error" in analysis:
+                return f"Error: {analysis['error']}"
+
+        sql = analysis.get("sql")
+        response_template = analysis.get("response_template")
+
+        print("--- Generated SQL ---")
+        print(sql)
+        print("---------------------")
+
+        if not is_sql_safe(sql):
+            return "Error: Only a single read-only SELECT statement is allowed."
+        if generated:
+            self.query_cache.set(query_key, analysis)
+
+        try:
+            answer = self._run(sql, response_template)
+        except sqlite3.Error as e:
+            return f"Error executing query: {e}"
+        self.result_cache.set(result_key, answer)
+        return answer
+
+    def _run(self, sql: str, response_template: str) -> str:
+        """Runs a query within the session's limits and renders the answer."""
+        columns, rows, truncated = run_readonly_query(
+            self.db_path, sql, max_rows=self.max_rows, timeout_seconds=self.timeout_seconds
         )
-        return response_template.format(result=result)
-    except Exception as e:
-        return f"Error executing query: {e}"
+        answer = response_template.format(result=format_sql_result(columns, rows))
+        if truncated:
+            answer += f"\n(Showing the first {self.max_rows} rows.)"
+        return answer
+
+
+def analyze_question(question: str, backend: str = "pandas"):
+    """Analyzes a question and returns the answer.
+
+    Args:
+        question: The natural language question.
+        backend: 'pandas' evaluates a pandas expression over the cleaned data;
+            'sql' runs a SQL query inside the ETL warehouse.
+    """
+    if backend == "sql":
+        return SqlAnalysisSession().ask(question)
+    session = AnalysisSession()
+    try:
+        return session.ask(question)
+    finally:
+        session.close()
+
+
+def repl(session: AnalysisSession | SqlAnalysisSession | None = None) -> None:
+    """Answers questions interactively until 'exit', 'quit' or end of input."""
+    session = session or AnalysisSession()
+    print("Ask a question about the flight data ('exit' to quit).")
+    while True:
+        try:
+            question = input("> ").strip()
+        except (EOFError, KeyboardInterrupt):
+            print()
+            return
+        if question.lower() in ("exit", "quit"):
+            return
+        if question:
+            print(session.ask(question))
+
+
+if __name__ == "__main__":
+    import sys
+
+    repl(SqlAnalysisSession() if "--sql" in sys.argv[1:] else None)
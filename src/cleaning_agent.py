@@ -1,13 +1,16 @@
 """Module for cleaning flight and airline data."""
 
 import os
-import json
+from typing import Iterable, Iterator
+import numpy as np
 import pandas as pd
-import google.generativeai as genai
 from src import config
+from src.columnar_store import ColumnarWriter, categorize, low_cardinality_columns
+from src.disk_cache import get_mapping_cache, mapping_cache_key
+from src.llm_client import get_client
 
 def get_column_mapping_from_gemini(raw_columns: list[str], ideal_schema: dict) -> dict:
-    """Gets column mapping from Gemini API.
+    """Gets column mapping from the on-disk mapping cache, falling back to the Gemini API.
 
     Args:
         raw_columns: A list of raw column names from the DataFrame.
@@ -16,8 +19,11 @@ def get_column_mapping_from_gemini(raw_columns: list[str], ideal_schema: dict) -
     Returns:
         A dictionary mapping raw column names to ideal column names.
     """
-    genai.configure(api_key=config.GEMINI_API_KEY)
-    model = genai.GenerativeModel(config.GEMINI_MODEL)
+    cache = get_mapping_cache()
+    cache_key = mapping_cache_key(raw_columns, list(ideal_schema.keys()), config.GEMINI_MODEL)
+    cached_mapping = cache.get(cache_key)
+    if cached_mapping is not None:
+        return cached_mapping
 
     prompt = f"""
     You are a data mapping expert. Given a list of raw column names and an target schema,
@@ -41,61 +47,201 @@ def get_column_mapping_from_gemini(raw_columns: list[str], ideal_schema: dict) -
     ```
     """
 
-    response = model.generate_content(prompt)
-    # Clean the response to extract only the JSON part
-    cleaned_response = response.text.strip().replace("```json", "").replace("```", "")
-    return json.loads(cleaned_response)
+    mapping = get_client(config.GEMINI_MODEL).generate_json(prompt)
+    cache.set(cache_key, mapping)
+    return mapping
 
-def clean_data(data_dir: str = 'data') -> None:
+# Strings (compared lowercased) that clean to True in bool columns; anything else is False.
+TRUE_STRINGS = {"true", "yes"}
+
+
+def _median_from_counts(counts: pd.Series) -> float:
+    """Returns the exact median of the values described by a value -> count Series."""
+    counts = counts.sort_index()
+    cumulative = counts.cumsum().to_numpy()
+    total = cumulative[-1]
+    values = counts.index.to_numpy()
+    # Positions of the lower and upper middle values in the sorted data.
+    lower = values[np.searchsorted(cumulative, (total - 1) // 2, side="right")]
+    upper = values[np.searchsorted(cumulative, total // 2, side="right")]
+    return (lower + upper) / 2
+
+
+def compute_fill_values(chunks: Iterable[pd.DataFrame], schema: dict) -> dict:
+    """First pass: computes the value used to fill missing entries of each column.
+
+    Float columns are filled with their exact mean and int columns with their exact
+    median, accumulated from running sums and value counts so that only one chunk
+    is in memory at a time. Other columns are filled with "Unknown".
+    """
+    sums = {col: 0.0 for col, dtype in schema.items() if dtype == "float64"}
+    counts = {col: 0 for col in sums}
+    value_counts = {col: pd.Series(dtype="float64") for col, dtype in schema.items() if dtype == "int64"}
+    for chunk in chunks:
+        for col in sums:
+            values = pd.to_numeric(chunk[col], errors="coerce")
+            sums[col] += values.sum()
+            counts[col] += values.count()
+        for col in value_counts:
+            chunk_counts = pd.to_numeric(chunk[col], errors="coerce").value_counts()
+            value_counts[col] = value_counts[col].add(chunk_counts, fill_value=0)
+
+    fill_values = {col: "Unknown" for col in schema}
+    for col in sums:
+        fill_values[col] = sums[col] / counts[col] if counts[col] else np.nan
+    for col, col_counts in value_counts.items():
+        fill_values[col] = _median_from_counts(col_counts) if len(col_counts) else np.nan
+    return fill_values
+
+
+def to_bool(values: pd.Series) -> pd.Series:
+    """Vectorized bool coercion: each distinct value is checked once, not each row.
+
+    clean_data reads bool columns as categories, so the distinct values come from
+    the parser and only the codes are looked up per row. Other columns are
+    factorized first; values that compare equal, such as 1 and True, are checked
+    as one.
+    """
+    if values.dtype == bool:
+        return values
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        codes, uniques = pd.factorize(values)
+    truth = np.array([str(value).lower() in TRUE_STRINGS for value in uniques] + [False])
+    # Missing values get code -1, which indexes the trailing False.
+    return pd.Series(truth[codes], index=values.index, name=values.name)
+
+
+def clean_chunk(df: pd.DataFrame, schema: dict, fill_values: dict) -> tuple[pd.DataFrame, dict]:
+    """Second pass: fills missing values and coerces a chunk to the schema dtypes.
+
+    Returns:
+        The cleaned chunk and, per column, the number of present values that could
+        not be converted to the column's dtype. Those are filled like missing values.
+    """
+    cleaned = {}
+    failures = {}
+    for col, dtype in schema.items():
+        values = df[col]
+        if dtype in ("int64", "float64"):
+            converted = pd.to_numeric(values, errors="coerce")
+            failures[col] = int((converted.isna() & values.notna()).sum())
+            converted = converted.fillna(fill_values[col])
+            if dtype == "int64" and converted.isna().any():
+                raise ValueError(f"Column {col} has no values to compute a fill value from")
+            cleaned[col] = converted.astype(dtype)
+        elif dtype == "datetime64[ns]":
+            converted = pd.to_datetime(values, errors="coerce")
+            failures[col] = int((converted.isna() & values.notna()).sum())
+            cleaned[col] = converted.astype(dtype)
+        elif dtype == "bool":
+            cleaned[col] = to_bool(values)
+        else:
+            cleaned[col] = values.fillna(fill_values[col]).astype(dtype)
+    return pd.DataFrame(cleaned, index=df.index), failures
+
+
+def save_cleaned(df: pd.DataFrame, data_dir: str, name: str, export_csv: bool = False) -> None:
+    """Saves a cleaned DataFrame as a typed columnar store, optionally also as CSV.
+
+    Args:
+        df: The cleaned DataFrame.
+        data_dir: The directory where cleaned data files are stored.
+        name: The base name of the output, e.g. 'cleaned_flights'.
+        export_csv: Also write '<name>.csv'.
+    """
+    save_cleaned_chunks([df], data_dir, name, export_csv)
+
+
+def save_cleaned_chunks(chunks: Iterable[pd.DataFrame], data_dir: str, name: str, export_csv: bool = False) -> None:
+    """Appends cleaned chunks to a columnar store, and optionally a CSV, as they arrive."""
+    store_path = os.path.join(data_dir, f'{name}.cols')
+    csv_path = os.path.join(data_dir, f'{name}.csv')
+    with ColumnarWriter(store_path) as writer:
+        for i, chunk in enumerate(chunks):
+            writer.append(chunk)
+            if export_csv:
+                chunk.to_csv(csv_path, index=False, mode='w' if i == 0 else 'a', header=i == 0)
+    print(f"Cleaned data saved to {store_path}")
+    if export_csv:
+        print(f"Cleaned data exported to {csv_path}")
+
+
+def clean_data(data_dir: str = 'data', export_csv: bool = False, chunksize: int | None = None) -> None:
     """Reads, cleans, and saves flight and airline data.
 
     Args:
         data_dir: The directory where raw and cleaned data files are stored.
+        export_csv: Also export the cleaned data as CSV next to the columnar stores.
+        chunksize: Clean flights in two streaming passes over chunks of this many
+            rows, so memory stays bounded for files larger than RAM. None reads the
+            whole file at once.
     """
     print("\n--- Cleaning Flights Data ---")
+    flights_path = os.path.join(data_dir, 'flights.csv')
     try:
-        df = pd.read_csv(os.path.join(data_dir, 'flights.csv'))
+        raw_columns = pd.read_csv(flights_path, nrows=0).columns.tolist()
     except FileNotFoundError as e:
         print(f"Error reading flights data file: {e}")
         return
 
     ideal_schema = config.IDEAL_FLIGHTS_SCHEMA
 
-    raw_columns = df.columns.tolist()
     column_mapping = get_column_mapping_from_gemini(raw_columns, ideal_schema)
 
     print(f"Generated Column Mapping: {column_mapping}")
 
-    df.rename(columns=column_mapping, inplace=True)
+    # Read only the mapped columns, renamed to the ideal schema
+    source_columns = {target: source for source, target in column_mapping.items() if target in ideal_schema}
 
-    # Keep only the columns from the ideal schema
-    df = df[list(ideal_schema.keys())]
+    def read_chunks(columns: list[str]) -> Iterator[pd.DataFrame]:
+        chunks = pd.read_csv(
+            flights_path,
+            usecols=[source_columns[col] for col in columns],
+            chunksize=chunksize,
+            # The C parser creates one string per distinct value of a category
+            # column, so to_bool only has to look up codes.
+            dtype={source_columns[col]: "category" for col in columns if ideal_schema[col] == "bool"},
+        )
+        for chunk in ([chunks] if chunksize is None else chunks):
+            yield chunk.rename(columns={source: target for target, source in source_columns.items()})[columns]
 
-    # Handle missing values (simple fillna for now)
-    for col in df.columns:
-        if df[col].dtype == "float64":
-            df[col] = df[col].fillna(df[col].mean())
-        elif df[col].dtype == "int64":
-            df[col] = df[col].fillna(df[col].median()).astype('int64')
-        else:
-            df[col] = df[col].fillna("Unknown")
+    if chunksize is None:
+        df = next(read_chunks(list(ideal_schema)))
+        fill_values = compute_fill_values([df], ideal_schema)
+        chunks = [df]
+    else:
+        # The statistics pass only needs the numeric columns.
+        numeric_schema = {col: dtype for col, dtype in ideal_schema.items() if dtype in ("int64", "float64")}
+        fill_values = compute_fill_values(read_chunks(list(numeric_schema)), numeric_schema)
+        fill_values = {col: fill_values.get(col, "Unknown") for col in ideal_schema}
+        chunks = read_chunks(list(ideal_schema))
 
-    print("Missing values handled.")
+    print("Fill values computed.")
 
-    # Correct data types
-    for col, dtype in ideal_schema.items():
-        if dtype == "datetime64[ns]":
-            df[col] = pd.to_datetime(df[col], errors="coerce")
-        elif dtype == "bool":
-            df[col] = df[col].apply(lambda x: str(x).lower() in ["true", "yes"])
-        else:
-            df[col] = df[col].astype(dtype, errors="ignore")
+    failures = dict.fromkeys(ideal_schema, 0)
+    categorical = None
 
-    print("Data types corrected.")
+    def cleaned_chunks() -> Iterator[pd.DataFrame]:
+        nonlocal categorical
+        for chunk in chunks:
+            cleaned, chunk_failures = clean_chunk(chunk, ideal_schema, fill_values)
+            for col, count in chunk_failures.items():
+                failures[col] += count
+            if categorical is None:
+                # Decided from the first chunk, so every chunk is stored with the same dtypes.
+                categorical = low_cardinality_columns(cleaned)
+            yield categorize(cleaned, categorical)
 
-    # Save the cleaned data
-    df.to_csv(os.path.join(data_dir, 'cleaned_flights.csv'), index=False)
-    print(f"Cleaned flights data saved to {os.path.join(data_dir, 'cleaned_flights.csv')}")
+    save_cleaned_chunks(cleaned_chunks(), data_dir, 'cleaned_flights', export_csv)
+    if categorical:
+        print(f"Stored as categories: {', '.join(categorical)}")
+
+    for col, count in failures.items():
+        if count:
+            print(f"Warning: {count} values in {col} could not be converted to {ideal_schema[col]}.")
+    print("Missing values handled and data types corrected.")
 
     print("\n--- Cleaning Airlines Data ---")
     try:
@@ -117,8 +263,7 @@ def clean_data(data_dir: str = 'data') -> None:
     airlines_df = airlines_df[list(ideal_airlines_schema.keys())]
 
     # Save the cleaned data
-    airlines_df.to_csv(os.path.join(data_dir, 'cleaned_airlines.csv'), index=False)
-    print(f"Cleaned airlines data saved to {os.path.join(data_dir, 'cleaned_airlines.csv')}")
+    save_cleaned(categorize(airlines_df), data_dir, 'cleaned_airlines', export_csv)
 
 
 if __name__ == "__main__":
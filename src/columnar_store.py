@@ -0,0 +1,270 @@
+"""Typed, memory-mapped columnar storage for cleaned DataFrames.
+
+A store is a directory holding one raw little-endian file per fixed-width column
+(ints, floats, bools, datetimes) and an offsets/data/validity triple per string
+column, plus a `manifest.json` describing the schema and row count. Categorical
+columns are dictionary-encoded: one int32 code per row, with the categories in
+the manifest. Fixed-width columns and codes are memory-mapped on load, so
+reading costs close to nothing and dtypes come back exactly as written.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from src import config
+from src.lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 2
+
+# Numpy dtypes stored as raw fixed-width arrays.
+FIXED_DTYPES = {"int64", "float64", "bool", "datetime64[ns]"}
+
+# Codes of categorical columns; -1 marks a missing value, as in pandas.
+CATEGORY_CODE_DTYPE = "<i4"
+
+
+def low_cardinality_columns(
+    df: pd.DataFrame,
+    max_categories: int = config.CATEGORY_MAX_UNIQUE,
+    max_ratio: float = config.CATEGORY_MAX_RATIO,
+) -> list[str]:
+    """Returns the string columns worth storing as pandas categories.
+
+    A column qualifies when it has at most max_categories distinct values and
+    they make up at most max_ratio of its present values, e.g. a status or a
+    cabin class, but not a name or a booking code.
+    """
+    columns = []
+    for name in df.columns:
+        series = df[name]
+        if series.dtype != object:
+            continue
+        present = series.count()
+        distinct = series.nunique()
+        if present and distinct <= max_categories and distinct <= max_ratio * present:
+            columns.append(name)
+    return columns
+
+
+def categorize(df: pd.DataFrame, columns: list[str] | None = None) -> pd.DataFrame:
+    """Converts columns, by default the low-cardinality ones, to the category dtype."""
+    if columns is None:
+        columns = low_cardinality_columns(df)
+    if not columns:
+        return df
+    return df.astype({name: "category" for name in columns})
+
+
+def decategorize(df: pd.DataFrame) -> pd.DataFrame:
+    """Converts category columns back to object columns.
+
+    Categories change the results of some pandas code, e.g. value_counts() and
+    groupby() also report categories that a filter removed.
+    """
+    columns = [name for name in df.columns if isinstance(df[name].dtype, pd.CategoricalDtype)]
+    if not columns:
+        return df
+    return df.astype({name: object for name in columns})
+
+
+def encode_strings(series: pd.Series) -> tuple[np.ndarray, bytes, np.ndarray]:
+    """Encodes a string column as offsets into UTF-8 data, plus a validity mask.
+
+    Returns:
+        The offsets, len(series) + 1 of them starting at zero, the data, and
+        whether each value is present.
+    """
+    valid = series.notna().to_numpy()
+    encoded = [str(value).encode("utf-8") if is_valid else b""
+               for value, is_valid in zip(series.tolist(), valid)]
+    offsets = np.zeros(len(encoded) + 1, dtype="<i8")
+    np.cumsum(np.fromiter((len(value) for value in encoded), dtype="<i8", count=len(encoded)), out=offsets[1:])
+    return offsets, b"".join(encoded), valid
+
+
+def decode_strings(offsets: np.ndarray, data: bytes, valid: np.ndarray, missing=None) -> np.ndarray:
+    """Decodes what encode_strings returned into an object array, with missing for absent values."""
+    # Byte offsets equal character offsets for ASCII, so decode the data once.
+    text = data.decode("ascii") if data.isascii() else None
+    values = np.empty(len(valid), dtype=object)
+    values[:] = [
+        (text[start:end] if text is not None else data[start:end].decode("utf-8")) if is_valid else missing
+        for start, end, is_valid in zip(offsets[:-1].tolist(), offsets[1:].tolist(), valid.tolist())
+    ]
+    return values
+
+
+def manifest_path(path: str) -> str:
+    return os.path.join(path, MANIFEST)
+
+
+def store_exists(path: str) -> bool:
+    return os.path.exists(manifest_path(path))
+
+
+class ColumnarWriter:
+    """Writes a store chunk by chunk; the first chunk fixes the schema.
+
+    Data is written to a sibling temporary directory and swapped into place on
+    close(), so readers never observe a partially written store.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._tmp_path = f"{path}.tmp"
+        self._columns: list[dict] | None = None
+        self._files: dict[str, object] = {}
+        self._offsets: dict[str, int] = {}
+        self._categories: dict[str, dict] = {}
+        self._rows = 0
+        if os.path.exists(self._tmp_path):
+            shutil.rmtree(self._tmp_path)
+        os.makedirs(self._tmp_path)
+
+    def __enter__(self) -> "ColumnarWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _file(self, name: str):
+        if name not in self._files:
+            self._files[name] = open(os.path.join(self._tmp_path, name), "wb")
+        return self._files[name]
+
+    @staticmethod
+    def _column_spec(index: int, name: str, series: pd.Series) -> dict:
+        dtype = str(series.dtype)
+        if dtype in FIXED_DTYPES:
+            return {"name": name, "file": f"c{index}", "kind": "fixed", "dtype": dtype,
+                    "numpy_dtype": series.dtype.newbyteorder("<").str}
+        if dtype == "object":
+            return {"name": name, "file": f"c{index}", "kind": "string", "dtype": dtype}
+        if dtype == "category" and series.cat.categories.dtype == object and not series.cat.ordered:
+            return {"name": name, "file": f"c{index}", "kind": "category", "dtype": dtype,
+                    "numpy_dtype": CATEGORY_CODE_DTYPE}
+        raise TypeError(f"Column {name!r} has unsupported dtype {dtype}")
+
+    def append(self, df: pd.DataFrame) -> None:
+        if self._columns is None:
+            self._columns = [self._column_spec(i, name, df[name]) for i, name in enumerate(df.columns)]
+            self._offsets = {spec["file"]: 0 for spec in self._columns if spec["kind"] == "string"}
+            self._categories = {spec["file"]: {} for spec in self._columns if spec["kind"] == "category"}
+            for spec in self._columns:
+                if spec["kind"] == "string":
+                    # Each offsets file starts with the leading zero offset.
+                    self._file(f"{spec['file']}.offsets").write(np.zeros(1, dtype="<i8").tobytes())
+        elif [spec["name"] for spec in self._columns] != list(df.columns):
+            raise ValueError("All chunks written to a store must have the same columns")
+
+        for spec in self._columns:
+            series = df[spec["name"]]
+            if spec["kind"] == "fixed":
+                values = series.to_numpy(dtype=spec["dtype"]).astype(spec["numpy_dtype"], copy=False)
+                self._file(f"{spec['file']}.bin").write(values.tobytes())
+            elif spec["kind"] == "category":
+                self._append_codes(spec["file"], series)
+            else:
+                self._append_strings(spec["file"], series)
+        self._rows += len(df)
+
+    def _append_strings(self, file: str, series: pd.Series) -> None:
+        offsets, data, valid = encode_strings(series)
+        offsets = self._offsets[file] + offsets[1:]
+        if len(offsets):
+            self._offsets[file] = int(offsets[-1])
+        self._file(f"{file}.offsets").write(offsets.tobytes())
+        self._file(f"{file}.data").write(data)
+        self._file(f"{file}.valid").write(valid.astype("|b1").tobytes())
+
+    def _append_codes(self, file: str, series: pd.Series) -> None:
+        """Writes a chunk's codes, renumbered into the categories of the whole store.
+
+        Chunks may see their categories in any order, or new ones, so each chunk's
+        categories are mapped once to store-wide codes, assigned on first sight.
+        """
+        if not isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.astype("category")
+        store_codes = self._categories[file]
+        mapping = [store_codes.setdefault(value, len(store_codes)) for value in series.cat.categories]
+        # Missing values have code -1, which indexes the trailing -1.
+        remap = np.array(mapping + [-1], dtype=CATEGORY_CODE_DTYPE)
+        self._file(f"{file}.bin").write(remap[series.cat.codes.to_numpy()].tobytes())
+
+    def close(self) -> None:
+        """Writes the manifest and swaps the finished store into place."""
+        for f in self._files.values():
+            f.close()
+        for spec in self._columns or []:
+            if spec["kind"] == "category":
+                spec["categories"] = list(self._categories[spec["file"]])
+        with open(manifest_path(self._tmp_path), "w", encoding="utf-8") as f:
+            json.dump({"version": FORMAT_VERSION, "rows": self._rows, "columns": self._columns or []}, f)
+
+        old_path = f"{self.path}.old"
+        if os.path.exists(self.path):
+            os.replace(self.path, old_path)
+        os.replace(self._tmp_path, self.path)
+        if os.path.exists(old_path):
+            shutil.rmtree(old_path)
+
+    def abort(self) -> None:
+        for f in self._files.values():
+            f.close()
+        shutil.rmtree(self._tmp_path, ignore_errors=True)
+
+
+def write_columnar(df: pd.DataFrame, path: str) -> None:
+    """Writes a DataFrame as a columnar store at path, replacing any existing store."""
+    with ColumnarWriter(path) as writer:
+        writer.append(df)
+
+
+def _read_array(path: str, dtype: str, count: int, mmap: bool) -> np.ndarray:
+    if count == 0:
+        return np.empty(0, dtype=dtype)
+    if mmap:
+        # Copy-on-write mapping: callers may modify the frame without touching the file.
+        return np.memmap(path, dtype=dtype, mode="c", shape=(count,))
+    return np.fromfile(path, dtype=dtype, count=count)
+
+
+def read_columnar(path: str, mmap: bool = True) -> pd.DataFrame:
+    """Loads a columnar store as a DataFrame with the dtypes it was written with.
+
+    Args:
+        path: The store directory.
+        mmap: Memory-map fixed-width columns instead of reading them into memory.
+    """
+    with open(manifest_path(path), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    rows = manifest["rows"]
+
+    data = {}
+    for spec in manifest["columns"]:
+        base = os.path.join(path, spec["file"])
+        if spec["kind"] == "fixed":
+            values = _read_array(f"{base}.bin", spec["numpy_dtype"], rows, mmap)
+            data[spec["name"]] = pd.Series(values, dtype=spec["dtype"], copy=False)
+        elif spec["kind"] == "category":
+            codes = _read_array(f"{base}.bin", spec["numpy_dtype"], rows, mmap)
+            # pandas narrows the codes to the smallest integer type that fits the categories.
+            categories = pd.Index(spec["categories"], dtype="object")
+            data[spec["name"]] = pd.Series(pd.Categorical.from_codes(codes, categories=categories), copy=False)
+        else:
+            offsets = np.fromfile(f"{base}.offsets", dtype="<i8")
+            valid = np.fromfile(f"{base}.valid", dtype="|b1")
+            with open(f"{base}.data", "rb") as f:
+                blob = f.read()
+            values = decode_strings(offsets, blob, valid)
+            data[spec["name"]] = pd.Series(values, dtype="object", copy=False)
+    return pd.DataFrame(data, copy=False)
@@ -13,6 +13,15 @@ GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 # Gemini Model
 GEMINI_MODEL = "gemini-2.5-flash"
 
+# LLM client. GEMINI_BASE_URL points the client at a Gemini-compatible HTTP
+# endpoint instead of the SDK, e.g. the local stub in src.llm_stub.
+LLM_BASE_URL = os.environ.get("GEMINI_BASE_URL")
+LLM_MAX_CONCURRENCY = 4
+LLM_TIMEOUT_SECONDS = 60.0
+LLM_MAX_RETRIES = 3
+LLM_BACKOFF_SECONDS = 1.0
+LLM_MAX_BACKOFF_SECONDS = 20.0
+
 # Ideal Schemas
 IDEAL_FLIGHTS_SCHEMA = {
     "airline_id": "int64",
@@ -33,3 +42,30 @@ IDEAL_AIRLINES_SCHEMA = {
     "airline_id": "int64",
     "airline_name": "object",
 }
+
+# On-disk caches
+CACHE_DIR = os.environ.get("FLIGHT_BOT_CACHE_DIR", ".cache")
+MAPPING_CACHE_MAX_ENTRIES = 256
+MAPPING_CACHE_TTL_SECONDS = 30 * 24 * 60 * 60
+QUERY_CACHE_MAX_ENTRIES = 512
+RESULT_CACHE_MAX_ENTRIES = 512
+
+# Incremental extraction progress per source
+WATERMARKS_PATH = os.path.join("data", "watermarks.json")
+
+# SQL analysis over the ETL warehouse
+WAREHOUSE_PATH = os.path.join("data", "warehouse.db")
+SQL_MAX_ROWS = 1000
+SQL_TIMEOUT_SECONDS = 5.0
+
+# Pandas analysis: generated queries run in a pool of worker processes that
+# hold the cleaned frames. The CPU and memory limits apply to each query.
+QUERY_WORKERS = 2
+QUERY_TIMEOUT_SECONDS = 30.0
+QUERY_CPU_SECONDS = 20.0
+QUERY_MEMORY_MB = 1024
+
+# String columns with at most this many distinct values, making up at most this
+# share of their rows, are dictionary-encoded as pandas categories.
+CATEGORY_MAX_UNIQUE = 256
+CATEGORY_MAX_RATIO = 0.5
@@ -0,0 +1,124 @@
+"""Persistent, content-addressed JSON cache shared by the agents and the ETL."""
+
+import hashlib
+import json
+import os
+import time
+from typing import Any
+
+from src import config
+
+
+class DiskCache:
+    """Stores JSON values on disk, one file per key, with LRU and TTL eviction.
+
+    Keys are hex digests (see `make_key`). A file's mtime records its last access,
+    which drives LRU eviction; its creation time is stored alongside the value
+    and drives TTL expiry.
+    """
+
+    def __init__(self, directory: str, max_entries: int = 256, ttl_seconds: float | None = None):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Hashes JSON-serializable parts into a stable cache key."""
+        encoded = json.dumps(parts, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Returns the cached value for key, or default if missing or expired."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return default
+
+        if self.ttl_seconds is not None and time.time() - entry["created_at"] > self.ttl_seconds:
+            self.invalidate(key)
+            return default
+
+        # Touch the file so LRU eviction sees this entry as recently used.
+        os.utime(path)
+        return entry["value"]
+
+    def set(self, key: str, value: Any) -> None:
+        """Stores value under key and evicts the least recently used entries."""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"created_at": time.time(), "value": value}, f)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def invalidate(self, key: str) -> bool:
+        """Removes a single entry. Returns True if it existed."""
+        try:
+            os.remove(self._path(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def clear(self) -> None:
+        """Removes every entry."""
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                self.invalidate(name[: -len(".json")])
+
+    def _evict(self) -> None:
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                path = os.path.join(self.directory, name)
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except FileNotFoundError:
+                    continue
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort()
+        for _, path in entries[: len(entries) - self.max_entries]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def mapping_cache_key(source_columns: list[str], target_fields: list[str], model_name: str) -> str:
+    """Builds the cache key for a column mapping.
+
+    Source columns are sorted so that reordered headers share an entry.
+    """
+    return DiskCache.make_key(sorted(source_columns), list(target_fields), model_name)
+
+
+_caches: dict[str, DiskCache] = {}
+
+
+def _named_cache(name: str, max_entries: int, ttl_seconds: float | None = None) -> DiskCache:
+    """Returns the process-wide cache stored under config.CACHE_DIR/name."""
+    if name not in _caches:
+        _caches[name] = DiskCache(os.path.join(config.CACHE_DIR, name), max_entries, ttl_seconds)
+    return _caches[name]
+
+
+def get_mapping_cache() -> DiskCache:
+    """Returns the process-wide column mapping cache."""
+    return _named_cache("mappings", config.MAPPING_CACHE_MAX_ENTRIES, config.MAPPING_CACHE_TTL_SECONDS)
+
+
+def get_query_cache() -> DiskCache:
+    """Returns the process-wide cache of generated analysis queries."""
+    return _named_cache("queries", config.QUERY_CACHE_MAX_ENTRIES)
+
+
+def get_result_cache() -> DiskCache:
+    """Returns the process-wide cache of evaluated analysis answers."""
+    return _named_cache("results", config.RESULT_CACHE_MAX_ENTRIES)
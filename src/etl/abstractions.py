@@ -1,18 +1,25 @@
 from abc import ABC, abstractmethod
 from typing import Iterable
-from src.etl.models import Event, Entity
+from src.etl.records import Record
 
 class Extractor(ABC):
     @abstractmethod
-    def extract(self) -> Iterable[Event | Entity]:
+    def extract(self) -> Iterable[Record]:
         pass
 
+    def commit(self) -> None:
+        """Records extraction progress once everything extracted has been loaded.
+
+        Called by Pipeline after a successful load. Incremental extractors persist
+        their watermark here; the default does nothing.
+        """
+
 class Transformer(ABC):
     @abstractmethod
-    def transform(self, data: Iterable[Event | Entity]) -> Iterable[Event | Entity]:
+    def transform(self, data: Iterable[Record]) -> Iterable[Record]:
         pass
 
 class Loader(ABC):
     @abstractmethod
-    def load(self, data: Iterable[Event | Entity]) -> None:
+    def load(self, data: Iterable[Record]) -> None:
         pass
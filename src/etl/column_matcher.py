@@ -0,0 +1,132 @@
+import re
+from typing import Iterable
+
+# Abbreviations and shorthand seen in partner exports, expanded before comparison.
+ABBREVIATIONS = {
+    "#": "number",
+    "no": "number",
+    "num": "number",
+    "nbr": "number",
+    "nm": "name",
+    "cd": "code",
+    "dt": "datetime",
+    "ts": "timestamp",
+    "hr": "hours",
+    "hrs": "hours",
+    "pts": "points",
+    "dep": "departure",
+    "arr": "arrival",
+    "ent": "entertainment",
+    "amt": "amount",
+    "qty": "quantity",
+}
+
+# Filler tokens that carry no meaning when comparing column names.
+STOPWORDS = {"is", "of", "the", "has"}
+
+# Token pairs below this similarity are treated as unrelated.
+MIN_TOKEN_SIMILARITY = 0.7
+
+
+def levenshtein(a: str, b: str) -> int:
+    """Returns the edit distance between two strings."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            ))
+        previous = current
+    return previous[-1]
+
+
+def similarity(a: str, b: str) -> float:
+    """Returns 1 minus the edit distance normalized by the longer string."""
+    if not a and not b:
+        return 1.0
+    return 1.0 - levenshtein(a, b) / max(len(a), len(b))
+
+
+class ColumnMatcher:
+    """Resolves raw column names to schema fields without calling an LLM.
+
+    Each (column, field) pair is scored from normalized edit distance on the whole
+    name and on its tokens, after expanding known abbreviations. Pairs are then
+    assigned one-to-one, best score first, and only pairs at or above the
+    confidence threshold are returned.
+    """
+
+    def __init__(self, threshold: float = 0.8, abbreviations: dict[str, str] | None = None):
+        self.threshold = threshold
+        self.abbreviations = ABBREVIATIONS if abbreviations is None else abbreviations
+
+    def tokenize(self, name: str) -> list[str]:
+        """Splits a column name into lowercase, abbreviation-expanded tokens."""
+        name = name.replace("#", "_#_")
+        name = re.sub(r"([a-z0-9])([A-Z])", r"\1_\2", name).lower()
+        tokens = [token for token in re.split(r"[^a-z0-9#]+", name) if token]
+        tokens = [self.abbreviations.get(token, token) for token in tokens]
+        return [token for token in tokens if token not in STOPWORDS]
+
+    def score(self, source: str, target: str) -> float:
+        """Returns a confidence in [0, 1] that source names the same field as target."""
+        source_tokens = self.tokenize(source)
+        target_tokens = self.tokenize(target)
+        if not source_tokens or not target_tokens:
+            return 0.0
+
+        string_score = similarity("".join(source_tokens), "".join(target_tokens))
+
+        def coverage(tokens: list[str], others: list[str]) -> float:
+            total = 0.0
+            for token in tokens:
+                best = max(similarity(token, other) for other in others)
+                total += best if best >= MIN_TOKEN_SIMILARITY else 0.0
+            return total / len(tokens)
+
+        # Weight precision over recall: a short raw name such as "wifi" whose tokens
+        # all appear in "wifi_available" is a strong match despite missing tokens.
+        precision = coverage(source_tokens, target_tokens)
+        recall = coverage(target_tokens, source_tokens)
+        token_score = (2 * precision + recall) / 3
+
+        return max(string_score, token_score)
+
+    def match(
+        self,
+        source_columns: Iterable[str],
+        target_fields: Iterable[str],
+        aliases: dict[str, list[str]] | None = None,
+    ) -> dict[str, str]:
+        """Maps source columns to target fields where the match is confident.
+
+        Args:
+            source_columns: Raw column names.
+            target_fields: Field names of the target schema.
+            aliases: Optional extra spellings per target field, e.g. a field name
+                prefixed with its model name.
+
+        Returns:
+            A dictionary mapping raw column names to target field names. Columns
+            without a confident, unambiguous match are left out.
+        """
+        aliases = aliases or {}
+        candidates = []
+        for source in source_columns:
+            for target in target_fields:
+                best = max(self.score(source, name) for name in [target, *aliases.get(target, [])])
+                if best >= self.threshold:
+                    candidates.append((best, source, target))
+
+        mapping = {}
+        used_targets = set()
+        for _, source, target in sorted(candidates, key=lambda candidate: -candidate[0]):
+            if source not in mapping and target not in used_targets:
+                mapping[source] = target
+                used_targets.add(target)
+        return mapping
@@ -1,30 +1,355 @@
-import pandas as pd
+from __future__ import annotations
+
+import csv
+import functools
+import hashlib
+import io
+import os
 from typing import Iterable
 from src.etl.abstractions import Extractor
-from src.etl.models import Event, Entity
+from src.etl.column_matcher import ColumnMatcher
+from src.lazy import lazy_import
+from src.etl.records import Checkpoint, ColumnIndex, EventRecord, EntityRecord
+from src.etl.watermarks import WatermarkStore
+
+pd = lazy_import('pandas')
+
+# Bytes hashed at the start of the file and just before the watermark offset to
+# detect a rewritten (rather than appended-to) file.
+FINGERPRINT_BYTES = 64 * 1024
+
+# The schema fields that identify each kind of file, with extra spellings per
+# field. The extractor reads the id (and, for flights, the timestamp) from the
+# columns matched to them. Kinds are listed in load order: dimensions first.
+HEADER_SIGNATURES = {
+    'airline': {'airline_id': [], 'name': ['airline_name']},
+    'flight': {'flight_number': [], 'departure_datetime': []},
+}
+
+# Routing by header needs stronger evidence than the column matcher's threshold:
+# the column matched to a kind's id field (the first of its signature) must score
+# at least this, and a bare "id" never counts.
+ROUTE_ID_MIN_SCORE = 0.9
+
+_matcher = ColumnMatcher()
+
+
+@functools.lru_cache(maxsize=256)
+def _signature_match(columns: tuple[str, ...], kind: str) -> dict[str, str]:
+    signature = HEADER_SIGNATURES[kind]
+    return {field: column for column, field in _matcher.match(columns, signature, signature).items()}
+
+
+def signature_columns(columns: tuple[str, ...], kind: str) -> dict[str, str] | None:
+    """Matches a header against one kind's signature.
+
+    Returns:
+        The column matched to each signature field, or None if any field is unmatched.
+    """
+    fields = _signature_match(columns, kind)
+    if len(fields) < len(HEADER_SIGNATURES[kind]):
+        return None
+    return fields
+
+
+def _weak_id_column(columns: tuple[str, ...], kind: str) -> str | None:
+    """Returns the column matched to kind's id field if it is too weak to route on."""
+    signature = HEADER_SIGNATURES[kind]
+    id_field = next(iter(signature))
+    column = _signature_match(columns, kind)[id_field]
+    if _matcher.tokenize(column) == ['id']:
+        return column
+    if max(_matcher.score(column, name) for name in [id_field, *signature[id_field]]) < ROUTE_ID_MIN_SCORE:
+        return column
+    return None
+
+
+def _partial_kinds(columns: tuple[str, ...], kinds: Iterable[str]) -> list[str]:
+    return [kind for kind in kinds
+            if _signature_match(columns, kind) and signature_columns(columns, kind) is None]
+
+
+def route_header(columns: Iterable[str]) -> str | None:
+    """Returns the record kind of a file from its header, or None if it cannot be routed safely.
+
+    A kind matches when every field of its signature has a column and its id
+    field's column is a strong match. A header matching several signatures goes
+    to the last of them: fact files carry the keys of their dimensions, not the
+    other way round. A header that also partly matches a later kind is not routed,
+    e.g. a flights file whose departure column is not recognised must not be
+    loaded as airlines.
+    """
+    columns = tuple(columns)
+    kinds = list(HEADER_SIGNATURES)
+    matches = [kind for kind in kinds
+               if signature_columns(columns, kind) is not None and _weak_id_column(columns, kind) is None]
+    if not matches:
+        return None
+    kind = matches[-1]
+    if _partial_kinds(columns, kinds[kinds.index(kind) + 1:]):
+        return None
+    return kind
+
+
+def describe_unrouted(columns: Iterable[str]) -> str:
+    """Explains why route_header returned None for a header."""
+    columns = tuple(columns)
+    for kind in reversed(list(HEADER_SIGNATURES)):
+        if kind in _partial_kinds(columns, [kind]):
+            missing = [field for field in HEADER_SIGNATURES[kind] if field not in _signature_match(columns, kind)]
+            return f"its header partly matches the {kind} schema but has no column for {', '.join(missing)}"
+        if signature_columns(columns, kind) is not None and (column := _weak_id_column(columns, kind)):
+            id_field = next(iter(HEADER_SIGNATURES[kind]))
+            return f"its column {column!r} is too weak a match for the {kind} {id_field}"
+    return "its header matches no known schema"
+
+
+class _LineFeed:
+    """Feeds a binary file's lines to csv.reader, remembering the bytes consumed."""
+
+    def __init__(self, file: io.BufferedReader):
+        self._file = file
+        self.lines: list[bytes] = []
+        self.exhausted = False
+
+    def __iter__(self) -> "_LineFeed":
+        return self
+
+    def __next__(self) -> str:
+        line = self._file.readline()
+        if not line:
+            self.exhausted = True
+            raise StopIteration
+        self.lines.append(line)
+        return line.decode('utf-8')
+
+
+def _record_chunks(file: io.BufferedReader, chunksize: int) -> Iterable[bytes]:
+    """Yields the raw bytes of up to chunksize complete CSV records at a time.
+
+    Quoted fields may span lines: csv.reader asks for lines until a record is
+    complete, so a chunk is only ever cut after one. A trailing record that ends
+    inside a quoted field is not yielded.
+    """
+    feed = _LineFeed(file)
+    records = 0
+    for _ in csv.reader(feed):
+        if feed.exhausted:
+            # The reader hit the end of the input inside a quoted field.
+            feed.lines.clear()
+            break
+        records += 1
+        if records == chunksize:
+            yield b''.join(feed.lines)
+            feed.lines.clear()
+            records = 0
+    if feed.lines:
+        yield b''.join(feed.lines)
+
+
+class _ByteRange(io.RawIOBase):
+    """Exposes an open binary file up to a fixed end offset."""
+
+    def __init__(self, file: io.BufferedReader, end: int):
+        self._file = file
+        self._remaining = end - file.tell()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), self._remaining)
+        if size <= 0:
+            return 0
+        data = self._file.read(size)
+        buffer[:len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+
+def _hash_range(file: io.BufferedReader, start: int, end: int) -> str:
+    file.seek(start)
+    return hashlib.sha256(file.read(end - start)).hexdigest()
 
 
 class CsvExtractor(Extractor):
-    def __init__(self, file_path: str, source: str):
+    def __init__(
+        self,
+        file_path: str,
+        source: str,
+        chunksize: int = 10_000,
+        incremental: bool = False,
+        watermarks: WatermarkStore | None = None,
+        record_kind: str | None = None,
+    ):
+        """Extracts airline entities or flight events from a CSV file.
+
+        The kind of record is decided from the file's header by route_header, not
+        from its name.
+
+        Args:
+            file_path: Path to the CSV file.
+            source: Source label stored on every record.
+            chunksize: Rows parsed per read; bounds peak memory independently of file size.
+            incremental: Only extract rows appended since the last committed run. The
+                file is fully reloaded when its fingerprint shows it was rewritten.
+                A Checkpoint is yielded before the first row and after each chunk,
+                so a loader can record progress as it commits. commit() records
+                only the chunks handed on before extraction stopped. After
+                has_pending() or extract(), self.rewritten tells whether the
+                file is being reloaded because it was rewritten.
+            watermarks: Where progress is persisted. Defaults to config.WATERMARKS_PATH.
+            record_kind: 'airline' or 'flight', skipping the routing by header.
+        """
         self.file_path = file_path
         self.source = source
+        self.chunksize = chunksize
+        self.incremental = incremental
+        self.watermarks = watermarks if watermarks is not None else WatermarkStore()
+        self._pending_watermark: dict | None = None
+        self.rewritten = False
+        self._record_kind = record_kind
+        self._columns: list[str] | None = None
+
+    @property
+    def source_id(self) -> str:
+        return f"csv:{os.path.abspath(self.file_path)}"
+
+    @property
+    def record_kind(self) -> str | None:
+        """The kind of record extracted from this file, as the transformer names it."""
+        if self._record_kind is None:
+            self._record_kind = route_header(self.source_columns())
+        return self._record_kind
+
+    def source_columns(self) -> list[str]:
+        """Reads the column names from the file's header."""
+        if self._columns is None:
+            with open(self.file_path, 'r', encoding='utf-8-sig', newline='') as file:
+                self._columns = next(csv.reader(file), [])
+        return list(self._columns)
+
+    def _signature_columns(self, columns: list[str]) -> dict[str, str]:
+        fields = signature_columns(tuple(columns), self.record_kind)
+        if fields is None:
+            raise ValueError(f"{self.file_path} has no columns for the {self.record_kind} fields "
+                             f"{list(HEADER_SIGNATURES[self.record_kind])}")
+        return fields
+
+    def _fingerprint(self, file: io.BufferedReader, offset: int) -> dict:
+        head_end = min(FINGERPRINT_BYTES, offset)
+        tail_start = max(0, offset - FINGERPRINT_BYTES)
+        return {
+            'offset': offset,
+            'head': _hash_range(file, 0, head_end),
+            'tail_start': tail_start,
+            'tail': _hash_range(file, tail_start, offset),
+        }
+
+    def _resume_offset(self, file: io.BufferedReader, size: int, data_start: int) -> int:
+        """Returns where to start reading: the watermark if the file was only appended to."""
+        watermark = self.watermarks.get(self.source_id) if self.incremental else None
+        self.rewritten = False
+        if watermark is None or watermark['offset'] > size:
+            return data_start
+        head_end = min(FINGERPRINT_BYTES, watermark['offset'])
+        if (_hash_range(file, 0, head_end) != watermark['head']
+                or _hash_range(file, watermark['tail_start'], watermark['offset']) != watermark['tail']):
+            self.rewritten = True
+            return data_start
+        return watermark['offset']
+
+    def _range(self, file: io.BufferedReader) -> tuple[list[str], int, int]:
+        """Reads the header and returns the columns and the byte range still to extract."""
+        header = file.readline()
+        columns = next(csv.reader([header.decode('utf-8-sig')]))
+        data_start = file.tell()
+
+        size = os.fstat(file.fileno()).st_size
+        end = size
+        if self.incremental:
+            # Stop at the last complete line so a row still being appended is read next run.
+            file.seek(max(data_start, size - FINGERPRINT_BYTES))
+            tail = file.read()
+            if b'\n' in tail:
+                end = size - len(tail) + tail.rfind(b'\n') + 1
+        return columns, self._resume_offset(file, size, data_start), end
+
+    def has_pending(self) -> bool:
+        """Whether extract() would yield anything, checked without parsing the file."""
+        with open(self.file_path, 'rb') as file:
+            _, start, end = self._range(file)
+        return start < end
+
+    def _read_chunks(self) -> Iterable[tuple[pd.DataFrame, int | None, int | None]]:
+        """Yields each chunk with the byte offsets of its first row and just past its last.
+
+        The offsets are only tracked in incremental mode, and are None otherwise.
+        """
+        with open(self.file_path, 'rb') as file:
+            columns, start, end = self._range(file)
+            self._pending_watermark = None
+            if start >= end:
+                if self.incremental:
+                    self._pending_watermark = self._fingerprint(file, end)
+                return
+
+            file.seek(start)
+            reader = io.BufferedReader(_ByteRange(file, end))
+            if not self.incremental:
+                for chunk in pd.read_csv(reader, header=None, names=columns, chunksize=self.chunksize):
+                    yield chunk, None, None
+                return
+
+            # Split on records rather than letting pandas chunk, so every chunk's end
+            # offset is known and falls after a complete record.
+            for data in _record_chunks(reader, self.chunksize):
+                chunk = pd.read_csv(io.BytesIO(data), header=None, names=columns)
+                yield chunk, start, start + len(data)
+                start += len(data)
+            # Reached only once every chunk was handed on. If start < end, the last
+            # record is still being written, e.g. a quoted field's line break has
+            # arrived but not its closing quote; it is read next run.
+            self._pending_watermark = self._fingerprint(file, start)
+
+    def _checkpoint(self, offset: int) -> Checkpoint:
+        with open(self.file_path, 'rb') as file:
+            return Checkpoint(self.source_id, self._fingerprint(file, offset))
+
+    def commit(self) -> None:
+        if self._pending_watermark is not None:
+            self.watermarks.set(self.source_id, self._pending_watermark)
+            self._pending_watermark = None
+
+    @staticmethod
+    def _rows(chunk: pd.DataFrame) -> Iterable[tuple]:
+        # Build rows from column arrays instead of materializing a Series per row.
+        return zip(*(chunk[column].tolist() for column in chunk.columns))
 
-    def extract(self) -> Iterable[Event | Entity]:
-        df = pd.read_csv(self.file_path)
-        if 'airline' in self.file_path:
-            for _, row in df.iterrows():
-                yield Entity(
-                    entity_id=str(row['airlie_id']),
-                    entity_type='airline',
-                    source=self.source,
-                    attributes=row.to_dict()
-                )
-        elif 'flight' in self.file_path:
-            for _, row in df.iterrows():
-                yield Event(
-                    event_id=str(row['flght#']),
-                    event_type='flight',
-                    timestamp=pd.to_datetime(row['departure_dt']),
-                    source=self.source,
-                    payload=row.to_dict()
-                )
+    def extract(self) -> Iterable[EventRecord | EntityRecord | Checkpoint]:
+        if self.record_kind not in HEADER_SIGNATURES:
+            return
+        # One index per file: every record shares it instead of carrying its own keys.
+        columns: ColumnIndex | None = None
+        for chunk, start, end in self._read_chunks():
+            if columns is None:
+                columns = ColumnIndex(chunk.columns)
+                fields = self._signature_columns(columns.names)
+                if self.incremental:
+                    yield self._checkpoint(start)
+            if self.record_kind == 'airline':
+                entity_ids = chunk[fields['airline_id']].astype(str).tolist()
+                for entity_id, values in zip(entity_ids, self._rows(chunk)):
+                    yield EntityRecord(entity_id, 'airline', self.source, columns, values)
+            else:
+                event_ids = chunk[fields['flight_number']].astype(str).tolist()
+                # Parse the whole column at once rather than one value per row. An
+                # unparseable value becomes NaT; the transformer reports the row.
+                timestamps = pd.to_datetime(chunk[fields['departure_datetime']], errors='coerce').tolist()
+                for event_id, timestamp, values in zip(event_ids, timestamps, self._rows(chunk)):
+                    yield EventRecord(event_id, 'flight', timestamp, self.source, columns, values)
+            if self.incremental:
+                checkpoint = self._checkpoint(end)
+                yield checkpoint
+                # The consumer has pulled past the chunk, so commit() may record it.
+                self._pending_watermark = checkpoint.watermark
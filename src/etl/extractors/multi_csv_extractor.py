@@ -0,0 +1,156 @@
+import glob
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator
+from src.etl.abstractions import Extractor
+from src.etl.extractors.csv_extractor import HEADER_SIGNATURES, CsvExtractor, describe_unrouted
+from src.etl.records import Checkpoint, Record
+
+# Marks the end of one file's records on the shared queue.
+_DONE = object()
+
+# How often a worker blocked on a full queue re-checks whether the reader stopped.
+_POLL_SECONDS = 0.1
+
+
+def discover_csv_files(sources: str | Iterable[str]) -> list[str]:
+    """Expands directories and glob patterns into CSV file paths.
+
+    A directory contributes every *.csv file directly inside it. Duplicates are
+    dropped and the result is sorted, so runs see the files in a stable order.
+    """
+    if isinstance(sources, str):
+        sources = [sources]
+    paths = set()
+    for source in sources:
+        if os.path.isdir(source):
+            paths.update(glob.glob(os.path.join(source, '*.csv')))
+        elif glob.has_magic(source):
+            paths.update(path for path in glob.glob(source) if os.path.isfile(path))
+        else:
+            paths.add(source)
+    return sorted(paths)
+
+
+def route_csv_files(paths: Iterable[str], source: str, **options) -> dict[str, list[CsvExtractor]]:
+    """Builds an extractor per file and groups them by the record kind of their header.
+
+    Files whose header route_header cannot route are reported and skipped.
+
+    Args:
+        paths: CSV file paths.
+        source: Source label stored on every record.
+        **options: Passed to every CsvExtractor, e.g. incremental and watermarks.
+
+    Returns:
+        The extractors of each record kind, in load order (HEADER_SIGNATURES order).
+    """
+    routes = {kind: [] for kind in HEADER_SIGNATURES}
+    for path in paths:
+        extractor = CsvExtractor(file_path=path, source=source, **options)
+        if extractor.record_kind is None:
+            print(f"Skipping {path}: {describe_unrouted(extractor.source_columns())}.")
+            continue
+        routes[extractor.record_kind].append(extractor)
+    return {kind: extractors for kind, extractors in routes.items() if extractors}
+
+
+class MultiCsvExtractor(Extractor):
+    def __init__(self, extractors: list[CsvExtractor], max_workers: int = 4, queue_depth: int = 8,
+                 batch_size: int = 1000):
+        """Extracts several CSV files concurrently into one stream of records.
+
+        Each file is read by a worker thread in batches, which are yielded as they
+        arrive, so records of different files interleave; a file's own records keep
+        their order. pandas releases the GIL while it tokenizes, so the parsing of
+        several files overlaps.
+
+        Incremental files are batched from one Checkpoint to the next instead, and
+        batches are never split, so every checkpoint in the combined stream follows
+        only complete chunks and the loader can commit there.
+
+        Args:
+            extractors: One extractor per file.
+            max_workers: Files read at once.
+            queue_depth: Batches buffered ahead of the reader; workers block when it
+                is full.
+            batch_size: Records per queued batch of a file without checkpoints.
+        """
+        self.extractors = extractors
+        self.max_workers = max_workers
+        self.queue_depth = queue_depth
+        self.batch_size = batch_size
+
+    def has_pending(self) -> bool:
+        return any(extractor.has_pending() for extractor in self.extractors)
+
+    def extract(self) -> Iterable[Record]:
+        if self.max_workers <= 1 or len(self.extractors) <= 1:
+            for extractor in self.extractors:
+                yield from extractor.extract()
+            return
+
+        stop = threading.Event()
+        batches = queue.Queue(maxsize=self.queue_depth)
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=_POLL_SECONDS)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def read(extractor: CsvExtractor) -> None:
+            try:
+                for batch in self._batches(extractor.extract()):
+                    if not put(batch):
+                        return
+                put(_DONE)
+            except BaseException as e:
+                put(e)
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='csv-extract')
+        try:
+            for extractor in self.extractors:
+                executor.submit(read, extractor)
+            remaining = len(self.extractors)
+            while remaining:
+                item = batches.get()
+                if item is _DONE:
+                    remaining -= 1
+                elif isinstance(item, BaseException):
+                    raise item
+                else:
+                    yield from item
+        finally:
+            # Unblocks the workers if the reader stopped early or a file failed.
+            stop.set()
+            executor.shutdown(cancel_futures=True)
+
+    def _batches(self, records: Iterable[Record | Checkpoint]) -> Iterator[list]:
+        iterator = iter(records)
+        first = next(iterator, None)
+        if first is None:
+            return
+        if not isinstance(first, Checkpoint):
+            yield [first, *islice(iterator, self.batch_size - 1)]
+            while batch := list(islice(iterator, self.batch_size)):
+                yield batch
+            return
+        batch = [first]
+        for item in iterator:
+            batch.append(item)
+            if isinstance(item, Checkpoint):
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def commit(self) -> None:
+        for extractor in self.extractors:
+            extractor.commit()
@@ -1,25 +1,122 @@
+import datetime
+import os
 import sqlite3
-from typing import Iterable
+from typing import Iterable, Sequence
+from urllib.parse import quote
 from src.etl.abstractions import Extractor
-from src.etl.models import Event
+from src.etl.records import ColumnIndex, EventRecord
+from src.etl.watermarks import WatermarkStore
+
+# Columns every event needs, always selected even under a projection.
+REQUIRED_COLUMNS = ('event_id', 'event_type', 'timestamp')
+
+
+def _parse_timestamp(value) -> datetime.datetime:
+    """Parses an ISO-8601 string or Unix timestamp, as pydantic would for Event."""
+    if isinstance(value, datetime.datetime):
+        return value
+    if isinstance(value, (int, float)):
+        return datetime.datetime.fromtimestamp(value, tz=datetime.timezone.utc)
+    return datetime.datetime.fromisoformat(value)
+
 
 class SqliteExtractor(Extractor):
-    def __init__(self, db_path: str, table_name: str, source: str):
+    def __init__(
+        self,
+        db_path: str,
+        table_name: str,
+        source: str,
+        incremental: bool = False,
+        watermark_column: str = 'rowid',
+        watermarks: WatermarkStore | None = None,
+        batch_size: int = 1000,
+        columns: list[str] | None = None,
+        where: str | None = None,
+        params: Sequence = (),
+    ):
+        """Extracts events from a SQLite table.
+
+        Args:
+            db_path: Path to the SQLite database file.
+            table_name: Table holding the events.
+            source: Source label stored on every event.
+            incremental: Only extract rows whose watermark_column is greater than
+                the value recorded by the last committed run.
+            watermark_column: A column that increases as rows are added, e.g. rowid
+                or an ISO-8601 timestamp.
+            watermarks: Where progress is persisted. Defaults to config.WATERMARKS_PATH.
+            batch_size: Rows fetched from the cursor at a time.
+            columns: Columns to select into the payload. None selects all columns;
+                event_id, event_type and timestamp are always included.
+            where: Optional SQL predicate, with ? placeholders bound from params.
+            params: Values for the placeholders in where.
+        """
         self.db_path = db_path
         self.table_name = table_name
         self.source = source
+        self.incremental = incremental
+        self.watermark_column = watermark_column
+        self.watermarks = watermarks if watermarks is not None else WatermarkStore()
+        self.batch_size = batch_size
+        self.columns = columns
+        self.where = where
+        self.params = tuple(params)
+        self._pending_watermark: dict | None = None
+
+    @property
+    def source_id(self) -> str:
+        return f"sqlite:{os.path.abspath(self.db_path)}:{self.table_name}:{self.watermark_column}"
+
+    def _connect(self) -> sqlite3.Connection:
+        # Read-only, so extraction can never modify or lock the source for writing.
+        uri = f"file:{quote(os.path.abspath(self.db_path))}?mode=ro"
+        return sqlite3.connect(uri, uri=True)
+
+    def _query(self) -> tuple[str, tuple]:
+        if self.columns is None:
+            projection = "*"
+        else:
+            projection = ", ".join(dict.fromkeys([*REQUIRED_COLUMNS, *self.columns]))
+        predicates = [f"({self.where})"] if self.where else []
+        params = list(self.params)
+        if self.incremental:
+            watermark = self.watermarks.get(self.source_id)
+            if watermark is not None:
+                predicates.append(f"{self.watermark_column} > ?")
+                params.append(watermark['value'])
+        where = f" WHERE {' AND '.join(predicates)}" if predicates else ""
+
+        if not self.incremental:
+            return f"SELECT {projection} FROM {self.table_name}{where}", tuple(params)
+        query = (f"SELECT {projection}, {self.watermark_column} AS __watermark FROM {self.table_name}"
+                 f"{where} ORDER BY {self.watermark_column}")
+        return query, tuple(params)
+
+    def extract(self) -> Iterable[EventRecord]:
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(*self._query())
+            names = [description[0] for description in cursor.description]
+            if self.incremental:
+                names.pop()
+            columns = ColumnIndex(names)
+            event_id, event_type, timestamp = (columns.positions[name] for name in REQUIRED_COLUMNS)
+            # Stream in batches so memory stays flat and the first row arrives immediately.
+            while rows := cursor.fetchmany(self.batch_size):
+                watermark = rows[-1][-1]
+                if self.incremental:
+                    rows = [row[:-1] for row in rows]
+                for row in rows:
+                    yield EventRecord(str(row[event_id]), row[event_type], _parse_timestamp(row[timestamp]),
+                                      self.source, columns, row)
+                if self.incremental:
+                    self._pending_watermark = {'value': watermark}
+        finally:
+            # Runs on exhaustion, on error and when the consumer closes the generator early.
+            conn.close()
 
-    def extract(self) -> Iterable[Event]:
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute(f"SELECT * FROM {self.table_name}")
-        for row in cursor.fetchall():
-            yield Event(
-                event_id=str(row['event_id']),
-                event_type=row['event_type'],
-                timestamp=row['timestamp'],
-                source=self.source,
-                payload=dict(row)
-            )
-        conn.close()
+    def commit(self) -> None:
+        if self._pending_watermark is not None:
+            self.watermarks.set(self.source_id, self._pending_watermark)
+            self._pending_watermark = None
@@ -0,0 +1,411 @@
+"""Per-stage metrics and profiling for ETL pipelines.
+
+Instrumentation wraps an Extractor, Transformer and Loader and measures every
+stage exclusively: time a stage spends waiting on its input, including running
+upstream stages in a serial pipeline, is not counted towards it. Transformers
+with a `schema_mapper` also get a separate `schema_mapping` stage, so time spent
+resolving column mappings (e.g. calling Gemini) is reported on its own.
+
+    instrumentation = Instrumentation(report_path="etl_metrics.json")
+    Pipeline(extractor, transformer, loader, instrumentation=instrumentation).run()
+"""
+
+import cProfile
+import json
+import math
+import os
+import threading
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from typing import Any, Iterable, Iterator
+from src.etl.abstractions import Extractor, Transformer, Loader
+from src.etl.models import RowBatch
+
+STAGES = ('extract', 'schema_mapping', 'transform', 'load')
+
+# Histogram bucket upper bounds in microseconds: 1us, 2us, 4us, ... ~67s.
+LATENCY_BUCKETS_US = [2 ** i for i in range(27)]
+
+
+def _record_count(item: Any) -> int:
+    return len(item.rows) if isinstance(item, RowBatch) else 1
+
+
+@dataclass
+class LatencyHistogram:
+    """Counts of per-item latencies in power-of-two microsecond buckets."""
+    counts: list[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS_US) + 1))
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    def add(self, seconds: float) -> None:
+        micros = seconds * 1e6
+        index = 0 if micros <= 1 else min(math.ceil(math.log2(micros)), len(LATENCY_BUCKETS_US))
+        self.counts[index] += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def quantile(self, q: float) -> float | None:
+        """Returns the upper bound, in seconds, of the bucket holding quantile q."""
+        total = sum(self.counts)
+        if not total:
+            return None
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= q * total:
+                return LATENCY_BUCKETS_US[index] / 1e6 if index < len(LATENCY_BUCKETS_US) else self.max_seconds
+        return self.max_seconds
+
+    def to_dict(self) -> dict:
+        count = sum(self.counts)
+        return {
+            'count': count,
+            'mean_seconds': self.total_seconds / count if count else None,
+            'max_seconds': self.max_seconds,
+            'p50_seconds': self.quantile(0.5),
+            'p99_seconds': self.quantile(0.99),
+            'buckets_us': LATENCY_BUCKETS_US,
+            # The last count is for latencies above the largest bucket.
+            'counts': self.counts,
+        }
+
+
+@dataclass
+class StageMetrics:
+    stage: str
+    records_in: int = 0
+    records_out: int = 0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    first_record_seconds: float | None = None
+    peak_traced_bytes: int | None = None
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+    started_at: float | None = None
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data.pop('started_at')
+        data['latency'] = self.latency.to_dict()
+        return data
+
+
+class PipelineHook:
+    """Receives instrumentation events. Override the methods of interest."""
+
+    def on_stage_start(self, stage: str) -> None:
+        pass
+
+    def on_first_record(self, stage: str, seconds: float) -> None:
+        pass
+
+    def on_progress(self, stage: str, metrics: StageMetrics) -> None:
+        pass
+
+    def on_stage_end(self, stage: str, metrics: StageMetrics) -> None:
+        pass
+
+    def on_report(self, report: dict) -> None:
+        pass
+
+
+class _Frame:
+    __slots__ = ('stage', 'wall', 'cpu', 'child_wall', 'child_cpu')
+
+    def __init__(self, stage: str | None):
+        self.stage = stage
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+        self.child_wall = 0.0
+        self.child_cpu = 0.0
+
+
+class Instrumentation:
+    def __init__(
+        self,
+        report_path: str | None = None,
+        hooks: Iterable[PipelineHook] = (),
+        trace_memory: bool = False,
+        profile_stage: str | None = None,
+        profile_path: str | None = None,
+        progress_every: int = 10_000,
+    ):
+        """Collects per-stage metrics for a pipeline run.
+
+        Args:
+            report_path: Where finish() writes the JSON report. None only returns it.
+            hooks: Receive stage start, first record, progress and end events, and
+                the final report.
+            trace_memory: Record the peak traced memory per stage with tracemalloc.
+                This slows the run down several times over. Sequential pipelines only.
+            profile_stage: One of STAGES to run under cProfile, counting only the
+                time spent in that stage itself. Sequential pipelines only.
+            profile_path: Where the profile is dumped in pstats format. Defaults to
+                '<profile_stage>.prof'.
+            progress_every: Records between on_progress events.
+        """
+        if profile_stage is not None and profile_stage not in STAGES:
+            raise ValueError(f"profile_stage must be one of {STAGES}, got {profile_stage!r}")
+        self.report_path = report_path
+        self.hooks = list(hooks)
+        self.trace_memory = trace_memory
+        self.profile_stage = profile_stage
+        self.profile_path = profile_path or (f"{profile_stage}.prof" if profile_stage else None)
+        self.progress_every = progress_every
+        self.metrics = {stage: StageMetrics(stage) for stage in STAGES}
+        self._local = threading.local()
+        self._profiler = cProfile.Profile() if profile_stage else None
+        self._proxied_transformer = None
+        self._started_at: float | None = None
+        self._started_tracing = False
+
+    # Sections: every span of time spent inside one stage is a frame on a per-thread
+    # stack. A frame's time minus the time of frames nested in it is attributed to
+    # its stage. Frames with stage None mark waiting on input and count for no one.
+
+    def _stack(self) -> list[_Frame]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _boundary(self, stack: list[_Frame], entering: str | None) -> None:
+        """Attributes the memory peak so far to the running stage and switches the profiler."""
+        running = stack[-1].stage if stack else None
+        if self.trace_memory and tracemalloc.is_tracing():
+            peak = tracemalloc.get_traced_memory()[1]
+            if running is not None:
+                metrics = self.metrics[running]
+                metrics.peak_traced_bytes = max(metrics.peak_traced_bytes or 0, peak)
+            tracemalloc.reset_peak()
+        if self._profiler is not None:
+            if running == self.profile_stage:
+                self._profiler.disable()
+            if entering == self.profile_stage:
+                self._profiler.enable()
+
+    def _enter(self, stage: str | None) -> _Frame:
+        stack = self._stack()
+        self._boundary(stack, stage)
+        frame = _Frame(stage)
+        stack.append(frame)
+        if stage is not None:
+            metrics = self.metrics[stage]
+            if metrics.started_at is None:
+                metrics.started_at = frame.wall
+                for hook in self.hooks:
+                    hook.on_stage_start(stage)
+        return frame
+
+    def _exit(self, frame: _Frame) -> float:
+        """Closes a frame and returns its exclusive wall time."""
+        stack = self._stack()
+        self._boundary(stack, stack[-2].stage if len(stack) > 1 else None)
+        stack.pop()
+        wall = time.perf_counter() - frame.wall
+        cpu = time.thread_time() - frame.cpu
+        if stack:
+            stack[-1].child_wall += wall
+            stack[-1].child_cpu += cpu
+        exclusive = wall - frame.child_wall
+        if frame.stage is not None:
+            metrics = self.metrics[frame.stage]
+            metrics.wall_seconds += exclusive
+            metrics.cpu_seconds += cpu - frame.child_cpu
+        return exclusive
+
+    def _produced(self, stage: str, item: Any, latency: float) -> None:
+        metrics = self.metrics[stage]
+        before = metrics.records_out
+        metrics.records_out += _record_count(item)
+        metrics.latency.add(latency)
+        if metrics.first_record_seconds is None:
+            metrics.first_record_seconds = time.perf_counter() - metrics.started_at
+            for hook in self.hooks:
+                hook.on_first_record(stage, metrics.first_record_seconds)
+        if self.hooks and metrics.records_out // self.progress_every > before // self.progress_every:
+            for hook in self.hooks:
+                hook.on_progress(stage, metrics)
+
+    def _ended(self, stage: str) -> None:
+        for hook in self.hooks:
+            hook.on_stage_end(stage, self.metrics[stage])
+
+    def _output(self, stage: str, items: Iterable) -> Iterator:
+        """Yields a stage's output, timing each item exclusively."""
+        iterator = iter(items)
+        try:
+            while True:
+                frame = self._enter(stage)
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    self._exit(frame)
+                    return
+                except BaseException:
+                    self._exit(frame)
+                    raise
+                self._produced(stage, item, self._exit(frame))
+                yield item
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+            self._ended(stage)
+
+    def _input(self, stage: str, items: Iterable) -> Iterator:
+        """Yields a stage's input, counting it and excluding the time spent waiting for it."""
+        metrics = self.metrics[stage]
+        iterator = iter(items)
+        try:
+            while True:
+                frame = self._enter(None)
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    self._exit(frame)
+                before = metrics.records_in
+                metrics.records_in += _record_count(item)
+                if stage == 'load':
+                    # The loader has no output; report how long after the load started
+                    # its first input arrived.
+                    if metrics.first_record_seconds is None:
+                        metrics.first_record_seconds = time.perf_counter() - metrics.started_at
+                        for hook in self.hooks:
+                            hook.on_first_record(stage, metrics.first_record_seconds)
+                    if self.hooks and metrics.records_in // self.progress_every > before // self.progress_every:
+                        for hook in self.hooks:
+                            hook.on_progress(stage, metrics)
+                yield item
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+
+    def _timed_call(self, stage: str, function, *args, **kwargs):
+        frame = self._enter(stage)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            self._produced(stage, None, self._exit(frame))
+
+    def wrap(self, extractor: Extractor, transformer: Transformer, loader: Loader) -> tuple:
+        """Returns instrumented stand-ins for the three pipeline components."""
+        schema_mapper = getattr(transformer, 'schema_mapper', None)
+        if schema_mapper is not None and not isinstance(schema_mapper, _MapperProxy):
+            transformer.schema_mapper = _MapperProxy(schema_mapper, self)
+            self._proxied_transformer = transformer
+        return (
+            InstrumentedExtractor(extractor, self),
+            InstrumentedTransformer(transformer, self),
+            InstrumentedLoader(loader, self),
+        )
+
+    def start(self) -> None:
+        self._started_at = time.perf_counter()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def finish(self) -> dict:
+        """Stops measuring and returns the report, also writing it to report_path."""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        if self._proxied_transformer is not None:
+            self._proxied_transformer.schema_mapper = self._proxied_transformer.schema_mapper.mapper
+            self._proxied_transformer = None
+
+        report = {
+            'total_wall_seconds': time.perf_counter() - self._started_at if self._started_at else None,
+            'stages': {stage: metrics.to_dict() for stage, metrics in self.metrics.items()
+                       if metrics.started_at is not None},
+        }
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.profile_path)
+            report['profile'] = {'stage': self.profile_stage, 'path': os.path.abspath(self.profile_path)}
+
+        if self.report_path is not None:
+            with open(self.report_path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+        for hook in self.hooks:
+            hook.on_report(report)
+        return report
+
+
+class _MapperProxy:
+    """Times schema mapping calls as their own stage."""
+
+    def __init__(self, mapper, instrumentation: Instrumentation):
+        self.mapper = mapper
+        self._instrumentation = instrumentation
+
+    def get_schema_mapping(self, *args, **kwargs) -> dict:
+        return self._instrumentation._timed_call('schema_mapping', self.mapper.get_schema_mapping, *args, **kwargs)
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self.mapper, name)
+        if name != 'get_schema_mappings':
+            return attribute
+        # Looked up rather than defined, so mappers without it still lack it.
+        return lambda *args, **kwargs: self._instrumentation._timed_call('schema_mapping', attribute, *args, **kwargs)
+
+
+class InstrumentedExtractor(Extractor):
+    def __init__(self, extractor: Extractor, instrumentation: Instrumentation):
+        self.extractor = extractor
+        self.instrumentation = instrumentation
+
+    def extract(self) -> Iterable:
+        return self.instrumentation._output('extract', self.extractor.extract())
+
+    def commit(self) -> None:
+        self.extractor.commit()
+
+
+class InstrumentedTransformer(Transformer):
+    def __init__(self, transformer: Transformer, instrumentation: Instrumentation):
+        self.transformer = transformer
+        self.instrumentation = instrumentation
+
+    def transform(self, data: Iterable) -> Iterable:
+        data = self.instrumentation._input('transform', data)
+        return self.instrumentation._output('transform', self.transformer.transform(data))
+
+
+class InstrumentedLoader(Loader):
+    def __init__(self, loader: Loader, instrumentation: Instrumentation):
+        self.loader = loader
+        self.instrumentation = instrumentation
+
+    def load(self, data: Iterable) -> None:
+        instrumentation = self.instrumentation
+        latency = instrumentation.metrics['load'].latency
+        handed = None
+
+        def pulls() -> Iterator:
+            # One latency sample per item: the time from handing it to the loader
+            # until the loader pulls again. Waiting for input is not included.
+            nonlocal handed
+            for item in instrumentation._input('load', data):
+                handed = time.perf_counter()
+                yield item
+                latency.add(time.perf_counter() - handed)
+                handed = None
+            handed = time.perf_counter()
+
+        items = pulls()
+        frame = instrumentation._enter('load')
+        try:
+            self.loader.load(items)
+        finally:
+            # The loader's work after its last pull, e.g. flushing a final batch.
+            if handed is not None:
+                latency.add(time.perf_counter() - handed)
+            items.close()
+            instrumentation._exit(frame)
+            instrumentation._ended('load')
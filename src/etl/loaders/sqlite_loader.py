@@ -1,27 +1,160 @@
-from typing import Iterable
+import datetime
+import json
+import math
+from typing import Any, Iterable
 from sqlalchemy import (
     create_engine,
+    event,
     Table,
     Column,
     String,
     MetaData,
     DateTime,
+    Index,
     JSON,
     Integer,
     Float,
     Boolean,
+    func,
+    ForeignKey,
+    Time,
+    Text,
+    inspect,
+    or_,
+    select,
+    text,
 )
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import IntegrityError
 from src.etl.abstractions import Loader
-from src.etl.models import Event, Entity, Airline, Flight
+from src.etl.loaders.summary_tables import (
+    apply_deltas,
+    create_summary_tables,
+    rebuild_summaries,
+    retract,
+    summarize,
+)
+from src.etl.models import Airline, Flight, RowBatch
+from src.etl.records import Checkpoint, DeadLetter, Record
+from src.etl.run_state import RUN_STATE_DDL, RUN_STATE_TABLE
+
+
+# Pragmas suited to bulk loads: WAL lets readers proceed during the load and
+# NORMAL synchronous skips the fsync per commit that FULL would do.
+FAST_WRITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64000,
+    "temp_store": "MEMORY",
+}
+
+# Secondary indexes for the analysis queries, built once the bulk load is done
+# so that inserts do not pay for maintaining them row by row.
+FLIGHT_INDEX_COLUMNS = ("airline_id", "departure_datetime", "status")
+
+# Low-cardinality flight columns stored as integer codes into a lookup_<column>
+# table each. The flights view joins the values back in, so readers see strings.
+FLIGHT_DICTIONARY_COLUMNS = ("status", "terminal", "meal_option")
+
+
+def _json_safe(payload: dict[str, Any]) -> dict[str, Any]:
+    return {key: None if isinstance(value, float) and math.isnan(value) else value for key, value in payload.items()}
 
 
 class SqliteLoader(Loader):
-    def __init__(self, db_path: str):
+    def __init__(
+        self,
+        db_path: str,
+        batch_size: int | None = 1000,
+        pragmas: dict[str, str | int] | None = None,
+        create_indexes: bool = True,
+        maintain_summaries: bool = True,
+        on_error: str = "raise",
+        mode: str = "insert",
+        version_column: str | None = None,
+    ):
+        """Loads airlines and flights into a SQLite warehouse.
+
+        Flights are stored in flight_facts, with the FLIGHT_DICTIONARY_COLUMNS as
+        codes into lookup tables, and read through the flights view, which has the
+        readable schema. A warehouse holding flights as a plain table is migrated.
+
+        A stream that carries Checkpoints is committed at each checkpoint rather
+        than per batch, and the checkpoint's watermark is written to run_state in
+        the same transaction. DeadLetters in the stream are stored in dead_letters.
+
+        In upsert mode each batch is bulk-inserted into a temporary staging table
+        and merged into its target with one INSERT ... ON CONFLICT DO UPDATE, so
+        reloading a file is idempotent and repeated keys need no per-row handling.
+        Of the rows sharing a key, the last one wins: the one with the greatest
+        version_column, if set, then the one loaded last. The summary tables
+        retract the rows that were overwritten.
+
+        Args:
+            db_path: Path to the SQLite database file.
+            batch_size: Rows inserted per executemany call and committed together.
+                None inserts row by row with a single commit at the end.
+            pragmas: SQLite pragmas applied to every new connection,
+                e.g. FAST_WRITE_PRAGMAS.
+            create_indexes: Create the secondary indexes in FLIGHT_INDEX_COLUMNS
+                after each load, if they do not exist yet.
+            maintain_summaries: Update the summary tables in summary_tables.py in
+                the same transaction as each batch of flights.
+            on_error: 'raise' aborts the load when a row violates a constraint, e.g. a
+                duplicate flight_number. 'dead_letter' retries that batch row by row
+                and stores the rows that still fail in dead_letters.
+            mode: 'insert' adds rows and fails on a key already present. 'upsert'
+                replaces the stored row of a key already present.
+            version_column: In upsert mode, a column, e.g. departure_datetime, that
+                decides which row of a key wins. A row never replaces one with a
+                greater version. Tables without the column keep the last row loaded.
+        """
+        if on_error not in ("raise", "dead_letter"):
+            raise ValueError(f"on_error must be 'raise' or 'dead_letter', got {on_error!r}")
+        if mode not in ("insert", "upsert"):
+            raise ValueError(f"mode must be 'insert' or 'upsert', got {mode!r}")
         self.engine = create_engine(f"sqlite:///{db_path}")
+        self.batch_size = batch_size
+        self.pragmas = pragmas or {}
+        if self.pragmas:
+            event.listen(self.engine, "connect", self._apply_pragmas)
+        # pysqlite defers BEGIN to the first write, so a SAVEPOINT opening a
+        # transaction would be committed by its RELEASE. Begin explicitly instead.
+        event.listen(self.engine, "connect", self._disable_implicit_transactions)
+        event.listen(self.engine, "begin", self._begin)
         self.metadata = MetaData()
         self.airlines_table = self._create_airlines_table()
+        self.lookup_tables = {column: self._create_lookup_table(column) for column in FLIGHT_DICTIONARY_COLUMNS}
         self.flights_table = self._create_flights_table()
+        self.run_state_table = self._create_run_state_table()
+        self.dead_letters_table = self._create_dead_letters_table()
+        self.on_error = on_error
+        self.mode = mode
+        self.version_column = version_column
+        self.dead_letter_count = 0
+        self.maintain_summaries = maintain_summaries
+        self.summary_tables = create_summary_tables(self.metadata) if maintain_summaries else {}
+        self.tables = {Airline: self.airlines_table, Flight: self.flights_table}
+        # Value -> code of each dictionary column, read from the lookup tables per load.
+        self._codes: dict[str, dict[str, int]] = {}
+        existing_tables = set(inspect(self.engine).get_table_names())
         self.metadata.create_all(self.engine)
+        self.create_indexes = create_indexes
+        # Defined after create_all(), so that it does not build them before the load.
+        self.indexes = [
+            Index(f"ix_flights_{column}", self.flights_table.c[column]) for column in FLIGHT_INDEX_COLUMNS
+        ]
+        with self.engine.connect() as connection:
+            if "flights" in existing_tables:
+                self._migrate_flights_table(connection)
+            connection.execute(text(self._flights_view_sql()))
+            connection.commit()
+        if not set(self.summary_tables) <= existing_tables:
+            # Backfill summaries added to a warehouse that already holds flights.
+            self.rebuild_summaries()
+        # Per connection, so kept out of self.metadata and created at the start of each load.
+        self.staging_tables = {table: self._create_staging_table(table) for table in self.tables.values()}
+        self.merge_statements = {table: self._merge_statement(table) for table in self.tables.values()}
 
     def _create_airlines_table(self) -> Table:
         return Table(
@@ -31,20 +164,31 @@ class SqliteLoader(Loader):
             Column("name", String),
         )
 
+    def _create_lookup_table(self, column: str) -> Table:
+        return Table(
+            f"lookup_{column}",
+            self.metadata,
+            Column("code", Integer, primary_key=True),
+            Column("value", String, nullable=False, unique=True),
+        )
+
     def _create_flights_table(self) -> Table:
+        def coded(name: str) -> Column:
+            return Column(name, Integer, ForeignKey(self.lookup_tables[name].c.code))
+
         return Table(
-            "flights",
+            "flight_facts",
             self.metadata,
             Column("flight_number", String, primary_key=True),
             Column("airline_id", Integer),
             Column("departure_datetime", DateTime),
             Column("arrival_datetime", DateTime),
-            Column("departure_time", DateTime),
-            Column("arrival_time", DateTime),
+            Column("departure_time", Time),
+            Column("arrival_time", Time),
             Column("booking_code", String),
-            Column("status", String),
+            coded("status"),
             Column("gate", String),
-            Column("terminal", String),
+            coded("terminal"),
             Column("baggage_claim", String),
             Column("duration_hours", Float),
             Column("layovers", Integer),
@@ -53,7 +197,7 @@ class SqliteLoader(Loader):
             Column("pilot", String),
             Column("cabin_crew", JSON),
             Column("in_flight_entertainment", Boolean),
-            Column("meal_option", String),
+            coded("meal_option"),
             Column("wifi_available", Boolean),
             Column("window_seat", Boolean),
             Column("aisle_seat", Boolean),
@@ -62,13 +206,347 @@ class SqliteLoader(Loader):
             Column("passenger", JSON),
         )
 
-    def load(self, data: Iterable[Event | Entity | Airline | Flight]) -> None:
+    @staticmethod
+    def _create_staging_table(table: Table) -> Table:
+        # staged_seq follows the load order, which breaks ties between rows of one key.
+        return Table(
+            f"staging_{table.name}",
+            MetaData(),
+            Column("staged_seq", Integer, primary_key=True),
+            *[Column(column.name, column.type) for column in table.columns],
+            prefixes=["TEMPORARY"],
+        )
+
+    def _merge_statement(self, table: Table):
+        """INSERT ... SELECT of the last staged row per key, updating keys already stored."""
+        staging = self.staging_tables[table]
+        names = [column.name for column in table.columns]
+        key = table.primary_key.columns[0].name
+        versioned = self.version_column is not None and self.version_column in table.c
+        order = [staging.c.staged_seq.desc()]
+        if versioned:
+            order.insert(0, staging.c[self.version_column].desc())
+        ranked = select(
+            *[staging.c[name] for name in names],
+            func.row_number().over(partition_by=staging.c[key], order_by=order).label("rank"),
+        ).subquery()
+        statement = insert(table).from_select(names, select(*[ranked.c[name] for name in names]).where(ranked.c.rank == 1))
+        where = None
+        if versioned:
+            stored = table.c[self.version_column]
+            where = or_(stored.is_(None), statement.excluded[self.version_column] >= stored)
+        statement = statement.on_conflict_do_update(
+            index_elements=[key],
+            set_={name: statement.excluded[name] for name in names if name != key},
+            where=where,
+        )
+        if table is self.flights_table and self.maintain_summaries:
+            # The rows actually written, so the summaries count exactly those.
+            statement = statement.returning(*table.c)
+        return statement
+
+    def _flights_view_sql(self) -> str:
+        """The flights view: flight_facts with each code replaced by its value."""
+        columns = []
+        joins = []
+        for column in self.flights_table.columns:
+            if column.name in self.lookup_tables:
+                lookup = self.lookup_tables[column.name].name
+                columns.append(f"{lookup}.value AS {column.name}")
+                joins.append(f"LEFT JOIN {lookup} ON {lookup}.code = f.{column.name}")
+            else:
+                columns.append(f"f.{column.name}")
+        return (f"CREATE VIEW IF NOT EXISTS flights AS SELECT {', '.join(columns)} "
+                f"FROM {self.flights_table.name} f {' '.join(joins)}")
+
+    def _migrate_flights_table(self, connection) -> None:
+        """Moves the rows of a plain flights table into flight_facts and drops it."""
+        print("Migrating the flights table to dictionary-encoded flight_facts...")
+        existing = {column["name"] for column in inspect(connection).get_columns("flights")}
+        names = [column.name for column in self.flights_table.columns if column.name in existing]
+        columns = []
+        for name in names:
+            lookup = self.lookup_tables.get(name)
+            if lookup is None:
+                columns.append(name)
+                continue
+            connection.execute(text(
+                f"INSERT OR IGNORE INTO {lookup.name} (value) "
+                f"SELECT DISTINCT {name} FROM flights WHERE {name} IS NOT NULL"
+            ))
+            columns.append(f"(SELECT code FROM {lookup.name} WHERE value = flights.{name})")
+        connection.execute(text(
+            f"INSERT INTO {self.flights_table.name} ({', '.join(names)}) SELECT {', '.join(columns)} FROM flights"
+        ))
+        # Its indexes go with it; they are rebuilt on flight_facts below.
+        connection.execute(text("DROP TABLE flights"))
+        connection.commit()
+        self._build_indexes(connection)
+
+    def _create_run_state_table(self) -> Table:
+        # Read by RunStateStore, which extractors use as their watermark store.
+        # Created from its DDL and reflected, so both share one definition.
+        with self.engine.begin() as connection:
+            connection.exec_driver_sql(RUN_STATE_DDL)
+        return Table(RUN_STATE_TABLE, self.metadata, autoload_with=self.engine)
+
+    def _create_dead_letters_table(self) -> Table:
+        return Table(
+            "dead_letters",
+            self.metadata,
+            Column("id", Integer, primary_key=True),
+            Column("stage", String),
+            Column("kind", String),
+            Column("record_id", String),
+            Column("source", String),
+            Column("payload", Text),
+            Column("error", Text),
+            Column("created_at", DateTime),
+        )
+
+    @staticmethod
+    def _disable_implicit_transactions(dbapi_connection, connection_record) -> None:
+        dbapi_connection.isolation_level = None
+
+    @staticmethod
+    def _begin(connection) -> None:
+        connection.exec_driver_sql("BEGIN")
+
+    def _apply_pragmas(self, dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        for name, value in self.pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    def _build_indexes(self, connection) -> None:
+        if not self.create_indexes:
+            return
+        for index in self.indexes:
+            index.create(connection, checkfirst=True)
+        connection.commit()
+
+    def rebuild_summaries(self) -> None:
+        """Recomputes the summary tables from the flights table."""
+        with self.engine.connect() as connection:
+            rebuild_summaries(connection, self.summary_tables)
+            connection.commit()
+
+    def _table_for(self, item: Record | Airline | Flight | RowBatch) -> Table | None:
+        if isinstance(item, RowBatch):
+            return self.tables.get(item.schema)
+        return self.tables.get(type(item))
+
+    @staticmethod
+    def _row_dicts(item: Airline | Flight | RowBatch) -> list[dict]:
+        if isinstance(item, RowBatch):
+            return [dict(zip(item.columns, row)) for row in item.rows]
+        return [item.model_dump()]
+
+    def _load_codes(self, connection) -> None:
+        # Re-read at the start of every load, as a failed load rolls back new codes.
+        self._codes = {
+            column: dict(connection.execute(select(table.c.value, table.c.code)).all())
+            for column, table in self.lookup_tables.items()
+        }
+
+    def _encode(self, connection, rows: list[dict]) -> list[dict]:
+        """Returns copies of flight rows with dictionary column values replaced by codes.
+
+        Values seen for the first time are added to their lookup table, in the
+        caller's transaction.
+        """
+        encoded = []
+        for row in rows:
+            row = dict(row)
+            for column, codes in self._codes.items():
+                value = row.get(column)
+                if value is None:
+                    continue
+                code = codes.get(value)
+                if code is None:
+                    result = connection.execute(self.lookup_tables[column].insert().values(value=value))
+                    code = codes[value] = result.inserted_primary_key[0]
+                row[column] = code
+            encoded.append(row)
+        return encoded
+
+    def _decode(self, rows: list[dict]) -> list[dict]:
+        """Replaces dictionary column codes in stored flight rows with their values, in place."""
+        values = {column: {code: value for value, code in codes.items()} for column, codes in self._codes.items()}
+        for row in rows:
+            for column, lookup in values.items():
+                if row.get(column) is not None:
+                    row[column] = lookup[row[column]]
+        return rows
+
+    def _prepare(self, connection) -> None:
+        self._load_codes(connection)
+        if self.mode == "upsert":
+            for staging in self.staging_tables.values():
+                staging.create(connection, checkfirst=True)
+
+    def _update_summaries(self, connection, flight_rows: list[dict], replaced_rows: list[dict] = ()) -> None:
+        if not self.maintain_summaries:
+            return
+        if flight_rows:
+            apply_deltas(connection, self.summary_tables, summarize(flight_rows))
+        if replaced_rows:
+            # After the new rows are counted, so recomputed extremes see them.
+            retract(connection, self.summary_tables, summarize(replaced_rows))
+
+    def _checkpoint(self, connection, checkpoint: Checkpoint) -> None:
+        statement = insert(self.run_state_table).values(
+            source_id=checkpoint.source_id, watermark=checkpoint.watermark, updated_at=datetime.datetime.now()
+        )
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=["source_id"],
+            set_={"watermark": statement.excluded.watermark, "updated_at": statement.excluded.updated_at},
+        ))
+
+    def _store_dead_letters(self, connection, dead_letters: list[DeadLetter]) -> None:
+        self.dead_letter_count += len(dead_letters)
+        now = datetime.datetime.now()
+        connection.execute(self.dead_letters_table.insert(), [
+            {
+                "stage": item.stage,
+                "kind": item.kind,
+                "record_id": item.record_id,
+                "source": item.source,
+                "payload": json.dumps(_json_safe(item.payload), default=str),
+                "error": item.error,
+                "created_at": now,
+            }
+            for item in dead_letters
+        ])
+
+    def _merge(self, connection, table: Table, params: list[dict]) -> tuple[list[dict], list[dict]]:
+        """Stages rows and merges them into table with one statement.
+
+        Returns the flight rows written and the stored rows they overwrote, as the
+        summaries need them; nothing for other tables or without summaries.
+        """
+        staging = self.staging_tables[table]
+        connection.execute(staging.insert(), params)
+        if table is not self.flights_table or not self.maintain_summaries:
+            connection.execute(self.merge_statements[table])
+            connection.execute(staging.delete())
+            return [], []
+
+        key = table.c.flight_number
+        stored = {
+            row["flight_number"]: dict(row)
+            for row in connection.execute(select(table).where(key.in_(select(staging.c.flight_number)))).mappings()
+        }
+        written = [dict(row) for row in connection.execute(self.merge_statements[table]).mappings()]
+        connection.execute(staging.delete())
+        replaced = [stored[row["flight_number"]] for row in written if row["flight_number"] in stored]
+        return self._decode(written), self._decode(replaced)
+
+    def _write_rows(self, connection, table: Table, rows: list[dict], params: list[dict]) -> tuple[list[dict], list[dict]]:
+        if self.mode == "upsert":
+            return self._merge(connection, table, params)
+        # A parameter list compiles the statement once and runs it via executemany.
+        connection.execute(table.insert(), params)
+        return rows, []
+
+    def _insert(self, connection, table: Table, rows: list[dict]) -> tuple[list[dict], list[dict]]:
+        """Writes rows in one statement and returns the rows written and the rows they replaced.
+
+        In dead-letter mode a batch that violates a constraint is rolled back to a
+        savepoint and retried row by row; rows that fail again become dead letters.
+        """
+        # Summaries and dead letters are built from the readable rows, not the codes.
+        params = self._encode(connection, rows) if table is self.flights_table else rows
+        if self.on_error == "raise":
+            return self._write_rows(connection, table, rows, params)
+        try:
+            with connection.begin_nested():
+                return self._write_rows(connection, table, rows, params)
+        except IntegrityError:
+            pass
+
+        written, replaced = [], []
+        kind, key = ("flight", "flight_number") if table is self.flights_table else ("airline", "airline_id")
+        for row, values in zip(rows, params):
+            try:
+                with connection.begin_nested():
+                    row_written, row_replaced = self._write_rows(connection, table, [row], [values])
+            except IntegrityError as e:
+                self._store_dead_letters(connection, [DeadLetter("load", kind, str(row[key]), None, row, str(e.orig))])
+                continue
+            written.extend(row_written)
+            replaced.extend(row_replaced)
+        return written, replaced
+
+    def _flush(self, connection, batches: dict[Table, list[dict]]) -> None:
+        for table, rows in batches.items():
+            if rows:
+                written, replaced = self._insert(connection, table, rows)
+                if table is self.flights_table:
+                    self._update_summaries(connection, written, replaced)
+                rows.clear()
+
+    def load(self, data: Iterable[Record | Airline | Flight | RowBatch | Checkpoint | DeadLetter]) -> None:
+        if self.batch_size is None:
+            self._load_rows(data)
+            return
+
+        with self.engine.connect() as connection:
+            self._prepare(connection)
+            batches = {self.airlines_table: [], self.flights_table: []}
+            pending = 0
+            # Once a checkpoint is seen, commit only at checkpoints, so that a failed
+            # run never leaves committed rows past its stored watermark.
+            checkpointed = False
+            for item in data:
+                if isinstance(item, Checkpoint):
+                    checkpointed = True
+                    self._flush(connection, batches)
+                    self._checkpoint(connection, item)
+                    connection.commit()
+                    pending = 0
+                    continue
+                if isinstance(item, DeadLetter):
+                    self._store_dead_letters(connection, [item])
+                    continue
+                table = self._table_for(item)
+                if table is None:
+                    continue
+                rows = self._row_dicts(item)
+                batches[table].extend(rows)
+                pending += len(rows)
+                if pending >= self.batch_size:
+                    self._flush(connection, batches)
+                    if not checkpointed:
+                        connection.commit()
+                    pending = 0
+            self._flush(connection, batches)
+            connection.commit()
+            self._build_indexes(connection)
+
+    def _load_rows(self, data: Iterable[Record | Airline | Flight | RowBatch | Checkpoint | DeadLetter]) -> None:
         with self.engine.connect() as connection:
+            self._prepare(connection)
+            flight_rows = []
+            replaced_rows = []
             for item in data:
-                if isinstance(item, Airline):
-                    stmt = self.airlines_table.insert().values(**item.dict())
-                    connection.execute(stmt)
-                elif isinstance(item, Flight):
-                    stmt = self.flights_table.insert().values(**item.dict())
-                    connection.execute(stmt)
+                if isinstance(item, Checkpoint):
+                    self._update_summaries(connection, flight_rows, replaced_rows)
+                    flight_rows, replaced_rows = [], []
+                    self._checkpoint(connection, item)
+                    connection.commit()
+                    continue
+                if isinstance(item, DeadLetter):
+                    self._store_dead_letters(connection, [item])
+                    continue
+                table = self._table_for(item)
+                if table is None:
+                    continue
+                for row in self._row_dicts(item):
+                    written, replaced = self._insert(connection, table, [row])
+                    if table is self.flights_table:
+                        flight_rows.extend(written)
+                        replaced_rows.extend(replaced)
+            self._update_summaries(connection, flight_rows, replaced_rows)
             connection.commit()
+            self._build_indexes(connection)
@@ -0,0 +1,231 @@
+"""Summary tables over `flights`, kept up to date batch by batch as rows are loaded.
+
+Each summary stores additive aggregates (counts, sums, minima, maxima) per group,
+so a batch's contribution is computed in Python and merged with one upsert per
+table. Rows whose group key is NULL are left out of that summary. Rows that an
+upsert overwrites are retracted the same way, with negated deltas.
+"""
+
+from typing import Iterable
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Connection,
+    Float,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    bindparam,
+    func,
+    text,
+)
+from sqlalchemy.dialects.sqlite import insert
+
+
+def create_summary_tables(metadata: MetaData) -> dict[str, Table]:
+    """Defines the summary tables on metadata, keyed by name."""
+    tables = [
+        Table(
+            "flight_status_counts",
+            metadata,
+            Column("airline_id", Integer, primary_key=True),
+            Column("status", String, primary_key=True),
+            Column("flights", Integer, nullable=False),
+        ),
+        Table(
+            "class_fare_stats",
+            metadata,
+            Column("class_of_service", String, primary_key=True),
+            Column("flights", Integer, nullable=False),
+            Column("fare_count", Integer, nullable=False),
+            Column("fare_sum", Float, nullable=False),
+            Column("fare_min", Float),
+            Column("fare_max", Float),
+        ),
+        Table(
+            "loyalty_points_by_membership",
+            metadata,
+            Column("reward_program_member", Boolean, primary_key=True),
+            Column("passengers", Integer, nullable=False),
+            Column("points_count", Integer, nullable=False),
+            Column("points_sum", Integer, nullable=False),
+        ),
+    ]
+    return {table.name: table for table in tables}
+
+
+def _add(group: dict, key, **deltas) -> None:
+    totals = group.setdefault(key, dict.fromkeys(deltas, 0))
+    for name, delta in deltas.items():
+        totals[name] += delta
+
+
+def _extreme(current, value, pick):
+    if value is None:
+        return current
+    return value if current is None else pick(current, value)
+
+
+def summarize(flight_rows: Iterable[dict]) -> dict[str, list[dict]]:
+    """Aggregates flight rows (with a nested passenger dict) into summary deltas."""
+    status_counts: dict = {}
+    fares: dict = {}
+    loyalty: dict = {}
+    for row in flight_rows:
+        passenger = row.get("passenger") or {}
+        if row.get("airline_id") is not None and row.get("status") is not None:
+            _add(status_counts, (row["airline_id"], row["status"]), flights=1)
+
+        class_of_service = passenger.get("class_of_service")
+        if class_of_service is not None:
+            fare = passenger.get("fare")
+            stats = fares.setdefault(
+                class_of_service, {"flights": 0, "fare_count": 0, "fare_sum": 0.0, "fare_min": None, "fare_max": None}
+            )
+            stats["flights"] += 1
+            if fare is not None:
+                stats["fare_count"] += 1
+                stats["fare_sum"] += fare
+                stats["fare_min"] = _extreme(stats["fare_min"], fare, min)
+                stats["fare_max"] = _extreme(stats["fare_max"], fare, max)
+
+        member = passenger.get("reward_program_member")
+        if member is not None:
+            points = passenger.get("loyalty_points")
+            _add(loyalty, member, passengers=1, points_count=int(points is not None), points_sum=points or 0)
+
+    return {
+        "flight_status_counts": [
+            {"airline_id": airline_id, "status": status, **totals}
+            for (airline_id, status), totals in status_counts.items()
+        ],
+        "class_fare_stats": [{"class_of_service": key, **stats} for key, stats in fares.items()],
+        "loyalty_points_by_membership": [
+            {"reward_program_member": key, **totals} for key, totals in loyalty.items()
+        ],
+    }
+
+
+def _merge_statement(table: Table):
+    """An upsert that adds a delta row onto the existing aggregates for its group."""
+    stmt = insert(table)
+    keys = [column.name for column in table.primary_key.columns]
+    merged = {}
+    for column in table.columns:
+        if column.name in keys:
+            continue
+        new = stmt.excluded[column.name]
+        if column.name.endswith("_min"):
+            merged[column.name] = func.min(func.coalesce(column, new), func.coalesce(new, column))
+        elif column.name.endswith("_max"):
+            merged[column.name] = func.max(func.coalesce(column, new), func.coalesce(new, column))
+        else:
+            merged[column.name] = column + new
+    return stmt.on_conflict_do_update(index_elements=keys, set_=merged)
+
+
+def apply_deltas(connection: Connection, tables: dict[str, Table], deltas: dict[str, list[dict]]) -> None:
+    """Merges summary deltas into the summary tables, in the caller's transaction."""
+    for name, rows in deltas.items():
+        if rows:
+            connection.execute(_merge_statement(tables[name]), rows)
+
+
+# The column counting the rows of each group; a group whose count drops to zero is removed.
+GROUP_COUNT_COLUMNS = {
+    "flight_status_counts": "flights",
+    "class_fare_stats": "flights",
+    "loyalty_points_by_membership": "passengers",
+}
+
+
+def _negate(table: Table, row: dict) -> dict:
+    keys = {column.name for column in table.primary_key.columns}
+    negated = {}
+    for column, value in row.items():
+        if column in keys:
+            negated[column] = value
+        elif column.endswith(("_min", "_max")):
+            negated[column] = None
+        else:
+            negated[column] = -value
+    return negated
+
+
+def _touches_extreme(retracted: dict, stored: dict) -> bool:
+    return (stored["fare_min"] is None or retracted["fare_min"] <= stored["fare_min"]
+            or stored["fare_max"] is None or retracted["fare_max"] >= stored["fare_max"])
+
+
+def retract(connection: Connection, tables: dict[str, Table], deltas: dict[str, list[dict]]) -> None:
+    """Takes the deltas of overwritten rows back out of the summary tables.
+
+    Counts and sums are subtracted. Minima and maxima cannot be, so a class whose
+    stored fare_min or fare_max may have come from a retracted fare is recomputed
+    from `flights`, which must already hold the rows that replaced them. Groups
+    left without rows are removed.
+    """
+    apply_deltas(connection, tables, {
+        name: [_negate(tables[name], row) for row in rows] for name, rows in deltas.items()
+    })
+
+    fares = tables.get("class_fare_stats")
+    retracted = {row["class_of_service"]: row for row in deltas.get("class_fare_stats", []) if row["fare_count"]}
+    if fares is not None and retracted:
+        stored = connection.execute(
+            fares.select().where(fares.c.class_of_service.in_(list(retracted)))
+        ).mappings().all()
+        stale = [row["class_of_service"] for row in stored if _touches_extreme(retracted[row["class_of_service"]], row)]
+        if stale:
+            statement = text(REFRESH_FARE_EXTREMES_SQL).bindparams(bindparam("classes", expanding=True))
+            connection.execute(statement, {"classes": stale})
+
+    for name, table in tables.items():
+        connection.execute(table.delete().where(table.c[GROUP_COUNT_COLUMNS[name]] <= 0))
+
+
+REFRESH_FARE_EXTREMES_SQL = """
+    UPDATE class_fare_stats SET
+        fare_min = (SELECT MIN(json_extract(passenger, '$.fare')) FROM flights
+                    WHERE json_extract(passenger, '$.class_of_service') = class_fare_stats.class_of_service),
+        fare_max = (SELECT MAX(json_extract(passenger, '$.fare')) FROM flights
+                    WHERE json_extract(passenger, '$.class_of_service') = class_fare_stats.class_of_service)
+    WHERE class_of_service IN :classes
+"""
+
+
+# Full recomputation from the fact table, used to backfill new summary tables.
+REBUILD_SQL = {
+    "flight_status_counts": """
+        INSERT INTO flight_status_counts (airline_id, status, flights)
+        SELECT airline_id, status, COUNT(*) FROM flights
+        WHERE airline_id IS NOT NULL AND status IS NOT NULL
+        GROUP BY airline_id, status
+    """,
+    "class_fare_stats": """
+        INSERT INTO class_fare_stats (class_of_service, flights, fare_count, fare_sum, fare_min, fare_max)
+        SELECT json_extract(passenger, '$.class_of_service'), COUNT(*),
+               COUNT(json_extract(passenger, '$.fare')), COALESCE(SUM(json_extract(passenger, '$.fare')), 0),
+               MIN(json_extract(passenger, '$.fare')), MAX(json_extract(passenger, '$.fare'))
+        FROM flights
+        WHERE json_extract(passenger, '$.class_of_service') IS NOT NULL
+        GROUP BY 1
+    """,
+    "loyalty_points_by_membership": """
+        INSERT INTO loyalty_points_by_membership (reward_program_member, passengers, points_count, points_sum)
+        SELECT json_extract(passenger, '$.reward_program_member'), COUNT(*),
+               COUNT(json_extract(passenger, '$.loyalty_points')),
+               COALESCE(SUM(json_extract(passenger, '$.loyalty_points')), 0)
+        FROM flights
+        WHERE json_extract(passenger, '$.reward_program_member') IS NOT NULL
+        GROUP BY 1
+    """,
+}
+
+
+def rebuild_summaries(connection: Connection, tables: dict[str, Table]) -> None:
+    """Recomputes every summary table from `flights`, in the caller's transaction."""
+    for name, table in tables.items():
+        connection.execute(table.delete())
+        connection.execute(text(REBUILD_SQL[name]))
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from dataclasses import dataclass
 from typing import Dict, Any, List, Optional
 import datetime
 
@@ -59,3 +60,15 @@ class Flight(BaseModel):
     emergency_exit_row: Optional[bool] = None
     number_of_stops: Optional[int] = None
     passenger: Passenger
+
+
+@dataclass(slots=True)
+class RowBatch:
+    """Validated rows for one schema, as tuples in `columns` order.
+
+    Emitted in place of individual models when a transformer validates whole
+    batches, so the loader can insert them without per-row model construction.
+    """
+    schema: type[BaseModel]
+    columns: List[str]
+    rows: List[tuple]
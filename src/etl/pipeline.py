@@ -1,12 +1,207 @@
+import queue
+import threading
+import time
+from itertools import batched
+from typing import Any, Callable, Iterable, Iterator
 from src.etl.abstractions import Extractor, Transformer, Loader
+from src.etl.instrumentation import Instrumentation
+
+# Marks the end of a stage's output on its queue.
+_DONE = object()
+
+# How often blocked queue operations re-check for a failed stage.
+_POLL_SECONDS = 0.1
+
+
+class _Aborted(Exception):
+    """Raised inside a stage when another stage has failed."""
+
+
+def _until_end(items: Iterable, ended: threading.Event) -> Iterator:
+    """Yields items, setting ended once the consumer has pulled past the last one."""
+    yield from items
+    ended.set()
+
+
+class _StageQueue:
+    """A bounded queue of record batches between two pipeline stages.
+
+    Producers block when the queue is full (backpressure). Both sides give up
+    with _Aborted once the shared stop event is set, so a failure in any stage
+    unblocks every other stage.
+    """
+
+    def __init__(self, depth: int, stop: threading.Event, waits: dict[str, float]):
+        self._queue = queue.Queue(maxsize=depth)
+        self._stop = stop
+        self._waits = waits
+
+    def put(self, stage: str, batch: Any) -> None:
+        start = time.perf_counter()
+        try:
+            while True:
+                if self._stop.is_set():
+                    raise _Aborted()
+                try:
+                    self._queue.put(batch, timeout=_POLL_SECONDS)
+                    return
+                except queue.Full:
+                    continue
+        finally:
+            self._waits[stage] += time.perf_counter() - start
+
+    def drain(self, stage: str) -> Iterator[Any]:
+        """Yields records from queued batches until the producer is done."""
+        while True:
+            start = time.perf_counter()
+            try:
+                while True:
+                    if self._stop.is_set():
+                        raise _Aborted()
+                    try:
+                        batch = self._queue.get(timeout=_POLL_SECONDS)
+                        break
+                    except queue.Empty:
+                        continue
+            finally:
+                self._waits[stage] += time.perf_counter() - start
+            if batch is _DONE:
+                return
+            yield from batch
+
 
 class Pipeline:
-    def __init__(self, extractor: Extractor, transformer: Transformer, loader: Loader):
+    def __init__(
+        self,
+        extractor: Extractor,
+        transformer: Transformer,
+        loader: Loader,
+        concurrent: bool = False,
+        queue_depth: int = 8,
+        batch_size: int = 1000,
+        instrumentation: Instrumentation | None = None,
+    ):
+        """Runs extract, transform and load over a stream of records.
+
+        Args:
+            extractor: Produces raw records.
+            transformer: Maps raw records onto the target schemas.
+            loader: Persists transformed records.
+            concurrent: Run each stage in its own thread, connected by bounded
+                queues, so loader I/O overlaps parsing and validation.
+            queue_depth: Batches buffered between two stages in concurrent mode.
+            batch_size: Records per queued batch in concurrent mode.
+            instrumentation: Collects per-stage metrics and profiles during run().
+                The report is kept in self.metrics. Its trace_memory and
+                profile_stage options are sequential-only.
+
+        Raises:
+            ValueError: If concurrent is combined with trace_memory or profile_stage.
+                tracemalloc and cProfile capture the whole process, so with every
+                stage in its own thread they would charge one stage for the others.
+        """
+        if concurrent and instrumentation is not None and (
+                instrumentation.trace_memory or instrumentation.profile_stage is not None):
+            raise ValueError("trace_memory and profile_stage need concurrent=False")
         self.extractor = extractor
         self.transformer = transformer
         self.loader = loader
+        self.concurrent = concurrent
+        self.queue_depth = queue_depth
+        self.batch_size = batch_size
+        self.instrumentation = instrumentation
+        self.stage_timings: dict[str, dict[str, float]] = {}
+        self.metrics: dict | None = None
+
+    def run(self) -> None:
+        if self.instrumentation is None:
+            self._run(self.extractor, self.transformer, self.loader)
+            return
+        extractor, transformer, loader = self.instrumentation.wrap(self.extractor, self.transformer, self.loader)
+        self.instrumentation.start()
+        try:
+            self._run(extractor, transformer, loader)
+        finally:
+            self.metrics = self.instrumentation.finish()
+
+    def _run(self, extractor: Extractor, transformer: Transformer, loader: Loader) -> None:
+        if self.concurrent:
+            self._run_concurrent(extractor, transformer, loader)
+            return
+        extracted_data = extractor.extract()
+        transformed_data = transformer.transform(extracted_data)
+        ended = threading.Event()
+        loader.load(_until_end(transformed_data, ended))
+        # Stages read ahead of the loader, so an extractor's progress overstates
+        # what a loader that stopped early has stored.
+        if ended.is_set():
+            extractor.commit()
+
+    def _run_concurrent(self, extractor: Extractor, transformer: Transformer, loader: Loader) -> None:
+        """Runs the stages in parallel threads and keeps per-stage timings in self.stage_timings.
+
+        Raises:
+            The first exception raised by any stage, after all stages have stopped.
+        """
+        stop = threading.Event()
+        errors: list[BaseException] = []
+        ended = threading.Event()
+        waits = {'extract': 0.0, 'transform': 0.0, 'load': 0.0}
+        walls: dict[str, float] = {}
+        extracted = _StageQueue(self.queue_depth, stop, waits)
+        transformed = _StageQueue(self.queue_depth, stop, waits)
+
+        def produce(stage: str, records: Iterable, output: _StageQueue) -> None:
+            try:
+                for batch in batched(records, self.batch_size):
+                    output.put(stage, batch)
+                output.put(stage, _DONE)
+            finally:
+                # Release the upstream generator (files, cursors) even on abort.
+                close = getattr(records, 'close', None)
+                if close is not None:
+                    close()
+
+        def run_stage(stage: str, body: Callable[[], None]) -> None:
+            start = time.perf_counter()
+            try:
+                body()
+            except _Aborted:
+                pass
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+            finally:
+                walls[stage] = time.perf_counter() - start
+                if stage == 'load':
+                    # A loader that returns early must not leave producers blocked.
+                    stop.set()
+
+        stages = {
+            'extract': lambda: produce('extract', extractor.extract(), extracted),
+            'transform': lambda: produce(
+                'transform', transformer.transform(extracted.drain('transform')), transformed
+            ),
+            'load': lambda: loader.load(_until_end(transformed.drain('load'), ended)),
+        }
+        threads = [
+            threading.Thread(target=run_stage, args=(stage, body), name=f"pipeline-{stage}")
+            for stage, body in stages.items()
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        total = time.perf_counter() - start
+
+        if errors:
+            raise errors[0]
+        if ended.is_set():
+            extractor.commit()
 
-    def run(self):
-        extracted_data = self.extractor.extract()
-        transformed_data = self.transformer.transform(extracted_data)
-        self.loader.load(transformed_data)
+        self.stage_timings = {
+            stage: {'wall': walls[stage], 'waiting': waits[stage], 'busy': walls[stage] - waits[stage]}
+            for stage in stages
+        }
+        self.stage_timings['total'] = {'wall': total}
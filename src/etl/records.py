@@ -0,0 +1,115 @@
+"""Compact records passed between pipeline stages.
+
+Extractors yield these instead of the pydantic Event and Entity models. A record
+keeps its row as a tuple next to a ColumnIndex shared by every record from the
+same source, so a row costs one small object and one tuple rather than a model,
+a validated dict copy and its hash table. Validation happens once, when the
+transformer maps records onto the target schemas.
+
+Records expose the same attributes as the models they replace, and to_model()
+builds the model when one is needed. Checkpoints and dead letters travel in the
+same stream and are stored by the loader.
+"""
+
+import datetime
+from dataclasses import dataclass
+from typing import Any, Iterable, Union
+
+
+class ColumnIndex:
+    """Column names of a source and their positions in each record's values."""
+    __slots__ = ('names', 'positions')
+
+    def __init__(self, names: Iterable[str]):
+        self.names = tuple(names)
+        self.positions = {name: position for position, name in enumerate(self.names)}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, ColumnIndex) and self.names == other.names
+
+    def __hash__(self) -> int:
+        return hash(self.names)
+
+    def __repr__(self) -> str:
+        return f"ColumnIndex({list(self.names)!r})"
+
+    def __reduce__(self):
+        return ColumnIndex, (self.names,)
+
+
+@dataclass(slots=True)
+class EventRecord:
+    event_id: str
+    event_type: str
+    timestamp: datetime.datetime
+    source: str
+    columns: ColumnIndex
+    values: tuple
+
+    def get(self, name: str, default: Any = None) -> Any:
+        position = self.columns.positions.get(name)
+        return default if position is None else self.values[position]
+
+    @property
+    def payload(self) -> dict[str, Any]:
+        """The row as a new dict, as on Event."""
+        return dict(zip(self.columns.names, self.values))
+
+    def to_model(self) -> "Event":
+        from src.etl.models import Event
+        return Event(event_id=self.event_id, event_type=self.event_type, timestamp=self.timestamp,
+                     source=self.source, payload=self.payload)
+
+
+@dataclass(slots=True)
+class EntityRecord:
+    entity_id: str
+    entity_type: str
+    source: str
+    columns: ColumnIndex
+    values: tuple
+
+    def get(self, name: str, default: Any = None) -> Any:
+        position = self.columns.positions.get(name)
+        return default if position is None else self.values[position]
+
+    @property
+    def attributes(self) -> dict[str, Any]:
+        """The row as a new dict, as on Entity."""
+        return dict(zip(self.columns.names, self.values))
+
+    def to_model(self) -> "Entity":
+        from src.etl.models import Entity
+        return Entity(entity_id=self.entity_id, entity_type=self.entity_type, source=self.source,
+                      attributes=self.attributes)
+
+
+# The models are named rather than imported, so that importing records, e.g. for
+# a no-op incremental run, does not load pydantic.
+Record = Union["Event", "Entity", EventRecord, EntityRecord]
+
+
+@dataclass(slots=True)
+class Checkpoint:
+    """Marks that a source's records up to here have all been yielded.
+
+    Incremental extractors emit one before their first record and one after each
+    chunk. Transformers pass them through in order, and SqliteLoader commits at
+    each one, storing the watermark in the same transaction as the rows it covers.
+    """
+    source_id: str
+    watermark: dict
+
+
+@dataclass(slots=True)
+class DeadLetter:
+    """A record that failed a stage, set aside instead of aborting the run."""
+    stage: str
+    kind: str | None
+    record_id: str | None
+    source: str | None
+    payload: dict[str, Any]
+    error: str
@@ -0,0 +1,61 @@
+import datetime
+import json
+import os
+import sqlite3
+from typing import Any
+
+# Shared with SqliteLoader, which creates the table from this DDL and reflects
+# it, so the two writers cannot disagree about its columns.
+RUN_STATE_TABLE = "run_state"
+
+RUN_STATE_DDL = f"""
+CREATE TABLE IF NOT EXISTS {RUN_STATE_TABLE} (
+    source_id VARCHAR NOT NULL PRIMARY KEY,
+    watermark JSON NOT NULL,
+    updated_at DATETIME
+)
+"""
+
+
+class RunStateStore:
+    """Keeps each source's watermark in the warehouse, in the run_state table.
+
+    A drop-in replacement for WatermarkStore. SqliteLoader records checkpoints in
+    this table in the transaction that commits the rows they cover, so a run
+    that fails part way resumes after the last committed chunk.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.db_path)
+        connection.execute(RUN_STATE_DDL)
+        return connection
+
+    def get(self, source_id: str) -> dict | None:
+        if not os.path.exists(self.db_path):
+            return None
+        with self._connect() as connection:
+            row = connection.execute(
+                f"SELECT watermark FROM {RUN_STATE_TABLE} WHERE source_id = ?", (source_id,)
+            ).fetchone()
+        connection.close()
+        return None if row is None else json.loads(row[0])
+
+    def set(self, source_id: str, watermark: dict[str, Any]) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                f"INSERT INTO {RUN_STATE_TABLE} (source_id, watermark, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (source_id) DO UPDATE SET watermark = excluded.watermark, updated_at = excluded.updated_at",
+                (source_id, json.dumps(watermark), datetime.datetime.now().isoformat(sep=" ")),
+            )
+        connection.close()
+
+    def reset(self, source_id: str) -> None:
+        """Forgets a source's watermark so its next run is a full reload."""
+        if not os.path.exists(self.db_path):
+            return
+        with self._connect() as connection:
+            connection.execute(f"DELETE FROM {RUN_STATE_TABLE} WHERE source_id = ?", (source_id,))
+        connection.close()
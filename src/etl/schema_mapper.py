@@ -1,15 +1,86 @@
-import json
-import google.generativeai as genai
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
 from src import config
-from pydantic import BaseModel
+from src.disk_cache import DiskCache, get_mapping_cache, mapping_cache_key
+from src.etl.column_matcher import ColumnMatcher
+from src.lazy import lazy_import
+
+if TYPE_CHECKING:
+    from pydantic import BaseModel
+    from src.llm_client import LLMClient
+
+pydantic = lazy_import("pydantic")
+llm_client = lazy_import("src.llm_client")
+
+
+def _snake_case(name: str) -> str:
+    return "".join(f"_{char.lower()}" if char.isupper() else char for char in name).lstrip("_")
+
+
+def _nested_model(annotation) -> type[BaseModel] | None:
+    if isinstance(annotation, type) and issubclass(annotation, pydantic.BaseModel):
+        return annotation
+    return None
+
+
+def target_fields(target_schema: type[BaseModel]) -> tuple[list[str], dict[str, list[str]]]:
+    """Lists the column-level fields of a schema, flattening nested models.
+
+    Nested models such as Flight.passenger are not columns themselves; their fields
+    are mapped individually. Each field also gets an alias prefixed with the name of
+    the model that owns it, so "airline_name" can match Airline.name.
+
+    Returns:
+        The field names and a dictionary of aliases per field.
+    """
+    fields = []
+    aliases = {}
+    for name, field in target_schema.model_fields.items():
+        nested = _nested_model(field.annotation)
+        if nested is None:
+            fields.append(name)
+            aliases[name] = [f"{_snake_case(target_schema.__name__)}_{name}"]
+        else:
+            for nested_name in nested.model_fields:
+                fields.append(nested_name)
+                aliases[nested_name] = [f"{name}_{nested_name}"]
+    return fields, aliases
+
 
 class SchemaMapper:
-    def __init__(self, model_name: str = config.GEMINI_MODEL):
-        genai.configure(api_key=config.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel(model_name)
+    def __init__(
+        self,
+        model_name: str = config.GEMINI_MODEL,
+        cache: DiskCache | None = None,
+        matcher: ColumnMatcher | None = None,
+        client: LLMClient | None = None,
+    ):
+        self.model_name = model_name
+        self.cache = cache if cache is not None else get_mapping_cache()
+        self.matcher = matcher if matcher is not None else ColumnMatcher()
+        self._client = client
+
+    @property
+    def client(self) -> LLMClient:
+        # Resolved on first use so that cached mappings never touch the API client.
+        if self._client is None:
+            self._client = llm_client.get_client(self.model_name)
+        return self._client
+
+    def _cache_key(self, source_columns: list[str], target_schema: BaseModel) -> str:
+        fields, _ = target_fields(target_schema)
+        return mapping_cache_key(source_columns, fields, self.model_name)
+
+    def invalidate_mapping(self, source_columns: list[str], target_schema: BaseModel) -> bool:
+        """Drops the cached mapping for these columns so the next call asks Gemini again."""
+        return self.cache.invalidate(self._cache_key(source_columns, target_schema))
 
     def get_schema_mapping(self, source_columns: list[str], target_schema: BaseModel) -> dict:
-        """Gets column mapping from Gemini API.
+        """Gets column mapping from the cache, the local matcher or the Gemini API.
+
+        Columns the local matcher resolves confidently never reach Gemini; only the
+        leftover columns and fields are sent, and only if both remain.
 
         Args:
             source_columns: A list of raw column names from the source data.
@@ -18,7 +89,50 @@ class SchemaMapper:
         Returns:
             A dictionary mapping raw column names to target column names.
         """
-        prompt = f"""
+        return self.get_schema_mappings([(source_columns, target_schema)])[0]
+
+    def get_schema_mappings(self, sources: list[tuple[list[str], BaseModel]]) -> list[dict]:
+        """Gets the mappings for several sources, sending their Gemini requests concurrently.
+
+        Args:
+            sources: (source_columns, target_schema) pairs, as for get_schema_mapping.
+
+        Returns:
+            The mapping for each pair, in order.
+        """
+        mappings = []
+        resolved = []
+        requests = []
+        for source_columns, target_schema in sources:
+            cache_key = self._cache_key(source_columns, target_schema)
+            cached_mapping = self.cache.get(cache_key)
+            if cached_mapping is not None:
+                mappings.append(cached_mapping)
+                continue
+
+            fields, aliases = target_fields(target_schema)
+            mapping = self.matcher.match(source_columns, fields, aliases)
+            unresolved_columns = [column for column in source_columns if column not in mapping]
+            unresolved_fields = [field for field in fields if field not in mapping.values()]
+            if unresolved_columns and unresolved_fields:
+                prompt = self._mapping_prompt(unresolved_columns, unresolved_fields)
+                requests.append((mapping, unresolved_columns, unresolved_fields, self.client.submit(prompt)))
+            mappings.append(mapping)
+            resolved.append((cache_key, mapping))
+
+        for mapping, unresolved_columns, unresolved_fields, response in requests:
+            llm_mapping = llm_client.parse_json_response(response.result())
+            mapping.update({
+                source: target for source, target in llm_mapping.items()
+                if source in unresolved_columns and target in unresolved_fields
+            })
+        for cache_key, mapping in resolved:
+            self.cache.set(cache_key, mapping)
+        return mappings
+
+    @staticmethod
+    def _mapping_prompt(source_columns: list[str], fields: list[str]) -> str:
+        return f"""
         You are a data mapping expert. Given a list of raw column names and a target Pydantic schema,
         generate a JSON object that maps the raw column names to the target schema's field names.
 
@@ -36,11 +150,6 @@ class SchemaMapper:
 
         Target Schema:
         ```python
-        target_schema = {list(target_schema.model_fields.keys())}
+        target_schema = {fields}
         ```
         """
-
-        response = self.model.generate_content(prompt)
-        # Clean the response to extract only the JSON part
-        cleaned_response = response.text.strip().replace("```json", "").replace("```", "")
-        return json.loads(cleaned_response)
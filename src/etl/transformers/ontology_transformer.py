@@ -1,47 +1,376 @@
-from typing import Iterable
+import functools
+import math
+from itertools import batched, groupby
+from operator import itemgetter
+from types import UnionType
+from typing import Any, Callable, Iterable, Union, get_args, get_origin
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from pydantic.fields import FieldInfo
 from src.etl.abstractions import Transformer
-from src.etl.models import Event, Entity, Airline, Flight, Passenger
+from src.etl.models import Event, Entity, Airline, Flight, Passenger, RowBatch
+from src.etl.records import DeadLetter, EventRecord, EntityRecord, Record
 from src.etl.schema_mapper import SchemaMapper
 
+# Spellings pydantic does not parse as booleans but partner exports use.
+BOOL_STRINGS = {"available": True, "not available": False}
+
+SCHEMAS = {'flight': Flight, 'airline': Airline}
+
+
+def _is_missing(value: Any) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _coerce_value(value: Any) -> Any:
+    return None if _is_missing(value) else value
+
+
+def _coerce_str(value: Any) -> Any:
+    if _is_missing(value):
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return value
+
+
+def _coerce_list(value: Any) -> Any:
+    if _is_missing(value):
+        return None
+    if isinstance(value, str):
+        return [part.strip() for part in value.split(',') if part.strip()]
+    return value
+
+
+def _coerce_list_column(values: list) -> list:
+    """_coerce_list over a column, with strings split inline rather than per call."""
+    coerced = []
+    for value in values:
+        if type(value) is not str:
+            coerced.append(_coerce_list(value))
+        elif ',' in value:
+            coerced.append([part for part in map(str.strip, value.split(',')) if part])
+        else:
+            # Most values hold a single item.
+            stripped = value.strip()
+            coerced.append([stripped] if stripped else [])
+    return coerced
+
+
+def _coerce_bool(value: Any) -> Any:
+    if _is_missing(value):
+        return None
+    if isinstance(value, str):
+        return BOOL_STRINGS.get(value.strip().lower(), value)
+    return value
+
+
+def _coercer_for(annotation: Any) -> Callable[[Any], Any]:
+    """Picks the raw-value normalization applied before pydantic validation."""
+    if get_origin(annotation) in (Union, UnionType):
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            annotation = args[0]
+    if annotation is str:
+        return _coerce_str
+    if annotation is bool:
+        return _coerce_bool
+    if get_origin(annotation) is list:
+        return _coerce_list
+    return _coerce_value
+
+
+def _nested_model(field: FieldInfo) -> type[BaseModel] | None:
+    if isinstance(field.annotation, type) and issubclass(field.annotation, BaseModel):
+        return field.annotation
+    return None
+
+
+def _column_coercer(coerce: Callable[[Any], Any]) -> Callable[[list], list]:
+    """Lifts a value coercer to a whole column.
+
+    Str values pass through without a call, and ints only need str(). Bool columns repeat a few spellings
+    ("Yes", "Not Available"), so each distinct value is coerced once and looked
+    up per row.
+    """
+    if coerce is _coerce_value:
+        # Only NaN compares unequal to itself.
+        return lambda values: [None if value != value else value for value in values]
+    if coerce is _coerce_str:
+        # Ints, such as numeric codes, are never missing and only need str().
+        return lambda values: [value if type(value) is str else str(value) if type(value) is int else coerce(value)
+                               for value in values]
+    if coerce is _coerce_list:
+        return _coerce_list_column
+
+    def coerce_distinct(values: list) -> list:
+        # NaN is looked up by identity, so each NaN object is coerced once.
+        coerced = {value: coerce(value) for value in set(values)}
+        return list(map(coerced.__getitem__, values))
+    return coerce_distinct
+
+
+def _exact_types(annotation: Any) -> frozenset[type] | None:
+    """The value types that need no validation for a scalar annotation, or None."""
+    types = set()
+    for arg in get_args(annotation) if get_origin(annotation) in (Union, UnionType) else (annotation,):
+        if arg not in (str, bool, int, float, type(None)):
+            return None
+        types.add(arg)
+    return frozenset(types)
+
+
+COERCERS = {
+    name: _coercer_for(field.annotation)
+    for schema in (Flight, Passenger, Airline)
+    for name, field in schema.model_fields.items()
+}
+COLUMN_COERCERS = {name: _column_coercer(coerce) for name, coerce in COERCERS.items()}
+# Columns whose coerced values all have one of these types are valid as they are,
+# e.g. an Optional[str] column of strings and Nones, and skip the TypeAdapter pass.
+EXACT_TYPES = {
+    name: _exact_types(field.annotation)
+    for schema in (Flight, Passenger, Airline)
+    for name, field in schema.model_fields.items()
+}
+
+
+@functools.cache
+def _list_adapter(annotation: Any) -> TypeAdapter:
+    return TypeAdapter(list[annotation])
+
+
+class _MissingField(Exception):
+    """A required field has no source column; the row path reports it precisely."""
+
+
+def _record_kind(item: Any) -> str | None:
+    if isinstance(item, (EventRecord, Event)) and item.event_type == 'flight':
+        return 'flight'
+    if isinstance(item, (EntityRecord, Entity)) and item.entity_type == 'airline':
+        return 'airline'
+    return None
+
+
+def _group_key(item: Any) -> tuple:
+    # Records from different files of one kind may name their columns differently.
+    if type(item) is EventRecord:
+        # The common case, checked without the isinstance chain.
+        return 'flight' if item.event_type == 'flight' else None, item.columns
+    columns = item.columns if isinstance(item, (EventRecord, EntityRecord)) else None
+    return _record_kind(item), columns
+
+
+def _record_fields(item: Record) -> dict:
+    return item.payload if isinstance(item, (EventRecord, Event)) else item.attributes
+
+
+def _source_columns(item: Record) -> list[str]:
+    if isinstance(item, (EventRecord, EntityRecord)):
+        return list(item.columns.names)
+    return list(_record_fields(item).keys())
+
+
+def _column_reader(items: list[Record]) -> Callable[[str], list | None]:
+    """Returns a function reading one source column across items, or None if it is absent.
+
+    Records sharing one ColumnIndex are read by position from their value tuples;
+    anything else goes through a dict per record.
+    """
+    first = items[0]
+    if isinstance(first, (EventRecord, EntityRecord)) and all(
+            isinstance(item, (EventRecord, EntityRecord)) and item.columns is first.columns for item in items):
+        rows = [item.values for item in items]
+
+        def read(source_key: str) -> list | None:
+            position = first.columns.positions.get(source_key)
+            return None if position is None else list(map(itemgetter(position), rows))
+        return read
+
+    payloads = [_record_fields(item) for item in items]
+
+    def read(source_key: str) -> list | None:
+        try:
+            return list(map(itemgetter(source_key), payloads))
+        except KeyError:
+            return [payload.get(source_key) for payload in payloads]
+    return read
+
+
 class OntologyTransformer(Transformer):
-    def __init__(self, schema_mapper: SchemaMapper):
+    def __init__(self, schema_mapper: SchemaMapper, batch_size: int | None = None, emit: str = 'models',
+                 on_error: str = 'raise'):
+        """Maps raw records onto the Flight and Airline schemas.
+
+        Args:
+            schema_mapper: Resolves raw column names to schema fields.
+            batch_size: Records mapped and validated together, one column at a time.
+                None transforms and validates row by row.
+            emit: 'models' yields Flight/Airline instances. 'rows' yields a RowBatch of
+                validated tuples per batch, which SqliteLoader inserts without building
+                models; it applies only when batch_size is set.
+            on_error: 'raise' stops the run at the first record that fails validation.
+                'dead_letter' yields a DeadLetter in its place and carries on.
+        """
+        if emit not in ('models', 'rows'):
+            raise ValueError(f"emit must be 'models' or 'rows', got {emit!r}")
+        if on_error not in ('raise', 'dead_letter'):
+            raise ValueError(f"on_error must be 'raise' or 'dead_letter', got {on_error!r}")
         self.schema_mapper = schema_mapper
+        self.batch_size = batch_size
+        self.emit = emit
+        self.on_error = on_error
+        # Keyed by (record kind, source columns): every header gets its own mapping.
         self.mapping_cache = {}
 
-    def transform(self, data: Iterable[Event | Entity]) -> Iterable[Event | Entity]:
-        for item in data:
-            if isinstance(item, Event) and item.event_type == 'flight':
-                if 'flight' not in self.mapping_cache:
-                    source_columns = list(item.payload.keys())
-                    target_schema = Flight
-                    self.mapping_cache['flight'] = self.schema_mapper.get_schema_mapping(source_columns, target_schema)
-                mapping = self.mapping_cache['flight']
-
-                # This is a simplified transformation. A more robust implementation
-                # would handle data type conversions and validations.
-                flight_data = {target_key: item.payload.get(source_key) for source_key, target_key in mapping.items()}
-                
-                # Create Passenger object
-                passenger_data = {}
-                if 'passngr_nm' in item.payload:
-                    passenger_data['name'] = item.payload['passngr_nm']
-
-                for key in list(Passenger.model_fields.keys()):
-                    if key in flight_data:
-                        passenger_data[key] = flight_data.pop(key)
-                
-                flight_data['passenger'] = Passenger(**passenger_data)
-
-                yield Flight(**flight_data)
-
-            elif isinstance(item, Entity) and item.entity_type == 'airline':
-                if 'airline' not in self.mapping_cache:
-                    source_columns = list(item.attributes.keys())
-                    target_schema = Airline
-                    self.mapping_cache['airline'] = self.schema_mapper.get_schema_mapping(source_columns, target_schema)
-                mapping = self.mapping_cache['airline']
-
-                airline_data = {target_key: item.attributes.get(source_key) for source_key, target_key in mapping.items()}
-                yield Airline(**airline_data)
+    def _get_mapping(self, kind: str, source_columns: list[str]) -> dict:
+        key = (kind, tuple(source_columns))
+        if key not in self.mapping_cache:
+            self.mapping_cache[key] = self.schema_mapper.get_schema_mapping(source_columns, SCHEMAS[kind])
+        return self.mapping_cache[key]
+
+    def prefetch_mappings(self, sources: dict[str, list[str]] | Iterable[tuple[str, list[str]]]) -> dict:
+        """Resolves the mappings for several sources up front, concurrently if the
+        schema mapper supports it.
+
+        Args:
+            sources: (record kind, raw column names) pairs, one per source header, or
+                a dictionary of them, e.g. {'airline': [...], 'flight': [...]}.
+
+        Returns:
+            The mapping cache, keyed by (record kind, source columns).
+        """
+        pairs = sources.items() if isinstance(sources, dict) else sources
+        keys = list(dict.fromkeys((kind, tuple(columns)) for kind, columns in pairs))
+        keys = [key for key in keys if key not in self.mapping_cache]
+        get_mappings = getattr(self.schema_mapper, 'get_schema_mappings', None)
+        if get_mappings is None:
+            for kind, columns in keys:
+                self._get_mapping(kind, list(columns))
+        elif keys:
+            mappings = get_mappings([(list(columns), SCHEMAS[kind]) for kind, columns in keys])
+            self.mapping_cache.update(zip(keys, mappings))
+        return self.mapping_cache
+
+    def resolve_mappings(self, items: Iterable[Record]) -> dict:
+        """Resolves the column mapping for every record kind and header in items.
+
+        Returns:
+            The mapping cache, keyed by (record kind, source columns).
+        """
+        seen = set()
+        for item in items:
+            key = _group_key(item)
+            if key[0] is not None and key not in seen:
+                seen.add(key)
+                self._get_mapping(key[0], _source_columns(item))
+        return self.mapping_cache
+
+    def transform(self, data: Iterable[Record]) -> Iterable[Any]:
+        if self.batch_size is None:
+            for item in data:
+                yield self._checked_transform_item(item)
+        else:
+            for batch in batched(data, self.batch_size):
+                # Consecutive records of one kind and header are validated together;
+                # order is kept.
+                for (kind, _), group in groupby(batch, key=_group_key):
+                    if kind is None:
+                        yield from group
+                    else:
+                        yield from self._transform_group(kind, list(group))
+
+    def _checked_transform_item(self, item: Record) -> Any:
+        if self.on_error == 'raise':
+            return self._transform_item(item)
+        try:
+            return self._transform_item(item)
+        except ValidationError as e:
+            record_id = item.event_id if isinstance(item, (EventRecord, Event)) else item.entity_id
+            return DeadLetter('transform', _record_kind(item), record_id, item.source, _record_fields(item), str(e))
+
+    def _transform_item(self, item: Record) -> Any:
+        kind = _record_kind(item)
+        if kind == 'flight':
+            fields = _record_fields(item)
+            mapping = self._get_mapping('flight', list(fields.keys()))
+
+            flight_data = {target_key: COERCERS.get(target_key, _coerce_value)(fields.get(source_key))
+                           for source_key, target_key in mapping.items()}
+
+            # Create Passenger object
+            passenger_data = {}
+            if 'passngr_nm' in fields:
+                passenger_data['name'] = fields['passngr_nm']
+
+            for key in list(Passenger.model_fields.keys()):
+                if key in flight_data:
+                    passenger_data[key] = flight_data.pop(key)
+
+            flight_data['passenger'] = Passenger(**passenger_data)
+
+            return Flight(**flight_data)
+
+        elif kind == 'airline':
+            fields = _record_fields(item)
+            mapping = self._get_mapping('airline', list(fields.keys()))
+
+            airline_data = {target_key: COERCERS.get(target_key, _coerce_value)(fields.get(source_key))
+                            for source_key, target_key in mapping.items()}
+            return Airline(**airline_data)
+        else:
+            return item
+
+    def _transform_group(self, kind: str, items: list[Record]) -> list:
+        schema = SCHEMAS[kind]
+        source_columns = _source_columns(items[0])
+        mapping = self._get_mapping(kind, source_columns)
+        try:
+            rows = self._rows(schema, mapping, source_columns, _column_reader(items), len(items))
+            if self.emit == 'rows':
+                return [RowBatch(schema=schema, columns=list(schema.model_fields), rows=rows)]
+            names = list(schema.model_fields)
+            return _list_adapter(schema).validate_python([dict(zip(names, row)) for row in rows])
+        except (ValidationError, _MissingField):
+            # Re-run row by row so the error raised names the same row and fields
+            # as the unbatched path would.
+            return [self._checked_transform_item(item) for item in items]
+
+    def _rows(self, schema: type[BaseModel], mapping: dict, source_columns: list[str],
+              read: Callable[[str], list | None], count: int) -> list[tuple]:
+        """Builds rows in schema field order from per-column coerced values.
+
+        In 'rows' mode each column is validated with a single TypeAdapter call, so no
+        per-row model is built. In 'models' mode values are only coerced here and the
+        whole batch is validated afterwards.
+        """
+        sources = {target_key: source_key for source_key, target_key in mapping.items()}
+        if schema is Flight and 'name' not in sources and 'passngr_nm' in source_columns:
+            sources['name'] = 'passngr_nm'
+
+        def column(name: str, field: FieldInfo) -> list:
+            source_key = sources.get(name)
+            if source_key is None:
+                if field.is_required():
+                    raise _MissingField(name)
+                return [field.get_default(call_default_factory=True)] * count
+            raw_values = read(source_key)
+            if raw_values is None:
+                raw_values = [None] * count
+            values = COLUMN_COERCERS[name](raw_values)
+            if self.emit == 'rows':
+                exact_types = EXACT_TYPES[name]
+                if exact_types is None or not set(map(type, values)) <= exact_types:
+                    values = _list_adapter(field.annotation).validate_python(values)
+            return values
+
+        columns = []
+        for name, field in schema.model_fields.items():
+            nested = _nested_model(field)
+            if nested is None:
+                columns.append(column(name, field))
             else:
-                yield item
+                nested_names = list(nested.model_fields)
+                nested_columns = [column(nested_name, nested_field)
+                                  for nested_name, nested_field in nested.model_fields.items()]
+                columns.append([dict(zip(nested_names, values)) for values in zip(*nested_columns)])
+        return list(zip(*columns))
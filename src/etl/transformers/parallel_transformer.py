@@ -0,0 +1,93 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator
+from src.etl.abstractions import Transformer
+from src.etl.records import Record
+from src.etl.transformers.ontology_transformer import OntologyTransformer
+
+# Set in each worker process by _init_worker.
+_worker_transformer: OntologyTransformer | None = None
+
+
+def _init_worker(batch_size: int | None, emit: str, on_error: str, mapping_cache: dict) -> None:
+    global _worker_transformer
+    # Workers never call the schema mapper: every mapping arrives from the parent.
+    _worker_transformer = OntologyTransformer(schema_mapper=None, batch_size=batch_size, emit=emit,
+                                              on_error=on_error)
+    _worker_transformer.mapping_cache.update(mapping_cache)
+
+
+def _transform_shard(shard: list, extra_mappings: dict) -> list:
+    _worker_transformer.mapping_cache.update(extra_mappings)
+    return list(_worker_transformer.transform(shard))
+
+
+class ParallelTransformer(Transformer):
+    def __init__(
+        self,
+        transformer: OntologyTransformer,
+        workers: int | None = None,
+        shard_size: int = 50_000,
+        max_pending: int | None = None,
+    ):
+        """Runs an OntologyTransformer over shards of the stream in worker processes.
+
+        Mappings are resolved in this process, through the wrapped transformer's
+        schema mapper, and sent to each worker once when the pool starts. Results
+        are yielded in input order. Inputs shorter than one shard, or a single
+        worker, are transformed in-process.
+
+        Args:
+            transformer: The transformer whose configuration the workers copy.
+            workers: Worker processes. Defaults to the CPU count.
+            shard_size: Records sent to a worker per task.
+            max_pending: Shards in flight at once, which bounds memory. Defaults to
+                twice the number of workers.
+        """
+        self.transformer = transformer
+        self.workers = workers or os.cpu_count() or 1
+        self.shard_size = shard_size
+        self.max_pending = max_pending or 2 * self.workers
+
+    def _shards(self, data: Iterable[Record]) -> Iterator[list]:
+        iterator = iter(data)
+        while shard := list(islice(iterator, self.shard_size)):
+            yield shard
+
+    def transform(self, data: Iterable[Record]) -> Iterable[Record]:
+        shards = self._shards(data)
+        first = next(shards, None)
+        if first is None:
+            return
+        if self.workers <= 1 or len(first) < self.shard_size:
+            yield from self.transformer.transform(first)
+            yield from self.transformer.transform(item for shard in shards for item in shard)
+            return
+
+        shipped = dict(self.transformer.resolve_mappings(first))
+        pending: deque[Future] = deque()
+        # Spawned workers do not inherit the threads of a concurrent Pipeline run.
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.transformer.batch_size, self.transformer.emit, self.transformer.on_error, shipped),
+        ) as executor:
+            try:
+                pending.append(executor.submit(_transform_shard, first, {}))
+                for shard in shards:
+                    mappings = self.transformer.resolve_mappings(shard)
+                    # Headers first seen after the pool started travel with each task.
+                    extra = {key: mapping for key, mapping in mappings.items() if key not in shipped}
+                    if len(pending) >= self.max_pending:
+                        yield from pending.popleft().result()
+                    pending.append(executor.submit(_transform_shard, shard, extra))
+                while pending:
+                    yield from pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
@@ -1,8 +1,8 @@
 from typing import Iterable
 from src.etl.abstractions import Transformer
-from src.etl.models import Event, Entity
+from src.etl.records import Record
 
 class PassthroughTransformer(Transformer):
-    def transform(self, data: Iterable[Event | Entity]) -> Iterable[Event | Entity]:
+    def transform(self, data: Iterable[Record]) -> Iterable[Record]:
         for item in data:
             yield item
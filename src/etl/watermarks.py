@@ -0,0 +1,45 @@
+import json
+import os
+from typing import Any
+from src import config
+
+
+class WatermarkStore:
+    """Persists how far each source has been extracted, as a JSON file.
+
+    Watermarks are plain dicts whose meaning belongs to the extractor that wrote
+    them: a byte offset and file fingerprint for CSVs, a column value for SQLite.
+    """
+
+    def __init__(self, path: str = config.WATERMARKS_PATH):
+        self.path = path
+
+    def _read(self) -> dict[str, Any]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write(self, watermarks: dict[str, Any]) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(watermarks, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def get(self, source_id: str) -> dict | None:
+        return self._read().get(source_id)
+
+    def set(self, source_id: str, watermark: dict) -> None:
+        watermarks = self._read()
+        watermarks[source_id] = watermark
+        self._write(watermarks)
+
+    def reset(self, source_id: str) -> None:
+        """Forgets a source's watermark so its next run is a full reload."""
+        watermarks = self._read()
+        if watermarks.pop(source_id, None) is not None:
+            self._write(watermarks)
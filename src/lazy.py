@@ -0,0 +1,57 @@
+"""Deferred imports for the heavy dependencies, so the CLI starts fast.
+
+pandas, numpy, sqlalchemy, pydantic and google-generativeai together take the
+best part of a second to import. Modules on the CLI's fast paths (cached
+answers, no-op incremental runs) bind them with lazy_import instead, and the
+import happens on first attribute access. Annotations in those modules are
+postponed (`from __future__ import annotations`), so they don't touch the
+modules either.
+"""
+
+import importlib
+import importlib.util
+import sys
+import threading
+from types import ModuleType
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Returns module name, loaded on first attribute access.
+
+    A module that is already imported is returned as is.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def is_loaded(name: str) -> bool:
+    """Whether module name has actually been executed, not just bound lazily."""
+    module = sys.modules.get(name)
+    return module is not None and not isinstance(module, importlib.util._LazyModule)
+
+
+def prewarm(*names: str) -> threading.Thread:
+    """Imports modules in a background thread, e.g. while a prompt waits for input."""
+    def load() -> None:
+        for name in names:
+            try:
+                importlib.import_module(name)
+                # Touch a lazily bound module so that it executes.
+                getattr(sys.modules[name], "__name__")
+            except Exception as e:
+                print(f"Could not pre-load {name}: {e}")
+                return
+
+    thread = threading.Thread(target=load, name="prewarm", daemon=True)
+    thread.start()
+    return thread
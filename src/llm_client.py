@@ -0,0 +1,304 @@
+"""Shared asyncio client for the LLM calls made by the agents and the ETL.
+
+Every prompt goes through one LLMClient per model. The client runs its own event
+loop in a background thread, so synchronous callers and concurrent pipeline
+threads share the same connections, the same concurrency limit and the same
+in-flight requests. Identical prompts sent while one is already in flight wait
+for that request instead of sending their own. Each attempt has a timeout, and
+transient failures are retried a bounded number of times with jittered
+exponential backoff.
+
+Transports do the actual I/O:
+
+- GeminiTransport uses the google-generativeai SDK.
+- HttpTransport speaks the Gemini REST protocol to any base URL, such as the
+  local stub server in src.llm_stub.
+- FunctionTransport answers in-process, for tests and benchmarks.
+
+Setting GEMINI_BASE_URL makes the shared clients use HttpTransport against that URL.
+"""
+
+import asyncio
+import http.client
+import json
+import random
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Protocol
+from urllib.parse import urlsplit
+
+from src import config
+
+
+class LLMError(Exception):
+    """The model could not produce a response."""
+
+
+class TransientLLMError(LLMError):
+    """A failure worth retrying, such as a rate limit or an unavailable server."""
+
+
+def parse_json_response(text: str) -> Any:
+    """Parses a JSON response, stripping the Markdown code fences models often add."""
+    cleaned_response = text.strip().replace("```json", "").replace("```", "")
+    return json.loads(cleaned_response)
+
+
+class Transport(Protocol):
+    # Exceptions, besides TransientLLMError and timeouts, that are worth retrying.
+    transient_errors: tuple[type[BaseException], ...]
+
+    async def generate(self, prompt: str) -> str:
+        ...
+
+
+class FunctionTransport:
+    """Answers prompts with a plain function, without any I/O."""
+    transient_errors = ()
+
+    def __init__(self, respond: Callable[[str], str]):
+        self.respond = respond
+
+    async def generate(self, prompt: str) -> str:
+        return self.respond(prompt)
+
+
+class GeminiTransport:
+    """Sends prompts through the google-generativeai SDK."""
+
+    def __init__(self, model_name: str = config.GEMINI_MODEL, api_key: str | None = None):
+        self.model_name = model_name
+        self.api_key = api_key
+        self._model = None
+        from google.api_core import exceptions
+        self.transient_errors = (
+            exceptions.TooManyRequests,
+            exceptions.ResourceExhausted,
+            exceptions.InternalServerError,
+            exceptions.ServiceUnavailable,
+            exceptions.DeadlineExceeded,
+        )
+
+    @property
+    def model(self):
+        # Configured on first use so that cached answers never touch the API client.
+        if self._model is None:
+            import google.generativeai as genai
+            genai.configure(api_key=self.api_key or config.GEMINI_API_KEY)
+            self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    async def generate(self, prompt: str) -> str:
+        response = await self.model.generate_content_async(prompt)
+        return response.text
+
+
+class HttpTransport:
+    """Sends prompts to a Gemini-compatible generateContent endpoint over HTTP.
+
+    Connections are kept alive and reused, up to pool_size idle connections.
+    Requests block in worker threads, so the client's event loop stays free.
+    timeout_seconds is the socket timeout, applied to each blocking read or write;
+    keep it equal to the client's timeout so abandoned requests end with it.
+    """
+    transient_errors = ()
+
+    def __init__(
+        self,
+        base_url: str,
+        model_name: str = config.GEMINI_MODEL,
+        api_key: str | None = None,
+        pool_size: int = config.LLM_MAX_CONCURRENCY,
+        timeout_seconds: float = config.LLM_TIMEOUT_SECONDS,
+    ):
+        url = urlsplit(base_url)
+        if url.scheme not in ("http", "https"):
+            raise ValueError(f"base_url must be an http or https URL, got {base_url!r}")
+        self._connection_class = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+        self._host = url.netloc
+        self._path = f"{url.path.rstrip('/')}/v1beta/models/{model_name}:generateContent"
+        self.api_key = api_key
+        self.pool_size = pool_size
+        self.timeout_seconds = timeout_seconds
+        self._idle: list[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> http.client.HTTPConnection:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._connection_class(self._host, timeout=self.timeout_seconds)
+
+    def _release(self, connection: http.client.HTTPConnection) -> None:
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+    def _post(self, prompt: str) -> str:
+        body = json.dumps({"contents": [{"parts": [{"text": prompt}]}]}).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["x-goog-api-key"] = self.api_key
+
+        connection = self._acquire()
+        try:
+            connection.request("POST", self._path, body, headers)
+            response = connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            connection.close()
+            raise TransientLLMError(f"Request to {self._host} failed: {e}") from e
+        if response.will_close:
+            connection.close()
+        else:
+            self._release(connection)
+
+        if response.status == 429 or response.status >= 500:
+            raise TransientLLMError(f"{self._host} returned HTTP {response.status}")
+        if response.status >= 400:
+            raise LLMError(f"{self._host} returned HTTP {response.status}: {data[:200]!r}")
+        try:
+            parts = json.loads(data)["candidates"][0]["content"]["parts"]
+        except (ValueError, KeyError, IndexError) as e:
+            raise LLMError(f"Unexpected response from {self._host}: {data[:200]!r}") from e
+        return "".join(part.get("text", "") for part in parts)
+
+    async def generate(self, prompt: str) -> str:
+        return await asyncio.to_thread(self._post, prompt)
+
+
+class LLMClient:
+    def __init__(
+        self,
+        transport: Transport,
+        max_concurrency: int = config.LLM_MAX_CONCURRENCY,
+        timeout_seconds: float = config.LLM_TIMEOUT_SECONDS,
+        max_retries: int = config.LLM_MAX_RETRIES,
+        backoff_seconds: float = config.LLM_BACKOFF_SECONDS,
+        max_backoff_seconds: float = config.LLM_MAX_BACKOFF_SECONDS,
+    ):
+        """Sends prompts through a transport with shared limits, coalescing and retries.
+
+        Args:
+            transport: Performs the requests.
+            max_concurrency: Requests in flight at once.
+            timeout_seconds: Limit for each attempt.
+            max_retries: Attempts after the first for timeouts and transient errors.
+            backoff_seconds: Base of the exponential backoff between attempts. Each
+                wait is drawn uniformly between zero and the capped exponential.
+            max_backoff_seconds: Cap on a single wait.
+        """
+        self.transport = transport
+        self.max_concurrency = max_concurrency
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.requests_sent = 0
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self._in_flight: dict[str, asyncio.Task] = {}
+        self._start_lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._semaphore = asyncio.Semaphore(self.max_concurrency)
+                self._thread = threading.Thread(target=loop.run_forever, name="llm-client", daemon=True)
+                self._thread.start()
+                self._loop = loop
+        return self._loop
+
+    def close(self) -> None:
+        """Stops the client's event loop and closes the transport's connections."""
+        with self._start_lock:
+            loop, self._loop = self._loop, None
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            self._thread.join()
+            loop.close()
+        close = getattr(self.transport, "close", None)
+        if close is not None:
+            close()
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff_seconds, self.backoff_seconds * 2 ** attempt))
+
+    async def _send(self, prompt: str) -> str:
+        """Sends prompt, retrying timeouts and transient errors with backoff.
+
+        The timeout cancels only the await. A transport that blocks in a worker
+        thread, such as HttpTransport, keeps its request running and its pooled
+        connection held until its own socket timeout fires.
+        """
+        retryable = (TimeoutError, ConnectionError, TransientLLMError, *self.transport.transient_errors)
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._semaphore:
+                    self.requests_sent += 1
+                    async with asyncio.timeout(self.timeout_seconds):
+                        return await self.transport.generate(prompt)
+            except retryable as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                print(f"LLM request failed ({type(e).__name__}: {e}); retrying in {delay:.1f}s.")
+                await asyncio.sleep(delay)
+
+    async def _coalesced(self, prompt: str) -> str:
+        task = self._in_flight.get(prompt)
+        if task is None:
+            task = asyncio.ensure_future(self._send(prompt))
+            self._in_flight[prompt] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(prompt, None))
+        # One caller giving up must not cancel the request for the others.
+        return await asyncio.shield(task)
+
+    def submit(self, prompt: str) -> Future:
+        """Starts a request and returns a future for the response text."""
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(self._coalesced(prompt), loop)
+
+    def generate(self, prompt: str) -> str:
+        """Returns the response text for prompt, blocking until it arrives."""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("generate() would block the client's own event loop; await agenerate() instead.")
+        return self.submit(prompt).result()
+
+    def generate_json(self, prompt: str) -> Any:
+        return parse_json_response(self.generate(prompt))
+
+    async def agenerate(self, prompt: str) -> str:
+        """Awaits the response text for prompt from any event loop."""
+        return await asyncio.wrap_future(self.submit(prompt))
+
+    async def agenerate_json(self, prompt: str) -> Any:
+        return parse_json_response(await self.agenerate(prompt))
+
+
+_clients: dict[str, LLMClient] = {}
+_clients_lock = threading.Lock()
+
+
+def default_transport(model_name: str) -> Transport:
+    if config.LLM_BASE_URL:
+        return HttpTransport(config.LLM_BASE_URL, model_name, api_key=config.GEMINI_API_KEY)
+    return GeminiTransport(model_name)
+
+
+def get_client(model_name: str = config.GEMINI_MODEL) -> LLMClient:
+    """Returns the client shared by every caller of model_name."""
+    with _clients_lock:
+        if model_name not in _clients:
+            _clients[model_name] = LLMClient(default_transport(model_name))
+        return _clients[model_name]
@@ -0,0 +1,144 @@
+"""A local HTTP server that answers Gemini generateContent requests.
+
+Tests and offline runs point HttpTransport at it, directly or through
+GEMINI_BASE_URL, to exercise the real request path without network access.
+
+    python -m src.llm_stub --port 8765 --responses responses.json
+    GEMINI_BASE_URL=http://127.0.0.1:8765 python -m src.main
+
+The responses file maps prompt substrings to response texts; the first match is
+returned and prompts matching nothing get "{}".
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+
+class StubLLMServer:
+    def __init__(
+        self,
+        respond: Callable[[str], str],
+        host: str = "127.0.0.1",
+        port: int = 0,
+        delay_seconds: float = 0.0,
+        fail_first: int = 0,
+    ):
+        """Serves generateContent requests with responses from a function.
+
+        Args:
+            respond: Returns the response text for a prompt.
+            host: Interface to listen on.
+            port: Port to listen on; 0 picks a free one.
+            delay_seconds: Time each request takes, to simulate a slow model.
+            fail_first: Requests answered with HTTP 503 before any succeeds.
+        """
+        self.respond = respond
+        self.delay_seconds = delay_seconds
+        self.fail_first = fail_first
+        self.prompts: list[str] = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 keeps connections open between requests.
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status: int, payload: dict) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                prompt = "".join(part.get("text", "") for part in request["contents"][0]["parts"])
+                with stub._lock:
+                    stub.prompts.append(prompt)
+                    failing = len(stub.prompts) <= stub.fail_first
+                if stub.delay_seconds:
+                    time.sleep(stub.delay_seconds)
+                if failing:
+                    self._reply(503, {"error": {"code": 503, "message": "Stub unavailable"}})
+                    return
+                text = stub.respond(prompt)
+                self._reply(200, {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}}]})
+
+        return Handler
+
+    def start(self) -> "StubLLMServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="llm-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Serves in the calling thread until interrupted."""
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "StubLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def canned_responses(responses: dict[str, str]) -> Callable[[str], str]:
+    """Returns a responder answering with the first response whose key occurs in the prompt."""
+    def respond(prompt: str) -> str:
+        for fragment, text in responses.items():
+            if fragment in prompt:
+                return text
+        return "{}"
+    return respond
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve canned Gemini responses locally.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--responses", help="JSON file mapping prompt substrings to response texts.")
+    args = parser.parse_args()
+
+    responses = {}
+    if args.responses:
+        with open(args.responses, "r", encoding="utf-8") as f:
+            responses = json.load(f)
+    server = StubLLMServer(canned_responses(responses), host=args.host, port=args.port)
+    print(f"Serving stub Gemini responses on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
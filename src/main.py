@@ -1,57 +1,164 @@
-"""Main module for the flight data analysis CLI."""
-# import argparse
-# import os
-# from .analysis_agent import analyze_question
-# from .cleaning_agent import clean_data
-
-
-# def main() -> None:
-#     """Main function to run the analysis CLI."""
-#     parser = argparse.ArgumentParser(description="Ask questions about flight data.")
-#     parser.add_argument(
-#         "question", type=str, help="The natural language question to ask."
-#     )
-#     parser.add_argument("--clean", action="store_true", help="Force clean the data.")
-#     args = parser.parse_args()
-
-#     # Check if the data is cleaned
-#     if (
-#         args.clean
-#         or not os.path.exists("data/cleaned_flights.csv")
-#         or not os.path.exists("data/cleaned_airlines.csv")
-#     ):
-#         print("\n--- Data Cleaning Process ---")
-#         clean_data()
-#         print("--- Data Cleaning Complete ---\n")
-
-#     print(f"\n--- Analyzing your question: {args.question} ---")
-#     answer = analyze_question(args.question)
-#     print("\n--- Answer ---")
-#     print(answer)
-#     print("--------------")
-
-
-from src.etl.pipeline import Pipeline
-from src.etl.extractors.csv_extractor import CsvExtractor
-from src.etl.transformers.ontology_transformer import OntologyTransformer
-from src.etl.loaders.sqlite_loader import SqliteLoader
-from src.etl.schema_mapper import SchemaMapper
-
-def main():
-    # Create instances of the ETL components
-    schema_mapper = SchemaMapper()
-    ontology_transformer = OntologyTransformer(schema_mapper)
-    sqlite_loader = SqliteLoader(db_path="data/warehouse.db")
-
-    # Create and run the airlines pipeline
-    airlines_extractor = CsvExtractor(file_path="data/airlines.csv", source="csv")
-    airlines_pipeline = Pipeline(airlines_extractor, ontology_transformer, sqlite_loader)
-    airlines_pipeline.run()
-
-    # Create and run the flights pipeline
-    flights_extractor = CsvExtractor(file_path="data/flights.csv", source="csv")
-    flights_pipeline = Pipeline(flights_extractor, ontology_transformer, sqlite_loader)
-    flights_pipeline.run()
+"""Main module for the flight data CLI.
+
+    python -m src.main etl
+    python -m src.main etl "incoming/*.csv" --workers 8
+    python -m src.main ask "Which airline has the most flights listed?"
+    python -m src.main ask --sql "What share of flights were cancelled?"
+    python -m src.main ask --interactive
+
+pandas, pydantic, sqlalchemy and the Gemini client are imported only on the
+paths that use them, so cached answers and incremental runs with nothing new
+to load return without paying for those imports.
+"""
+
+import argparse
+import os
+from src import config
+
+HEAVY_MODULES = ("pandas", "src.llm_client")
+
+# Record construction holds the GIL, so extra extract workers only pay off with spare cores.
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+
+def cleaned_data_exists(data_dir: str) -> bool:
+    from src.columnar_store import store_exists
+
+    return all(
+        store_exists(os.path.join(data_dir, f"{name}.cols")) or os.path.exists(os.path.join(data_dir, f"{name}.csv"))
+        for name in ("cleaned_flights", "cleaned_airlines")
+    )
+
+
+def run_etl(
+    data_dir: str = "data",
+    warehouse: str = config.WAREHOUSE_PATH,
+    sources: list[str] | None = None,
+    workers: int = DEFAULT_WORKERS,
+) -> bool:
+    """Loads whatever was appended to the raw CSVs since the last run into the warehouse.
+
+    Each file is routed to airlines or flights by its header. Files of one kind are
+    extracted concurrently into a single pipeline, and every airline file is loaded
+    before the first flight file, so flights always find their airline.
+
+    Rows are committed chunk by chunk together with each file's offset in the
+    warehouse's run_state table, so a run that fails part way resumes after the
+    last committed chunk. Rows that fail validation or constraints are stored in
+    the dead_letters table instead of aborting the run.
+
+    Args:
+        data_dir: Holds the raw CSVs, unless sources are given.
+        warehouse: SQLite warehouse path.
+        sources: CSV files, directories or glob patterns. Defaults to airlines.csv and
+            flights.csv in data_dir.
+        workers: Files extracted at once.
+
+    Returns:
+        Whether there was anything to load.
+    """
+    from src.etl.extractors.multi_csv_extractor import discover_csv_files, route_csv_files
+    from src.etl.run_state import RunStateStore
+
+    if sources:
+        paths = discover_csv_files(sources)
+    else:
+        paths = [os.path.join(data_dir, name) for name in ("airlines.csv", "flights.csv")]
+    # Progress lives in the warehouse, committed with the rows, so a failed run resumes.
+    watermarks = RunStateStore(warehouse)
+    routes = route_csv_files(paths, source="csv", incremental=True, watermarks=watermarks)
+    pending = {kind: [extractor for extractor in extractors if extractor.has_pending()]
+               for kind, extractors in routes.items()}
+    pending = {kind: extractors for kind, extractors in pending.items() if extractors}
+    for extractors in pending.values():
+        for extractor in extractors:
+            if extractor.rewritten:
+                print(f"{extractor.file_path} was rewritten since the last run; reloading it in full.")
+    if not pending:
+        print("The warehouse is up to date.")
+        return False
+
+    from src.etl.extractors.multi_csv_extractor import MultiCsvExtractor
+    from src.etl.pipeline import Pipeline
+    from src.etl.transformers.ontology_transformer import OntologyTransformer
+    from src.etl.loaders.sqlite_loader import SqliteLoader
+    from src.etl.schema_mapper import SchemaMapper
+
+    ontology_transformer = OntologyTransformer(SchemaMapper(), batch_size=1000, emit="rows", on_error="dead_letter")
+    sqlite_loader = SqliteLoader(db_path=warehouse, on_error="dead_letter", mode="upsert")
+
+    # Resolve the column mappings of every header up front, so any Gemini requests run in parallel
+    ontology_transformer.prefetch_mappings([
+        (kind, extractor.source_columns()) for kind, extractors in pending.items() for extractor in extractors
+    ])
+    for kind, extractors in pending.items():
+        print(f"Loading {len(extractors)} {kind} file(s) into {warehouse} ...")
+        extractor = MultiCsvExtractor(extractors, max_workers=workers)
+        pipeline = Pipeline(extractor, ontology_transformer, sqlite_loader, concurrent=True)
+        pipeline.run()
+        print_stage_timings(pipeline.stage_timings)
+    if sqlite_loader.dead_letter_count:
+        print(f"{sqlite_loader.dead_letter_count} rows failed validation or constraints; see the dead_letters table.")
+    return True
+
+
+def print_stage_timings(timings: dict[str, dict[str, float]]) -> None:
+    """Prints the busy and waiting time of each stage of a concurrent run."""
+    print("--- Pipeline stage timings ---")
+    for stage in ("extract", "transform", "load"):
+        timing = timings[stage]
+        print(f"{stage}: {timing['busy']:.2f}s busy, {timing['waiting']:.2f}s waiting")
+    print(f"total: {timings['total']['wall']:.2f}s")
+
+
+def ask(args: argparse.Namespace) -> None:
+    from src.analysis_agent import AnalysisSession, SqlAnalysisSession, repl
+
+    if args.sql:
+        session = SqlAnalysisSession(db_path=args.warehouse)
+    else:
+        if args.clean or not cleaned_data_exists(args.data_dir):
+            from src.cleaning_agent import clean_data
+
+            print("\n--- Data Cleaning Process ---")
+            clean_data(data_dir=args.data_dir)
+            print("--- Data Cleaning Complete ---\n")
+        session = AnalysisSession(data_dir=args.data_dir)
+
+    if args.interactive or not args.question:
+        from src.lazy import prewarm
+
+        # Load the heavy modules while the first question is being typed.
+        prewarm(*HEAVY_MODULES)
+        repl(session)
+        return
+
+    print(session.ask(args.question))
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Main function to run the CLI."""
+    parser = argparse.ArgumentParser(description="Load and ask questions about flight data.")
+    parser.add_argument("--data-dir", default="data", help="Directory holding the raw and cleaned files.")
+    parser.add_argument("--warehouse", default=config.WAREHOUSE_PATH, help="SQLite warehouse path.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    etl_parser = commands.add_parser("etl", help="Load new rows from the raw CSVs into the warehouse.")
+    etl_parser.add_argument("sources", nargs="*", help="CSV files, directories or glob patterns to load.")
+    etl_parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Files extracted at once.")
+
+    ask_parser = commands.add_parser("ask", help="Ask a question in plain English.")
+    ask_parser.add_argument("question", nargs="?", help="The natural language question to ask.")
+    ask_parser.add_argument("--sql", action="store_true", help="Answer with SQL over the warehouse.")
+    ask_parser.add_argument("--clean", action="store_true", help="Force clean the data.")
+    ask_parser.add_argument("-i", "--interactive", action="store_true", help="Keep asking questions.")
+
+    args = parser.parse_args(argv)
+    if args.command == "etl":
+        run_etl(args.data_dir, args.warehouse, args.sources, args.workers)
+    else:
+        ask(args)
+
 
 if __name__ == "__main__":
     main()
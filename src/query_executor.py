@@ -0,0 +1,438 @@
+"""Runs generated pandas expressions in a pool of sandboxed worker processes.
+
+The flights and airlines frames are shared with the workers rather than copied:
+fixed-width columns, the codes of categorical columns, and the UTF-8 data of
+string columns are placed in `multiprocessing.shared_memory` blocks once, and
+every worker maps them read-only. Each worker decodes the string columns once.
+Categorical columns stay encoded, so their data is never copied per worker;
+pandas in the workers is set up so queries over them answer as they would over
+the plain columns they were written for. Only columns of other objects are
+pickled to each worker when it starts. Workers are started as soon as the executor is created, so they
+are ready by the time Gemini has generated the first query.
+
+Each query runs under a CPU-time limit and an address-space limit, set with
+`resource.setrlimit` in the worker before the query and lifted after it. A query
+that is still running after the wall-clock timeout is killed with its worker,
+and a fresh worker takes its place, so one runaway query never blocks others.
+"""
+
+import functools
+import math
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import weakref
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable
+import numpy as np
+import pandas as pd
+from src import config
+from src.columnar_store import decategorize, decode_strings, encode_strings
+
+try:
+    import resource
+except ImportError:  # Windows: timeouts still apply, the per-query limits do not.
+    resource = None
+
+# How long a new worker may take to import pandas and attach the frames.
+WORKER_START_TIMEOUT_SECONDS = 60.0
+
+
+class QueryError(Exception):
+    """A generated query failed, exceeded a limit or could not be run."""
+
+
+class QueryTimeout(QueryError):
+    """A generated query ran past the executor's wall-clock timeout."""
+
+
+class _CpuLimitExceeded(Exception):
+    pass
+
+
+def _share_array(values: np.ndarray, blocks: list[SharedMemory]) -> tuple[str, str, int]:
+    """Copies an array into a new shared memory block and returns how to attach it."""
+    block = SharedMemory(create=True, size=max(values.nbytes, 1))
+    np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[:] = values
+    blocks.append(block)
+    return block.name, values.dtype.str, len(values)
+
+
+def _attach_array(array: tuple[str, str, int], blocks: list[SharedMemory]) -> np.ndarray:
+    block_name, dtype, length = array
+    # The parent owns the block; the worker must not unlink it on exit.
+    block = SharedMemory(name=block_name, track=False)
+    blocks.append(block)
+    values = np.ndarray((length,), dtype=dtype, buffer=block.buf)
+    # Read-only, so no query can change the data another worker sees.
+    values.flags.writeable = False
+    return values
+
+
+def _share_frame(df: pd.DataFrame) -> tuple[dict, list[SharedMemory]]:
+    """Copies a frame's columns into shared memory.
+
+    String columns are laid out as in a columnar store: offsets into UTF-8 data,
+    and a validity mask. Only columns of other objects, e.g. lists, are pickled.
+
+    Returns:
+        A picklable description of the frame, and the blocks it refers to.
+    """
+    columns = []
+    blocks = []
+    for name in df.columns:
+        series = df[name]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            categories = series.cat.categories
+            if not categories.is_monotonic_increasing:
+                # Groupings come out in category order; sorted, it is a plain column's order.
+                series = series.cat.reorder_categories(categories.sort_values())
+            # Only the codes are per row; the categories travel with the spec.
+            codes = _share_array(series.cat.codes.to_numpy(), blocks)
+            columns.append((name, ("category", codes, series.cat.categories)))
+        elif isinstance(series.dtype, np.dtype) and series.dtype.kind in "biufcmM":
+            columns.append((name, ("fixed", _share_array(series.to_numpy(), blocks))))
+        elif series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) in ("string", "empty"):
+            offsets, data, valid = encode_strings(series)
+            missing = series[~valid].iloc[0] if not valid.all() else None
+            arrays = [_share_array(values, blocks)
+                      for values in (offsets, np.frombuffer(data, dtype=np.uint8), valid)]
+            columns.append((name, ("string", *arrays, missing)))
+        else:
+            columns.append((name, ("pickled", series)))
+    return {"columns": columns, "index": df.index}, blocks
+
+
+def _attach_frame(spec: dict, blocks: list[SharedMemory]) -> pd.DataFrame:
+    data = {}
+    for name, (kind, *details) in spec["columns"]:
+        if kind == "pickled":
+            data[name] = details[0]
+            continue
+        if kind == "string":
+            offsets, text, valid, missing = details
+            # Decoded into this worker's own objects; the payload is never pickled.
+            values = decode_strings(_attach_array(offsets, blocks), _attach_array(text, blocks).tobytes(),
+                                    _attach_array(valid, blocks), missing)
+        elif kind == "category":
+            codes, categories = details
+            # Kept encoded: the codes stay in the shared block rather than being
+            # decoded into a copy per worker. _observe_categories keeps answers plain.
+            values = pd.Categorical.from_codes(_attach_array(codes, blocks), categories=categories)
+        else:
+            values = _attach_array(details[0], blocks)
+        data[name] = pd.Series(values, index=spec["index"], copy=False)
+    return pd.DataFrame(data, index=spec["index"], copy=False)
+
+
+def _default_observed(function: Callable) -> Callable:
+    @functools.wraps(function)
+    def observed(*args, observed=True, **kwargs):
+        return function(*args, observed=observed, **kwargs)
+    return observed
+
+
+def _decoded(values: Any) -> Any:
+    if isinstance(values, (list, tuple)):
+        return [_decoded(item) for item in values]
+    if isinstance(values, pd.Series) and isinstance(values.dtype, pd.CategoricalDtype):
+        return values.astype(object)
+    if isinstance(values, pd.Categorical):
+        return np.asarray(values, dtype=object)
+    return values
+
+
+def _observe_categories() -> None:
+    """Makes pandas in this worker answer over categorical columns as over plain ones.
+
+    Groupings and pivots report only the categories present, as they would for a
+    plain column, instead of every category with a zero. Value counts and
+    crosstabs decode just the values they count, so ties come out in the same
+    order too. Patching pandas is confined to worker processes.
+    """
+    pd.DataFrame.groupby = _default_observed(pd.DataFrame.groupby)
+    pd.Series.groupby = _default_observed(pd.Series.groupby)
+    pd.DataFrame.pivot_table = _default_observed(pd.DataFrame.pivot_table)
+    pd.pivot_table = _default_observed(pd.pivot_table)
+    series_value_counts = pd.Series.value_counts
+    pd.Series.value_counts = functools.wraps(series_value_counts)(
+        lambda self, *args, **kwargs: series_value_counts(_decoded(self), *args, **kwargs))
+    frame_value_counts = pd.DataFrame.value_counts
+    pd.DataFrame.value_counts = functools.wraps(frame_value_counts)(
+        lambda self, *args, **kwargs: frame_value_counts(decategorize(self), *args, **kwargs))
+    crosstab = pd.crosstab
+    pd.crosstab = functools.wraps(crosstab)(
+        lambda index, columns, *args, **kwargs: crosstab(_decoded(index), _decoded(columns), *args, **kwargs))
+
+
+def _plain_index(index: pd.Index) -> pd.Index:
+    if isinstance(index, pd.CategoricalIndex):
+        return index.astype(object)
+    if isinstance(index, pd.MultiIndex) and any(isinstance(level, pd.CategoricalIndex) for level in index.levels):
+        return index.set_levels([_plain_index(level) for level in index.levels])
+    return index
+
+
+def _plain_result(result: Any) -> Any:
+    """Returns result with categorical values and labels decoded, as plain columns give them."""
+    if isinstance(result, pd.Index):
+        return _plain_index(result)
+    if isinstance(result, pd.Categorical):
+        return _decoded(result)
+    if isinstance(result, pd.Series):
+        result = _decoded(result)
+    elif isinstance(result, pd.DataFrame):
+        result = decategorize(result)
+        columns = _plain_index(result.columns)
+        if columns is not result.columns:
+            result = result.set_axis(columns, axis=1)
+    else:
+        return result
+    index = _plain_index(result.index)
+    return result if index is result.index else result.set_axis(index, axis=0)
+
+
+def _raise_cpu_limit(signum, frame) -> None:
+    raise _CpuLimitExceeded()
+
+
+def _address_space() -> int | None:
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _set_limit(limit: int, soft: float) -> None:
+    _, hard = resource.getrlimit(limit)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(limit, (int(soft), hard))
+
+
+def _lift_limit(limit: int) -> None:
+    _, hard = resource.getrlimit(limit)
+    resource.setrlimit(limit, (hard, hard))
+
+
+def _evaluate(query: str, frames: dict[str, pd.DataFrame], cpu_seconds: float | None, memory_mb: int | None) -> Any:
+    try:
+        result = _run_limited(query, {**frames, "pd": pd}, cpu_seconds, memory_mb)
+    except TypeError:
+        if not any(decategorize(frame) is not frame for frame in frames.values()):
+            raise
+        # Some operations are undefined on unordered categories, e.g. min() or
+        # joining text with +. Retry on frames decoded for this query only.
+        decoded = {name: decategorize(frame) for name, frame in frames.items()}
+        result = _run_limited(query, {**decoded, "pd": pd}, cpu_seconds, memory_mb)
+    return _plain_result(result)
+
+
+def _run_limited(query: str, namespace: dict, cpu_seconds: float | None, memory_mb: int | None) -> Any:
+    if resource is None:
+        return eval(query, namespace)
+    limits = []
+    if cpu_seconds is not None and hasattr(signal, "SIGXCPU"):
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        _set_limit(resource.RLIMIT_CPU, math.ceil(usage.ru_utime + usage.ru_stime + cpu_seconds))
+        limits.append(resource.RLIMIT_CPU)
+    address_space = _address_space() if memory_mb is not None else None
+    if address_space is not None:
+        # RSS limits are not enforced by Linux; capping growth of the address space is.
+        _set_limit(resource.RLIMIT_AS, address_space + memory_mb * 1024 * 1024)
+        limits.append(resource.RLIMIT_AS)
+    try:
+        return eval(query, namespace)
+    finally:
+        for limit in limits:
+            _lift_limit(limit)
+
+
+def _serve(connection: Connection, specs: dict[str, dict], cpu_seconds: float | None,
+           memory_mb: int | None) -> None:
+    """Worker loop: attaches the frames, then answers queries until told to stop."""
+    blocks = []
+    try:
+        frames = {name: _attach_frame(spec, blocks) for name, spec in specs.items()}
+    except Exception as e:
+        connection.send(("error", f"Could not load the data: {e}"))
+        return
+    if hasattr(signal, "SIGXCPU"):
+        signal.signal(signal.SIGXCPU, _raise_cpu_limit)
+    _observe_categories()
+    connection.send(("ready", None))
+
+    while True:
+        try:
+            query = connection.recv()
+        except EOFError:
+            break
+        if query is None:
+            break
+        try:
+            # The frames are shared, read-only and reused across queries.
+            result = ("ok", _evaluate(query, frames, cpu_seconds, memory_mb))
+        except _CpuLimitExceeded:
+            result = ("error", f"The query exceeded its CPU time limit of {cpu_seconds:g}s.")
+        except MemoryError:
+            result = ("error", f"The query exceeded its memory limit of {memory_mb} MB.")
+        except Exception as e:
+            result = ("error", f"{type(e).__name__}: {e}")
+        try:
+            connection.send(result)
+        except Exception:
+            # Unpicklable results are sent as their text.
+            connection.send(("ok", str(result[1])))
+
+    frames.clear()
+    for block in blocks:
+        block.close()
+
+
+class _Worker:
+    def __init__(self, context, specs: dict[str, dict], cpu_seconds: float | None, memory_mb: int | None):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(
+            target=_serve, args=(child_connection, specs, cpu_seconds, memory_mb), name="query-worker", daemon=True
+        )
+        self.process.start()
+        child_connection.close()
+        self.ready = False
+
+    def wait_ready(self) -> None:
+        if self.ready:
+            return
+        if not self.connection.poll(WORKER_START_TIMEOUT_SECONDS):
+            raise QueryError("A query worker did not start in time.")
+        status, error = self.connection.recv()
+        if status != "ready":
+            raise QueryError(error)
+        self.ready = True
+
+    def stop(self) -> None:
+        try:
+            self.connection.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=1)
+        self.kill()
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+def _shutdown(workers: list[_Worker], blocks: list[SharedMemory]) -> None:
+    for worker in workers:
+        worker.stop()
+    workers.clear()
+    for block in blocks:
+        block.close()
+        block.unlink()
+    blocks.clear()
+
+
+class QueryExecutor:
+    def __init__(
+        self,
+        frames: dict[str, pd.DataFrame],
+        workers: int = config.QUERY_WORKERS,
+        timeout_seconds: float = config.QUERY_TIMEOUT_SECONDS,
+        cpu_seconds: float | None = config.QUERY_CPU_SECONDS,
+        memory_mb: int | None = config.QUERY_MEMORY_MB,
+    ):
+        """Starts a pool of workers holding frames, for evaluating generated queries.
+
+        Args:
+            frames: The names queries refer to and the frames bound to them, e.g.
+                {"flights_df": ..., "airlines_df": ...}.
+            workers: Worker processes, and so queries evaluated at once.
+            timeout_seconds: Wall-clock time after which a query is cancelled by
+                killing its worker.
+            cpu_seconds: CPU time a query may use. None for no limit.
+            memory_mb: Memory a query may allocate beyond what its worker holds
+                when the query starts. None for no limit.
+        """
+        self.timeout_seconds = timeout_seconds
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self._blocks: list[SharedMemory] = []
+        self._specs = {}
+        self._workers: list[_Worker] = []
+        self._idle: queue.Queue[_Worker] = queue.Queue()
+        self._lock = threading.Lock()
+        # Releases the workers and shared memory even if close() is never called.
+        self._finalizer = weakref.finalize(self, _shutdown, self._workers, self._blocks)
+        try:
+            for name, df in frames.items():
+                self._specs[name], blocks = _share_frame(df)
+                self._blocks.extend(blocks)
+            # Spawned workers do not inherit the threads of the LLM client or a pipeline.
+            self._context = multiprocessing.get_context("spawn")
+            for _ in range(max(1, workers)):
+                self._idle.put(self._start_worker())
+        except BaseException:
+            self.close()
+            raise
+
+    def _start_worker(self) -> _Worker:
+        worker = _Worker(self._context, self._specs, self.cpu_seconds, self.memory_mb)
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def _replace(self, worker: _Worker) -> None:
+        worker.kill()
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        if self._finalizer.alive:
+            self._idle.put(self._start_worker())
+
+    def run(self, query: str) -> Any:
+        """Evaluates a query in an idle worker, waiting for one if all are busy.
+
+        Raises:
+            QueryTimeout: The query ran past timeout_seconds and was cancelled.
+            QueryError: The query raised, exceeded a limit or its worker failed.
+        """
+        if not self._finalizer.alive:
+            raise QueryError("The query executor is closed.")
+        worker = self._idle.get()
+        try:
+            worker.wait_ready()
+            worker.connection.send(query)
+            if not worker.connection.poll(self.timeout_seconds):
+                self._replace(worker)
+                raise QueryTimeout(f"The query did not finish within {self.timeout_seconds:g}s.")
+            status, result = worker.connection.recv()
+        except QueryError:
+            if worker.process.is_alive() and worker.ready:
+                self._idle.put(worker)
+            elif worker in self._workers:
+                self._replace(worker)
+            raise
+        except (EOFError, OSError) as e:
+            # The worker died, e.g. killed by the kernel for exceeding a hard limit.
+            self._replace(worker)
+            raise QueryError(f"The query worker stopped unexpectedly: {e!r}") from e
+        self._idle.put(worker)
+        if status != "ok":
+            raise QueryError(result)
+        return result
+
+    def close(self) -> None:
+        """Stops the workers and frees the shared memory."""
+        self._finalizer()
+
+    def __enter__(self) -> "QueryExecutor":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
@@ -1,9 +1,27 @@
 
+import os
+import sqlite3
+import tempfile
 import unittest
+import warnings
 from unittest.mock import patch
 import pandas as pd
-from src.analysis_agent import analyze_question, is_query_safe
+from src.analysis_agent import (
+    AnalysisSession,
+    SqlAnalysisSession,
+    analyze_question,
+    is_query_safe,
+    is_sql_safe,
+    match_summary_question,
+    normalize_question,
+    run_readonly_query,
+)
 from src import config
+from src.columnar_store import write_columnar
+from src.disk_cache import DiskCache
+from src.etl.loaders.sqlite_loader import SqliteLoader
+from src.etl.models import Airline
+from tests.test_sqlite_loader import make_flight
 
 class TestAnalysisAgent(unittest.TestCase):
 
@@ -20,10 +38,25 @@ class TestAnalysisAgent(unittest.TestCase):
         self.flights_df = pd.DataFrame(self.flights_data)
         self.airlines_df = pd.DataFrame(self.airlines_data)
 
+        # Throwaway question caches
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.query_cache = DiskCache(os.path.join(self.cache_dir.name, 'queries'))
+        self.result_cache = DiskCache(os.path.join(self.cache_dir.name, 'results'))
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+
+    def make_session(self, data_dir):
+        return AnalysisSession(data_dir=data_dir, query_cache=self.query_cache, result_cache=self.result_cache)
+
+    @patch('src.analysis_agent.get_result_cache')
+    @patch('src.analysis_agent.get_query_cache')
     @patch('src.analysis_agent.get_analysis_from_gemini')
     @patch('src.analysis_agent.pd.read_csv')
-    def test_analyze_question_safe_query(self, mock_read_csv, mock_get_analysis):
+    def test_analyze_question_safe_query(self, mock_read_csv, mock_get_analysis, mock_query_cache, mock_result_cache):
         """Test analyze_question with a safe query."""
+        mock_query_cache.return_value = self.query_cache
+        mock_result_cache.return_value = self.result_cache
         mock_read_csv.side_effect = [self.flights_df, self.airlines_df]
         mock_get_analysis.return_value = {
             'query': "flights_df.merge(airlines_df, on='airline_id')['airline_name'].value_counts().idxmax()",
@@ -33,6 +66,212 @@ class TestAnalysisAgent(unittest.TestCase):
         result = analyze_question("Which airline has the most flights listed?")
         self.assertEqual(result, "The airline with the most flights is Test Airline 1.")
 
+    @patch('src.analysis_agent.create_model')
+    @patch('src.analysis_agent.get_analysis_from_gemini')
+    def test_session_reloads_only_changed_files(self, mock_get_analysis, mock_create_model):
+        """Test that a session reuses its frames and model until the files change."""
+        mock_get_analysis.return_value = {
+            'query': "len(flights_df)",
+            'response_template': "There are {result} flights."
+        }
+        with tempfile.TemporaryDirectory() as data_dir:
+            flights_file = os.path.join(data_dir, 'cleaned_flights.csv')
+            self.flights_df.to_csv(flights_file, index=False)
+            self.airlines_df.to_csv(os.path.join(data_dir, 'cleaned_airlines.csv'), index=False)
+            session = self.make_session(data_dir)
+
+            with patch('src.analysis_agent.pd.read_csv', wraps=pd.read_csv) as mock_read_csv:
+                self.assertEqual(session.ask("How many flights?"), "There are 3 flights.")
+                self.assertEqual(session.ask("How many flights again?"), "There are 3 flights.")
+                self.assertEqual(mock_read_csv.call_count, 2)
+
+                pd.concat([self.flights_df, self.flights_df]).to_csv(flights_file, index=False)
+                self.assertEqual(session.ask("How many flights now?"), "There are 6 flights.")
+                self.assertEqual(mock_read_csv.call_count, 4)
+
+        mock_create_model.assert_called_once()
+
+    @patch('src.analysis_agent.create_model')
+    @patch('src.analysis_agent.get_analysis_from_gemini')
+    def test_session_prefers_columnar_store(self, mock_get_analysis, mock_create_model):
+        """Test that a session reads columnar stores, with dtypes intact, instead of CSV."""
+        mock_get_analysis.return_value = {
+            'query': "str(flights_df['departure_datetime'].dtype)",
+            'response_template': "{result}"
+        }
+        flights_df = self.flights_df.assign(departure_datetime=pd.to_datetime(['2023-01-01'] * 3))
+        with tempfile.TemporaryDirectory() as data_dir:
+            write_columnar(flights_df, os.path.join(data_dir, 'cleaned_flights.cols'))
+            write_columnar(self.airlines_df, os.path.join(data_dir, 'cleaned_airlines.cols'))
+            session = self.make_session(data_dir)
+
+            with patch('src.analysis_agent.pd.read_csv') as mock_read_csv:
+                self.assertEqual(session.ask("What type are departures?"), "datetime64[ns]")
+                mock_read_csv.assert_not_called()
+
+    @patch('src.analysis_agent.create_model')
+    @patch('src.analysis_agent.get_analysis_from_gemini')
+    def test_categorical_columns_do_not_change_answers(self, mock_get_analysis, mock_create_model):
+        """Test that queries over category-encoded columns answer as they would over plain columns."""
+        flights_df = pd.DataFrame({
+            'flight_number': range(8),
+            'status': ['Confirmed', 'Cancelled', 'Pending', 'Confirmed'] * 2,
+        })
+        queries = [
+            "flights_df[flights_df['status'] == 'Cancelled']['status'].value_counts().to_dict()",
+            "len(flights_df[flights_df['status'] != 'Pending']['status'].value_counts())",
+            "flights_df[flights_df['status'] != 'Confirmed'].groupby('status')['flight_number'].count().to_dict()",
+        ]
+        expected = [str(eval(query, {'flights_df': flights_df})) for query in queries]
+
+        with tempfile.TemporaryDirectory() as data_dir:
+            flights_df.to_csv(os.path.join(data_dir, 'cleaned_flights.csv'), index=False)
+            self.airlines_df.to_csv(os.path.join(data_dir, 'cleaned_airlines.csv'), index=False)
+            for workers in (0, 1):
+                with self.subTest(query_workers=workers):
+                    caches = [DiskCache(os.path.join(data_dir, f'{name}_{workers}')) for name in ('queries', 'results')]
+                    session = AnalysisSession(data_dir, *caches, query_workers=workers)
+                    try:
+                        session.refresh()
+                        self.assertEqual(str(session.flights_df['status'].dtype), 'category')
+                        for i, (query, answer) in enumerate(zip(queries, expected)):
+                            mock_get_analysis.return_value = {'query': query, 'response_template': "{result}"}
+                            with warnings.catch_warnings():
+                                warnings.simplefilter('error')
+                                self.assertEqual(session.ask(f"Question {i}"), answer)
+                    finally:
+                        session.close()
+
+    @patch('src.analysis_agent.create_model')
+    @patch('src.analysis_agent.get_analysis_from_gemini')
+    def test_session_caches_queries_and_answers(self, mock_get_analysis, mock_create_model):
+        """Test that rephrased repeats skip Gemini, and answers are recomputed when the data changes."""
+        mock_get_analysis.return_value = {
+            'query': "len(flights_df)",
+            'response_template': "There are {result} flights."
+        }
+        with tempfile.TemporaryDirectory() as data_dir:
+            flights_file = os.path.join(data_dir, 'cleaned_flights.csv')
+            self.flights_df.to_csv(flights_file, index=False)
+            self.airlines_df.to_csv(os.path.join(data_dir, 'cleaned_airlines.csv'), index=False)
+
+            self.assertEqual(self.make_session(data_dir).ask("How many flights?"), "There are 3 flights.")
+            # A fresh session sees the persisted answer without evaluating anything.
+            with patch('src.analysis_agent.eval', create=True) as mock_eval:
+                self.assertEqual(self.make_session(data_dir).ask("how many  flights"), "There are 3 flights.")
+                mock_eval.assert_not_called()
+
+            pd.concat([self.flights_df, self.flights_df]).to_csv(flights_file, index=False)
+            self.assertEqual(self.make_session(data_dir).ask("How many flights, please?"), "There are 6 flights.")
+
+        mock_get_analysis.assert_called_once()
+        mock_create_model.assert_called_once()
+
+    def test_normalize_question(self):
+        """Test that case, punctuation and filler words do not change the normalized question."""
+        self.assertEqual(normalize_question("Which airline has the MOST flights?"),
+                         normalize_question("which airline has most flights"))
+        self.assertNotEqual(normalize_question("Which airline has the most flights?"),
+                            normalize_question("Which airline has the fewest flights?"))
+
+    def make_warehouse(self, data_dir):
+        db_path = os.path.join(data_dir, 'warehouse.db')
+        SqliteLoader(db_path).load([
+            Airline(airline_id=1, name='Test Airline 1'),
+            Airline(airline_id=2, name='Test Airline 2'),
+            make_flight('101', airline_id=1),
+            make_flight('102', airline_id=1, status='Cancelled'),
+            make_flight('201', airline_id=2),
+        ])
+        return db_path
+
+    @patch('src.analysis_agent.create_model')
+    @patch('src.analysis_agent.get_sql_from_gemini')
+    def test_sql_session_pushes_query_down(self, mock_get_sql, mock_create_model):
+        """Test that the SQL backend answers from the warehouse and sees its schema."""
+        mock_get_sql.return_value = {
+            'sql': "SELECT a.name FROM flights f JOIN airlines a ON a.airline_id = f.airline_id "
+                   "WHERE f.status = 'Cancelled' GROUP BY a.airline_id ORDER BY COUNT(*) DESC LIMIT 1",
+            'response_template': "The airline with the most cancellations is {result}."
+        }
+        with tempfile.TemporaryDirectory() as data_dir:
+            session = SqlAnalysisSession(self.make_warehouse(data_dir), query_cache=self.query_cache,
+                                         result_cache=self.result_cache)
+            self.assertEqual(session.ask("Which airline has the most cancellations?"),
+                             "The airline with the most cancellations is Test Airline 1.")
+
+        schema = mock_get_sql.call_args[0][1]
+        self.assertIn('CREATE VIEW flights', schema)
+        self.assertIn('-- sample rows from flights\n', schema)
+        self.assertIn('ix_flights_status', schema)
+
+    @patch('src.analysis_agent.create_model')
+    @patch('src.analysis_agent.get_sql_from_gemini')
+    def test_sql_session_rejects_writes(self, mock_get_sql, mock_create_model):
+        """Test that generated SQL other than a single SELECT is never executed."""
+        mock_get_sql.return_value = {'sql': "DELETE FROM flights", 'response_template': "{result}"}
+        with tempfile.TemporaryDirectory() as data_dir:
+            db_path = self.make_warehouse(data_dir)
+            session = SqlAnalysisSession(db_path, query_cache=self.query_cache, result_cache=self.result_cache)
+            self.assertEqual(session.ask("Delete everything"),
+                             "Error: Only a single read-only SELECT statement is allowed.")
+            self.assertEqual(run_readonly_query(db_path, "SELECT COUNT(*) FROM flights")[1], [(3,)])
+
+    @patch('src.analysis_agent.get_sql_from_gemini')
+    def test_sql_session_answers_from_summaries(self, mock_get_sql):
+        """Test that dashboard questions are read from the summary tables without Gemini."""
+        with tempfile.TemporaryDirectory() as data_dir:
+            session = SqlAnalysisSession(self.make_warehouse(data_dir), query_cache=self.query_cache,
+                                         result_cache=self.result_cache)
+            self.assertEqual(session.ask("Which airline has the most flights?"),
+                             "The airline with the most flights is Test Airline 1.")
+            self.assertEqual(session.ask("How many flights are there?"), "There are 3 flights.")
+            self.assertRegex(session.ask("What is the cancellation rate?"), r"Test Airline 1\s+50\.0")
+            self.assertRegex(session.ask("Average fare by class?"), r"Economy\s+250\.0")
+
+        mock_get_sql.assert_not_called()
+
+    def test_qualified_questions_skip_summaries(self):
+        """Test that only whole dashboard questions are answered from the summaries, never filtered ones."""
+        for question in ("Which airline has the most flights listed?", "Flights per airline",
+                         "What's the cancellation rate by airline?", "Average fare per cabin class?",
+                         "Average loyalty points by reward program membership?", "How many flights in total?"):
+            with self.subTest(question=question):
+                self.assertIsNotNone(match_summary_question(question))
+
+        for question in ("What is the cancellation rate for Delta in June 2023?",
+                         "Which airline has the most flights in 2023?",
+                         "Average fare by class for reward members?",
+                         "Which airline has the most flights cancelled?",
+                         "flights per airline last week",
+                         "How many flights were delayed?"):
+            with self.subTest(question=question):
+                self.assertIsNone(match_summary_question(question))
+
+    def test_run_readonly_query_limits(self):
+        """Test the read-only connection, the row limit and the time limit."""
+        with tempfile.TemporaryDirectory() as data_dir:
+            db_path = self.make_warehouse(data_dir)
+
+            columns, rows, truncated = run_readonly_query(db_path, "SELECT flight_number FROM flights", max_rows=2)
+            self.assertEqual((columns, len(rows), truncated), (['flight_number'], 2, True))
+
+            with self.assertRaises(sqlite3.OperationalError):
+                run_readonly_query(db_path, "DELETE FROM flights")
+            with self.assertRaises(sqlite3.OperationalError):
+                run_readonly_query(
+                    db_path,
+                    "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT MAX(i) FROM n",
+                    timeout_seconds=0.05,
+                )
+
+    def test_is_sql_safe(self):
+        """Test the is_sql_safe function."""
+        self.assertTrue(is_sql_safe("SELECT COUNT(*) FROM flights;"))
+        self.assertTrue(is_sql_safe("WITH f AS (SELECT * FROM flights) SELECT COUNT(*) FROM f"))
+        self.assertFalse(is_sql_safe("DROP TABLE flights"))
+        self.assertFalse(is_sql_safe("SELECT 1; DELETE FROM flights"))
+
     def test_is_query_safe(self):
         """Test the is_query_safe function."""
         self.assertTrue(is_query_safe("flights_df.head()"))
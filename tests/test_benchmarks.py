@@ -0,0 +1,52 @@
+import os
+import tempfile
+import unittest
+import pandas as pd
+from benchmarks.compare import compare
+from benchmarks.generate import generate
+from benchmarks.run import CASES, _run_case
+
+class TestBenchmarks(unittest.TestCase):
+
+    def setUp(self):
+        """Generate a small dataset."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.temp_dir.name, 'data')
+        generate(self.data_dir, rows=300, seed=1)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_generated_data_matches_source_layout(self):
+        """Test that generated files use the source headers, unique flight numbers and a fixed seed."""
+        flights = pd.read_csv(os.path.join(self.data_dir, 'flights.csv'))
+        source_columns = pd.read_csv('data/flights.csv', nrows=0).columns.tolist()
+        self.assertListEqual(flights.columns.tolist(), source_columns)
+        self.assertEqual(len(flights), 300)
+        self.assertTrue(flights['flght#'].is_unique)
+        self.assertEqual(flights['booking_cd'].isna().sum(), 0)
+
+        other_dir = os.path.join(self.temp_dir.name, 'other')
+        generate(other_dir, rows=300, seed=1)
+        pd.testing.assert_frame_equal(pd.read_csv(os.path.join(other_dir, 'flights.csv')), flights)
+
+    def test_every_case_runs_offline(self):
+        """Test that each benchmark case runs against the stubs and reports its measurements."""
+        for case in CASES:
+            with self.subTest(case=case):
+                result = _run_case(case, 300, self.data_dir)
+                self.assertEqual(result['case'], case)
+                self.assertGreater(result['seconds'], 0)
+                self.assertGreaterEqual(result['peak_rss_mb'], result['baseline_rss_mb'])
+                if 'records' in result:
+                    self.assertEqual(result['records'], 300)
+
+    def test_compare_flags_regressions(self):
+        """Test that slowdowns beyond the threshold are reported."""
+        base = {('load', 10): {'seconds': 1.0, 'peak_rss_mb': 100.0}}
+        new = {('load', 10): {'seconds': 1.5, 'peak_rss_mb': 101.0}}
+        self.assertEqual(compare(base, new, threshold=0.1), ['load at 10 rows is 50.0% slower'])
+        self.assertEqual(compare(base, base, threshold=0.1), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,11 @@
 
 import os
+import shutil
 import unittest
 import pandas as pd
 from unittest.mock import patch
-from src.cleaning_agent import clean_data
+from src.cleaning_agent import clean_chunk, clean_data, compute_fill_values, to_bool
+from src.columnar_store import read_columnar
 from src import config
 
 class TestCleaningAgent(unittest.TestCase):
@@ -15,6 +17,8 @@ class TestCleaningAgent(unittest.TestCase):
         self.airlines_file = os.path.join(self.test_data_dir, 'airlines.csv')
         self.cleaned_flights_file = os.path.join(self.test_data_dir, 'cleaned_flights.csv')
         self.cleaned_airlines_file = os.path.join(self.test_data_dir, 'cleaned_airlines.csv')
+        self.flights_store = os.path.join(self.test_data_dir, 'cleaned_flights.cols')
+        self.airlines_store = os.path.join(self.test_data_dir, 'cleaned_airlines.cols')
 
         # Create dummy data
         flights_data = {
@@ -43,6 +47,8 @@ class TestCleaningAgent(unittest.TestCase):
         for f in [self.flights_file, self.airlines_file, self.cleaned_flights_file, self.cleaned_airlines_file]:
             if os.path.exists(f):
                 os.remove(f)
+        for store in [self.flights_store, self.airlines_store]:
+            shutil.rmtree(store, ignore_errors=True)
 
     @patch('src.cleaning_agent.get_column_mapping_from_gemini')
     def test_clean_data(self, mock_get_mapping):
@@ -69,7 +75,7 @@ class TestCleaningAgent(unittest.TestCase):
             }
         ]
 
-        clean_data(data_dir=self.test_data_dir)
+        clean_data(data_dir=self.test_data_dir, export_csv=True)
 
         # Check if cleaned files are created
         self.assertTrue(os.path.exists(self.cleaned_flights_file))
@@ -84,5 +90,85 @@ class TestCleaningAgent(unittest.TestCase):
         cleaned_airlines_df = pd.read_csv(self.cleaned_airlines_file)
         self.assertListEqual(list(cleaned_airlines_df.columns), list(config.IDEAL_AIRLINES_SCHEMA.keys()))
 
+        # The columnar stores keep the schema dtypes exactly
+        flights_df = read_columnar(self.flights_store)
+        self.assertDictEqual({col: str(dtype) for col, dtype in flights_df.dtypes.items()},
+                             config.IDEAL_FLIGHTS_SCHEMA)
+        self.assertListEqual(flights_df['is_reward_program_member'].tolist(), [True, False])
+        self.assertEqual(read_columnar(self.airlines_store)['airline_name'].tolist(),
+                         ['Test Airline 1', 'Test Airline 2'])
+
+    @patch('src.cleaning_agent.get_column_mapping_from_gemini')
+    def test_yes_no_text_columns_stay_text(self, mock_get_mapping):
+        """Test that only the schema's bool columns are coerced, not other yes/no columns."""
+        flights = pd.read_csv(self.flights_file).assign(status=['Yes', 'No'], reward_program_member=['yes', 'NO'])
+        flights.to_csv(self.flights_file, index=False)
+        flights_mapping = {
+            'airlie_id': 'airline_id', 'flght#': 'flight_number', 'departure_dt': 'departure_datetime',
+            'arrival_dt': 'arrival_datetime', 'status': 'booking_status', 'class': 'cabin_class', 'fare': 'fare',
+            'loyalty_pts': 'loyalty_points', 'duration_hrs': 'flight_duration_hours', 'window_seat': 'is_window_seat',
+            'aisle_seat': 'is_aisle_seat', 'reward_program_member': 'is_reward_program_member',
+        }
+        airlines_mapping = {'airlie_id': 'airline_id', 'airline_name': 'airline_name'}
+        mock_get_mapping.side_effect = lambda columns, schema: (
+            flights_mapping if schema is config.IDEAL_FLIGHTS_SCHEMA else airlines_mapping
+        )
+
+        for chunksize in (None, 1):
+            with self.subTest(chunksize=chunksize):
+                clean_data(data_dir=self.test_data_dir, chunksize=chunksize)
+                flights_df = read_columnar(self.flights_store)
+                self.assertListEqual(flights_df['booking_status'].astype(object).tolist(), ['Yes', 'No'])
+                self.assertListEqual(flights_df['is_reward_program_member'].tolist(), [True, False])
+                self.assertListEqual(flights_df['is_window_seat'].tolist(), [True, False])
+
+    def test_chunked_clean_matches_in_memory(self):
+        """Test that two streaming passes over small chunks give the in-memory result."""
+        flights = pd.DataFrame({
+            'fare': [100.0, None, 400.0, 'n/a', 250.0],
+            'loyalty_points': [10, None, 30, 20, None],
+            'departure_datetime': ['2023-01-01 10:00:00', 'not a date', None, '2023-01-04 10:00:00', '2023-01-05 10:00:00'],
+            'is_window_seat': ['Yes', 'no', None, 'TRUE', 'maybe'],
+        })
+        schema = {'fare': 'float64', 'loyalty_points': 'int64',
+                  'departure_datetime': 'datetime64[ns]', 'is_window_seat': 'bool'}
+
+        fill_values = compute_fill_values([flights], schema)
+        self.assertAlmostEqual(fill_values['fare'], 250.0)
+        self.assertEqual(fill_values['loyalty_points'], 20)
+
+        chunks = [flights.iloc[i:i + 2] for i in range(0, len(flights), 2)]
+        self.assertEqual(compute_fill_values(chunks, schema), fill_values)
+
+        cleaned, failures = clean_chunk(flights, schema, fill_values)
+        chunked = pd.concat([clean_chunk(chunk, schema, fill_values)[0] for chunk in chunks])
+        pd.testing.assert_frame_equal(chunked, cleaned)
+        self.assertListEqual(cleaned['fare'].tolist(), [100.0, 250.0, 400.0, 250.0, 250.0])
+        self.assertListEqual(cleaned['loyalty_points'].tolist(), [10, 20, 30, 20, 20])
+        self.assertListEqual(cleaned['is_window_seat'].tolist(), [True, False, False, True, False])
+        self.assertEqual(failures, {'fare': 1, 'loyalty_points': 0, 'departure_datetime': 1})
+
+    def test_to_bool_matches_string_rule(self):
+        """Test that vectorized bool coercion agrees with lowercased string matching."""
+        values = pd.Series(['Yes', 'yes', 'No', 'True', 'false', None, True, float('nan')])
+        expected = [str(value).lower() in ['true', 'yes'] for value in values]
+        self.assertListEqual(to_bool(values).tolist(), expected)
+
+    @patch('src.cleaning_agent.get_column_mapping_from_gemini')
+    def test_clean_data_in_chunks(self, mock_get_mapping):
+        """Test that the chunked mode writes the same cleaned data."""
+        flights_mapping = dict(zip(pd.read_csv(self.flights_file, nrows=0).columns, config.IDEAL_FLIGHTS_SCHEMA))
+        airlines_mapping = {'airlie_id': 'airline_id', 'airline_name': 'airline_name'}
+
+        mock_get_mapping.side_effect = [flights_mapping, airlines_mapping]
+        clean_data(data_dir=self.test_data_dir)
+        in_memory = read_columnar(self.flights_store, mmap=False)
+
+        mock_get_mapping.side_effect = [flights_mapping, airlines_mapping]
+        clean_data(data_dir=self.test_data_dir, chunksize=1)
+        pd.testing.assert_frame_equal(read_columnar(self.flights_store, mmap=False), in_memory)
+        self.assertFalse(os.path.exists(self.cleaned_flights_file))
+
+
 if __name__ == '__main__':
     unittest.main()
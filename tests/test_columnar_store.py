@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from src.columnar_store import (
+    ColumnarWriter,
+    categorize,
+    low_cardinality_columns,
+    read_columnar,
+    store_exists,
+    write_columnar,
+)
+
+class TestColumnarStore(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a frame covering every supported dtype."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'flights.cols')
+        self.df = pd.DataFrame({
+            'flight_number': np.array([101, 202, 303], dtype='int64'),
+            'departure_datetime': pd.to_datetime(['2023-01-01 10:00', None, '2023-01-03 09:30']),
+            'cabin_class': ['Economy', None, 'Première'],
+            'fare': [250.0, np.nan, 800.5],
+            'is_window_seat': [True, False, True],
+        })
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_round_trip_preserves_values_and_dtypes(self):
+        """Test that a written store reads back identical, with memory-mapped columns."""
+        write_columnar(self.df, self.path)
+
+        loaded = read_columnar(self.path)
+        self.assertTrue(loaded.equals(self.df))
+        self.assertTrue(loaded.dtypes.equals(self.df.dtypes))
+        base = loaded['fare'].values
+        while base is not None and not isinstance(base, np.memmap):
+            base = base.base
+        self.assertIsInstance(base, np.memmap)
+
+        # Writes to the frame stay private to the process.
+        loaded.loc[0, 'fare'] = 1.0
+        self.assertEqual(read_columnar(self.path).loc[0, 'fare'], 250.0)
+
+    def test_appending_chunks_and_replacing_a_store(self):
+        """Test that chunks append in order and a rewrite replaces the old store."""
+        with ColumnarWriter(self.path) as writer:
+            writer.append(self.df.iloc[:2])
+            writer.append(self.df.iloc[2:])
+        pd.testing.assert_frame_equal(read_columnar(self.path, mmap=False), self.df)
+
+        write_columnar(self.df.iloc[:1], self.path)
+        self.assertEqual(len(read_columnar(self.path)), 1)
+        self.assertFalse(os.path.exists(f"{self.path}.tmp"))
+
+    def test_categorical_columns_are_dictionary_encoded(self):
+        """Test that low-cardinality strings become categories stored as codes, across chunks."""
+        df = pd.DataFrame({
+            'booking_status': ['Confirmed', 'Cancelled', None, 'Confirmed'] * 25,
+            'booking_code': [f'B{i:03d}' for i in range(100)],
+        })
+        self.assertEqual(low_cardinality_columns(df), ['booking_status'])
+        categorical = categorize(df)
+        self.assertEqual(str(categorical['booking_status'].dtype), 'category')
+        self.assertLess(categorical.memory_usage(deep=True).sum(), df.memory_usage(deep=True).sum())
+
+        with ColumnarWriter(self.path) as writer:
+            writer.append(categorical.iloc[:3])
+            # A later chunk with its own, differently ordered categories.
+            writer.append(categorize(df.iloc[3:].replace({'Cancelled': 'Delayed'}), ['booking_status']))
+        loaded = read_columnar(self.path)
+        self.assertEqual(str(loaded['booking_status'].dtype), 'category')
+        expected = df['booking_status'].where(df.index < 3, df['booking_status'].replace({'Cancelled': 'Delayed'}))
+        self.assertEqual(loaded['booking_status'].astype(object).fillna('missing').tolist(), expected.fillna('missing').tolist())
+        self.assertEqual(sorted(loaded['booking_status'].cat.categories), ['Cancelled', 'Confirmed', 'Delayed'])
+        self.assertEqual(os.path.getsize(os.path.join(self.path, 'c0.bin')), 4 * len(df))
+
+    def test_failed_write_leaves_existing_store(self):
+        """Test that an aborted write keeps the previous store readable."""
+        write_columnar(self.df, self.path)
+        with self.assertRaises(TypeError):
+            with ColumnarWriter(self.path) as writer:
+                writer.append(pd.DataFrame({'delay': pd.array([1, None], dtype='Int64')}))
+
+        self.assertTrue(store_exists(self.path))
+        self.assertEqual(len(read_columnar(self.path)), 3)
+
+if __name__ == '__main__':
+    unittest.main()
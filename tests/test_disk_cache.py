@@ -0,0 +1,61 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+from src.disk_cache import DiskCache, mapping_cache_key
+
+
+class TestDiskCache(unittest.TestCase):
+
+    def setUp(self):
+        """Create a cache in a temporary directory."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = DiskCache(self.temp_dir.name, max_entries=2)
+
+    def tearDown(self):
+        """Clean up test data."""
+        self.temp_dir.cleanup()
+
+    def test_get_set_and_invalidate(self):
+        """Test round-tripping and explicit invalidation."""
+        self.cache.set('a', {'airlie_id': 'airline_id'})
+        self.assertEqual(self.cache.get('a'), {'airlie_id': 'airline_id'})
+        self.assertTrue(self.cache.invalidate('a'))
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first."""
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        os.utime(os.path.join(self.temp_dir.name, 'a.json'), (time.time() - 60, time.time() - 60))
+        os.utime(os.path.join(self.temp_dir.name, 'b.json'), (time.time() - 30, time.time() - 30))
+        self.cache.get('a')
+        self.cache.set('c', 3)
+
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('c'), 3)
+
+    def test_ttl_expiry(self):
+        """Test that entries older than the TTL are ignored."""
+        cache = DiskCache(self.temp_dir.name, ttl_seconds=10)
+        with patch('src.disk_cache.time.time', return_value=1000.0):
+            cache.set('a', 1)
+        with patch('src.disk_cache.time.time', return_value=1011.0):
+            self.assertIsNone(cache.get('a'))
+
+    def test_mapping_key_ignores_column_order(self):
+        """Test that reordered headers share a cache entry."""
+        self.assertEqual(
+            mapping_cache_key(['b', 'a'], ['x'], 'model'),
+            mapping_cache_key(['a', 'b'], ['x'], 'model'),
+        )
+        self.assertNotEqual(
+            mapping_cache_key(['a', 'b'], ['x'], 'model'),
+            mapping_cache_key(['a', 'b'], ['x'], 'other-model'),
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
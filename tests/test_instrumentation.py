@@ -0,0 +1,200 @@
+import json
+import os
+import pstats
+import tempfile
+import time
+import unittest
+from src.etl.abstractions import Transformer
+from src.etl.instrumentation import Instrumentation, PipelineHook
+from src.etl.pipeline import Pipeline
+from tests.test_pipeline import ListExtractor, DoublingTransformer, ListLoader
+
+
+class SlowExtractor(ListExtractor):
+    def extract(self):
+        for record in self.records:
+            time.sleep(0.002)
+            yield record
+
+
+class MappingTransformer(Transformer):
+    def __init__(self, schema_mapper):
+        self.schema_mapper = schema_mapper
+
+    def transform(self, data):
+        for item in data:
+            self.schema_mapper.get_schema_mapping([str(item)], None)
+            yield item
+
+
+class SlowMapper:
+    def get_schema_mapping(self, source_columns, target_schema):
+        time.sleep(0.002)
+        return {}
+
+
+class BatchMappingTransformer(Transformer):
+    def __init__(self, schema_mapper):
+        self.schema_mapper = schema_mapper
+
+    def transform(self, data):
+        items = list(data)
+        self.schema_mapper.get_schema_mappings([([str(item)], None) for item in items])
+        return items
+
+
+class SlowBatchMapper(SlowMapper):
+    def get_schema_mappings(self, sources):
+        time.sleep(0.03)
+        return [{} for _ in sources]
+
+
+class BatchingLoader(ListLoader):
+    def load(self, data):
+        batch = []
+        for item in data:
+            batch.append(item)
+            if len(batch) == 10:
+                time.sleep(0.002)
+                self.loaded.extend(batch)
+                batch = []
+        time.sleep(0.002)
+        self.loaded.extend(batch)
+
+
+class RecordingHook(PipelineHook):
+    def __init__(self):
+        self.events = []
+
+    def on_stage_start(self, stage):
+        self.events.append(('start', stage))
+
+    def on_first_record(self, stage, seconds):
+        self.events.append(('first', stage))
+
+    def on_progress(self, stage, metrics):
+        self.events.append(('progress', stage))
+
+    def on_stage_end(self, stage, metrics):
+        self.events.append(('end', stage))
+
+    def on_report(self, report):
+        self.events.append(('report', None))
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def test_counts_records_and_writes_report(self):
+        """Test that every stage's record counts end up in the JSON report."""
+        report_path = os.path.join(self.temp_dir.name, 'metrics.json')
+        hook = RecordingHook()
+        pipeline = Pipeline(ListExtractor(range(100)), DoublingTransformer(), ListLoader(),
+                            instrumentation=Instrumentation(report_path, hooks=[hook], progress_every=40))
+        pipeline.run()
+
+        with open(report_path) as f:
+            report = json.load(f)
+        self.assertEqual(report, json.loads(json.dumps(pipeline.metrics)))
+        stages = report['stages']
+        self.assertEqual(set(stages), {'extract', 'transform', 'load'})
+        self.assertEqual(stages['extract']['records_out'], 100)
+        self.assertEqual(stages['transform']['records_in'], 100)
+        self.assertEqual(stages['transform']['records_out'], 100)
+        self.assertEqual(stages['load']['records_in'], 100)
+        self.assertEqual(stages['extract']['latency']['count'], 100)
+        self.assertIsNotNone(stages['transform']['first_record_seconds'])
+        self.assertEqual(hook.events.count(('progress', 'transform')), 2)
+        self.assertEqual(hook.events.count(('progress', 'load')), 2)
+        for stage in stages:
+            self.assertEqual(hook.events.count(('start', stage)), 1)
+            self.assertEqual(hook.events.count(('first', stage)), 1)
+            self.assertEqual(hook.events.count(('end', stage)), 1)
+        self.assertEqual(hook.events[-1], ('report', None))
+
+    def test_stage_time_excludes_upstream(self):
+        """Test that time spent in the extractor is not charged to later stages."""
+        for concurrent in (False, True):
+            with self.subTest(concurrent=concurrent):
+                pipeline = Pipeline(SlowExtractor(range(50)), DoublingTransformer(), ListLoader(),
+                                    concurrent=concurrent, batch_size=5, instrumentation=Instrumentation())
+                pipeline.run()
+
+                stages = pipeline.metrics['stages']
+                self.assertGreater(stages['extract']['wall_seconds'], 0.08)
+                self.assertLess(stages['transform']['wall_seconds'], 0.05)
+                self.assertLess(stages['load']['wall_seconds'], 0.05)
+
+    def test_schema_mapping_is_its_own_stage(self):
+        """Test that schema mapper calls are timed separately and the mapper is restored."""
+        mapper = SlowMapper()
+        transformer = MappingTransformer(mapper)
+        pipeline = Pipeline(ListExtractor(range(20)), transformer, ListLoader(), instrumentation=Instrumentation())
+        pipeline.run()
+
+        stages = pipeline.metrics['stages']
+        self.assertEqual(stages['schema_mapping']['records_out'], 20)
+        self.assertGreater(stages['schema_mapping']['wall_seconds'], 0.03)
+        self.assertLess(stages['transform']['wall_seconds'], 0.03)
+        self.assertIs(transformer.schema_mapper, mapper)
+
+    def test_batched_schema_mapping_is_timed(self):
+        """Test that get_schema_mappings, used to prefetch mappings, is timed as schema mapping."""
+        transformer = BatchMappingTransformer(SlowBatchMapper())
+        pipeline = Pipeline(ListExtractor(range(20)), transformer, ListLoader(), instrumentation=Instrumentation())
+        pipeline.run()
+
+        stages = pipeline.metrics['stages']
+        self.assertEqual(stages['schema_mapping']['records_out'], 1)
+        self.assertGreater(stages['schema_mapping']['wall_seconds'], 0.02)
+        self.assertLess(stages['transform']['wall_seconds'], 0.02)
+        # Mappers without the batch method must not appear to have it once wrapped.
+        transformer = MappingTransformer(SlowMapper())
+        Instrumentation().wrap(ListExtractor([]), transformer, ListLoader())
+        self.assertFalse(hasattr(transformer.schema_mapper, 'get_schema_mappings'))
+
+    def test_load_latency_has_a_sample_per_record(self):
+        """Test that the loader's histogram records its time between pulls, not one sample per load."""
+        for concurrent in (False, True):
+            with self.subTest(concurrent=concurrent):
+                pipeline = Pipeline(SlowExtractor(range(30)), DoublingTransformer(), BatchingLoader(),
+                                    concurrent=concurrent, batch_size=5, instrumentation=Instrumentation())
+                pipeline.run()
+
+                latency = pipeline.metrics['stages']['load']['latency']
+                self.assertEqual(latency['count'], 31)
+                self.assertGreater(latency['max_seconds'], 0.0015)
+                self.assertLess(latency['max_seconds'], 0.02)
+
+    def test_memory_and_profile_for_one_stage(self):
+        """Test that tracemalloc peaks and a cProfile dump are recorded when asked for."""
+        profile_path = os.path.join(self.temp_dir.name, 'transform.prof')
+        instrumentation = Instrumentation(trace_memory=True, profile_stage='transform', profile_path=profile_path)
+        pipeline = Pipeline(ListExtractor(range(100)), DoublingTransformer(), ListLoader(),
+                            instrumentation=instrumentation)
+        pipeline.run()
+
+        self.assertGreater(pipeline.metrics['stages']['transform']['peak_traced_bytes'], 0)
+        self.assertEqual(pipeline.metrics['profile']['stage'], 'transform')
+        functions = {name for _, _, name in pstats.Stats(profile_path).stats}
+        self.assertIn('transform', functions)
+        self.assertNotIn('extract', functions)
+
+    def test_concurrent_pipeline_rejects_process_wide_capture(self):
+        """Test that memory tracing and profiling, which see every thread, need a sequential run."""
+        for options in ({'trace_memory': True}, {'profile_stage': 'load'}):
+            with self.subTest(**options):
+                with self.assertRaises(ValueError):
+                    Pipeline(ListExtractor(range(10)), DoublingTransformer(), ListLoader(),
+                             concurrent=True, instrumentation=Instrumentation(**options))
+
+    def test_rejects_unknown_profile_stage(self):
+        with self.assertRaises(ValueError):
+            Instrumentation(profile_stage='parse')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import asyncio
+import json
+import unittest
+from src.llm_client import HttpTransport, LLMClient, TransientLLMError, parse_json_response
+from src.llm_stub import StubLLMServer, canned_responses
+
+
+class SlowTransport:
+    """Sleeps for a while per request and tracks how many run at once."""
+    transient_errors = ()
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.active = 0
+        self.peak = 0
+        self.calls = 0
+
+    async def generate(self, prompt):
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.seconds)
+        finally:
+            self.active -= 1
+        return prompt.upper()
+
+
+class TestLLMClient(unittest.TestCase):
+
+    def make_client(self, transport, **kwargs):
+        client = LLMClient(transport, backoff_seconds=0.01, **kwargs)
+        self.addCleanup(client.close)
+        return client
+
+    def test_http_transport_against_stub(self):
+        """Test a round trip through the stub server, reusing one connection."""
+        with StubLLMServer(canned_responses({'airline': '```json\n{"airlie_id": "airline_id"}\n```'})) as server:
+            client = self.make_client(HttpTransport(server.url, 'test-model'))
+
+            self.assertEqual(client.generate_json('map the airline columns'), {'airlie_id': 'airline_id'})
+            self.assertEqual(client.generate('anything else'), '{}')
+            self.assertEqual(asyncio.run(client.agenerate_json('airline again')), {'airlie_id': 'airline_id'})
+        self.assertEqual(server.prompts, ['map the airline columns', 'anything else', 'airline again'])
+        self.assertEqual(server.connections, 1)
+
+    def test_identical_requests_in_flight_are_coalesced(self):
+        """Test that concurrent identical prompts share one request."""
+        with StubLLMServer(lambda prompt: json.dumps({'echo': prompt}), delay_seconds=0.2) as server:
+            client = self.make_client(HttpTransport(server.url, 'test-model'))
+            futures = [client.submit('same') for _ in range(5)] + [client.submit('other')]
+            responses = [parse_json_response(future.result()) for future in futures]
+
+        self.assertEqual(responses, [{'echo': 'same'}] * 5 + [{'echo': 'other'}])
+        self.assertEqual(sorted(server.prompts), ['other', 'same'])
+        self.assertEqual(client.requests_sent, 2)
+
+    def test_transient_failures_are_retried(self):
+        """Test that 503s are retried with backoff, up to max_retries."""
+        with StubLLMServer(lambda prompt: 'ok', fail_first=2) as server:
+            client = self.make_client(HttpTransport(server.url, 'test-model'), max_retries=2)
+            self.assertEqual(client.generate('hello'), 'ok')
+        self.assertEqual(len(server.prompts), 3)
+
+        with StubLLMServer(lambda prompt: 'ok', fail_first=5) as server:
+            client = self.make_client(HttpTransport(server.url, 'test-model'), max_retries=1)
+            with self.assertRaises(TransientLLMError):
+                client.generate('hello')
+        self.assertEqual(len(server.prompts), 2)
+
+    def test_timeouts_and_concurrency_limit(self):
+        """Test that slow attempts time out and concurrent requests stay under the limit."""
+        slow = SlowTransport(seconds=1.0)
+        client = self.make_client(slow, timeout_seconds=0.05, max_retries=1)
+        with self.assertRaises(TimeoutError):
+            client.generate('slow')
+        self.assertEqual(slow.calls, 2)
+
+        limited = SlowTransport(seconds=0.05)
+        client = self.make_client(limited, max_concurrency=2)
+        futures = [client.submit(f'prompt {i}') for i in range(6)]
+        self.assertEqual([future.result() for future in futures], [f'PROMPT {i}' for i in range(6)])
+        self.assertEqual(limited.peak, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
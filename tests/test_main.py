@@ -0,0 +1,93 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+import pandas as pd
+from benchmarks.generate import generate
+from src import analysis_agent
+from src.disk_cache import DiskCache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = {'pandas', 'numpy', 'pydantic', 'sqlalchemy', 'google.generativeai', 'src.llm_client'}
+
+
+def run_cli(args: list[str], env: dict[str, str] | None = None) -> tuple[str, set[str], int]:
+    """Runs a command under -X importtime.
+
+    Returns:
+        Its output, the modules it imported and the cumulative import time of the
+        CLI's own modules in microseconds.
+    """
+    process = subprocess.run([sys.executable, '-X', 'importtime', *args], cwd=ROOT, capture_output=True,
+                             text=True, env={**os.environ, **(env or {})}, check=True)
+    modules = set()
+    own = 0
+    for line in process.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, name = line.split('|')
+            modules.add(name.strip())
+            if name == ' src.main' or name.rstrip() in (' src.analysis_agent', ' src.etl.extractors.csv_extractor'):
+                own += int(cumulative)
+    return process.stdout, modules, own
+
+
+class TestMain(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.data_dir = os.path.join(self.temp_dir.name, 'data')
+        self.cache_dir = os.path.join(self.temp_dir.name, 'cache')
+        os.makedirs(self.data_dir)
+        self.env = {'FLIGHT_BOT_CACHE_DIR': self.cache_dir}
+
+    def test_importing_main_is_light(self):
+        """Test that the entry point imports none of the heavy dependencies."""
+        _, modules, _ = run_cli(['-c', 'import src.main'])
+        self.assertIn('src.main', modules)
+        self.assertFalse(HEAVY_MODULES & modules)
+
+    @patch('src.analysis_agent.get_analysis_from_gemini')
+    def test_cached_answer_skips_heavy_imports(self, mock_get_analysis):
+        """Test that a cached answer is returned without importing pandas or the LLM client."""
+        mock_get_analysis.return_value = {'query': "len(flights_df)", 'response_template': "There are {result} flights."}
+        pd.DataFrame({'airline_id': [1, 1, 2], 'flight_number': [101, 102, 201]}).to_csv(
+            os.path.join(self.data_dir, 'cleaned_flights.csv'), index=False)
+        pd.DataFrame({'airline_id': [1, 2], 'airline_name': ['A', 'B']}).to_csv(
+            os.path.join(self.data_dir, 'cleaned_airlines.csv'), index=False)
+        session = analysis_agent.AnalysisSession(
+            data_dir=self.data_dir,
+            query_cache=DiskCache(os.path.join(self.cache_dir, 'queries')),
+            result_cache=DiskCache(os.path.join(self.cache_dir, 'results')),
+        )
+        with patch('src.analysis_agent.create_model'):
+            self.assertEqual(session.ask("How many flights?"), "There are 3 flights.")
+
+        output, modules, own = run_cli(['-m', 'src.main', '--data-dir', self.data_dir, 'ask', 'How many flights?'],
+                                       self.env)
+        self.assertEqual(output.strip(), "There are 3 flights.")
+        self.assertFalse(HEAVY_MODULES & modules)
+        self.assertLess(own, 200_000)
+
+    def test_noop_incremental_etl_skips_heavy_imports(self):
+        """Test that an incremental run with nothing new loads nothing heavy."""
+        generate(self.data_dir, rows=200)
+        warehouse = os.path.join(self.temp_dir.name, 'warehouse.db')
+        args = ['-m', 'src.main', '--data-dir', self.data_dir, '--warehouse', warehouse, 'etl']
+
+        output, modules, _ = run_cli(args, self.env)
+        self.assertIn('Loading', output)
+        with sqlite3.connect(warehouse) as connection:
+            self.assertEqual(connection.execute("SELECT COUNT(*) FROM run_state").fetchone(), (2,))
+
+        output, modules, own = run_cli(args, self.env)
+        self.assertEqual(output.strip(), "The warehouse is up to date.")
+        self.assertFalse(HEAVY_MODULES & modules)
+        self.assertLess(own, 200_000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+import pandas as pd
+from src.etl.extractors.csv_extractor import describe_unrouted, route_header
+from src.etl.extractors.multi_csv_extractor import MultiCsvExtractor, discover_csv_files, route_csv_files
+from src.etl.loaders.sqlite_loader import SqliteLoader
+from src.etl.models import RowBatch
+from src.main import run_etl
+
+FLIGHT_MAPPINGS = {
+    'airline': {'airlie_id': 'airline_id', 'airline_name': 'name', 'AirlineID': 'airline_id', 'AirlineName': 'name'},
+    'flight': {
+        'airlie_id': 'airline_id', 'flght#': 'flight_number', 'departure_dt': 'departure_datetime',
+        'arrival_dt': 'arrival_datetime', 'dep_time': 'departure_time', 'arrivl_time': 'arrival_time',
+        'booking_cd': 'booking_code', 'passngr_nm': 'name', 'status': 'status', 'duration_hrs': 'duration_hours',
+    },
+}
+
+
+def flights_frame(flight_numbers: list[int], airline_id: int) -> pd.DataFrame:
+    count = len(flight_numbers)
+    return pd.DataFrame({
+        'airlie_id': [airline_id] * count,
+        'flght#': flight_numbers,
+        'departure_dt': ['2023-01-01 10:00:00'] * count,
+        'arrival_dt': ['2023-01-01 12:00:00'] * count,
+        'dep_time': ['10:00:00'] * count,
+        'arrivl_time': ['12:00:00'] * count,
+        'booking_cd': ['ABCD'] * count,
+        'passngr_nm': ['Name_TEST'] * count,
+        'status': ['Confirmed'] * count,
+        'duration_hrs': [2.0] * count,
+    })
+
+
+class TestMultiCsvExtractor(unittest.TestCase):
+
+    def setUp(self):
+        """Set up partner files whose names say nothing about their contents."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.incoming = os.path.join(self.temp_dir.name, 'incoming')
+        os.makedirs(self.incoming)
+        # Sorts before the airline files, and uses a different header from them.
+        pd.DataFrame({'AirlineID': [3], 'AirlineName': ['C']}).to_csv(self.path('a_carriers.csv'), index=False)
+        pd.DataFrame({'airlie_id': [1, 2], 'airline_name': ['A', 'B']}).to_csv(self.path('p1_dim.csv'), index=False)
+        for partner, airline_id in (('p1', 1), ('p2', 2), ('p3', 3)):
+            flight_numbers = [airline_id * 1000 + number for number in range(250)]
+            flights_frame(flight_numbers, airline_id).to_csv(self.path(f'0_{partner}_daily.csv'), index=False)
+        pd.DataFrame({'event_id': [1]}).to_csv(self.path('notes.csv'), index=False)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.incoming, name)
+
+    def test_files_are_routed_by_header(self):
+        """Test that files are classified from their header signature, not their name."""
+        self.assertEqual(route_header(['airline_id', 'airline_name']), 'airline')
+        self.assertEqual(route_header(list(flights_frame([1], 1).columns)), 'flight')
+        self.assertIsNone(route_header(['event_id']))
+
+        routes = route_csv_files(discover_csv_files(self.incoming), source='csv')
+        self.assertEqual(list(routes), ['airline', 'flight'])
+        self.assertEqual([os.path.basename(e.file_path) for e in routes['airline']], ['a_carriers.csv', 'p1_dim.csv'])
+        self.assertEqual(len(routes['flight']), 3)
+        self.assertEqual(discover_csv_files(os.path.join(self.incoming, '0_*.csv')),
+                         [e.file_path for e in routes['flight']])
+
+    def test_ambiguous_headers_are_skipped(self):
+        """Test that weak or partial signature matches are reported instead of loaded as airlines."""
+        passengers = ['id', 'name', 'email']
+        partial_flights = ['flight_no', 'airline_id', 'airline_name', 'dep_date']
+        self.assertIsNone(route_header(passengers))
+        self.assertIsNone(route_header(partial_flights))
+        self.assertIn('departure_datetime', describe_unrouted(partial_flights))
+
+        pd.DataFrame({name: ['x'] for name in passengers}).to_csv(self.path('contacts.csv'), index=False)
+        pd.DataFrame({name: ['1'] for name in partial_flights}).to_csv(self.path('p4_daily.csv'), index=False)
+        with patch('builtins.print') as mock_print:
+            routes = route_csv_files(discover_csv_files(self.incoming), source='csv')
+        self.assertEqual([os.path.basename(e.file_path) for e in routes['airline']], ['a_carriers.csv', 'p1_dim.csv'])
+        self.assertEqual(len(routes['flight']), 3)
+        skipped = [call.args[0] for call in mock_print.call_args_list]
+        self.assertTrue(any('contacts.csv' in message and "'id'" in message for message in skipped))
+        self.assertTrue(any('p4_daily.csv' in message and 'partly matches the flight' in message for message in skipped))
+
+    def test_concurrent_extraction_keeps_every_record(self):
+        """Test that files read by several workers yield every record, each file in order."""
+        extractors = route_csv_files(discover_csv_files(self.incoming), source='csv')['flight']
+        for extractor in extractors:
+            extractor.chunksize = 50
+        records = list(MultiCsvExtractor(extractors, max_workers=3, batch_size=20).extract())
+
+        self.assertEqual(len(records), 750)
+        for airline_id in (1, 2, 3):
+            ids = [record.event_id for record in records if record.get('airlie_id') == airline_id]
+            self.assertEqual(ids, [str(airline_id * 1000 + number) for number in range(250)])
+
+    def test_failed_file_stops_the_stream(self):
+        """Test that an error in one worker is raised by the reader."""
+        extractors = route_csv_files(discover_csv_files(self.incoming), source='csv')['flight']
+        os.remove(extractors[1].file_path)
+        with self.assertRaises(FileNotFoundError):
+            list(MultiCsvExtractor(extractors, max_workers=3).extract())
+
+    @patch('src.etl.schema_mapper.SchemaMapper.get_schema_mappings')
+    def test_directory_etl_loads_airlines_before_flights(self, mock_get_mappings):
+        """Test that a directory run loads every routed file, airlines first, into one warehouse."""
+        mock_get_mappings.side_effect = lambda sources: [
+            {column: FLIGHT_MAPPINGS[schema.__name__.lower()][column] for column in columns
+             if column in FLIGHT_MAPPINGS[schema.__name__.lower()]}
+            for columns, schema in sources
+        ]
+        warehouse = os.path.join(self.temp_dir.name, 'warehouse.db')
+        data_dir = os.path.join(self.temp_dir.name, 'data')
+        loaded = []
+        load = SqliteLoader.load
+
+        def record_load(loader, data):
+            batches = list(data)
+            loaded.append({batch.schema.__name__ for batch in batches if isinstance(batch, RowBatch)})
+            load(loader, batches)
+
+        with patch.object(SqliteLoader, 'load', record_load):
+            self.assertTrue(run_etl(data_dir, warehouse, sources=[self.incoming], workers=3))
+        self.assertEqual(loaded, [{'Airline'}, {'Flight'}])
+
+        with sqlite3.connect(warehouse) as connection:
+            self.assertEqual(connection.execute("SELECT airline_id, name FROM airlines ORDER BY airline_id").fetchall(),
+                             [(1, 'A'), (2, 'B'), (3, 'C')])
+            self.assertEqual(connection.execute("SELECT COUNT(*) FROM flights").fetchone(), (750,))
+        # One distinct header per kind and schema, resolved in a single request.
+        mock_get_mappings.assert_called_once()
+        self.assertEqual(len(mock_get_mappings.call_args.args[0]), 3)
+        self.assertFalse(run_etl(data_dir, warehouse, sources=[self.incoming], workers=3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+import datetime
+import pickle
+import unittest
+from unittest.mock import MagicMock
+from pydantic import ValidationError
+from src.etl.models import Event, Entity, Airline, Flight, RowBatch
+from src.etl.records import ColumnIndex, DeadLetter, EventRecord
+from src.etl.transformers.ontology_transformer import OntologyTransformer
+
+FLIGHT_MAPPING = {
+    'airlie_id': 'airline_id',
+    'flght#': 'flight_number',
+    'departure_dt': 'departure_datetime',
+    'arrival_dt': 'arrival_datetime',
+    'dep_time': 'departure_time',
+    'arrivl_time': 'arrival_time',
+    'booking_cd': 'booking_code',
+    'passngr_nm': 'name',
+    'class': 'class_of_service',
+    'fare': 'fare',
+    'status': 'status',
+    'duration_hrs': 'duration_hours',
+    'layover_locations': 'layover_locations',
+    'wifi': 'wifi_available',
+}
+
+
+def make_event(flight_number: int, **overrides) -> Event:
+    payload = {
+        'airlie_id': 1,
+        'flght#': flight_number,
+        'departure_dt': '2023-01-01 10:00:00',
+        'arrival_dt': '2023-01-01 12:00:00',
+        'dep_time': '10:00:00',
+        'arrivl_time': '12:00:00',
+        'booking_cd': 'ABCD',
+        'passngr_nm': 'Name_TEST',
+        'class': 'Economy',
+        'fare': float('nan'),
+        'status': 'Confirmed',
+        'duration_hrs': 2.0,
+        'layover_locations': 'LOCA, LOCB',
+        'wifi': 'Not Available',
+    }
+    payload.update(overrides)
+    return Event(event_id=str(flight_number), event_type='flight', timestamp=datetime.datetime(2023, 1, 1),
+                 source='csv', payload=payload)
+
+
+class TestOntologyTransformer(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a schema mapper stub returning fixed mappings."""
+        self.schema_mapper = MagicMock()
+        self.schema_mapper.get_schema_mapping.side_effect = lambda columns, schema: (
+            FLIGHT_MAPPING if schema is Flight else {'airlie_id': 'airline_id', 'airline_name': 'name'}
+        )
+        self.events = [make_event(101), make_event(202), make_event(303)]
+
+    def test_row_path_coerces_raw_values(self):
+        """Test coercion of numbers, delimited lists, availability flags and NaN."""
+        flight = next(iter(OntologyTransformer(self.schema_mapper).transform(self.events)))
+
+        self.assertEqual(flight.flight_number, '101')
+        self.assertEqual(flight.layover_locations, ['LOCA', 'LOCB'])
+        self.assertFalse(flight.wifi_available)
+        self.assertIsNone(flight.passenger.fare)
+        self.assertEqual(flight.passenger.class_of_service, 'Economy')
+
+    def test_batch_modes_match_row_path(self):
+        """Test that both batch modes produce the same records as the row path."""
+        expected = list(OntologyTransformer(self.schema_mapper).transform(self.events))
+        models = list(OntologyTransformer(self.schema_mapper, batch_size=2).transform(self.events))
+        batches = list(OntologyTransformer(self.schema_mapper, batch_size=2, emit='rows').transform(self.events))
+
+        self.assertEqual(models, expected)
+        self.assertTrue(all(isinstance(batch, RowBatch) and batch.schema is Flight for batch in batches))
+        rows = [dict(zip(batch.columns, row)) for batch in batches for row in batch.rows]
+        self.assertEqual(rows, [flight.model_dump() for flight in expected])
+
+    def test_batch_coercion_matches_row_path_on_varied_values(self):
+        """Test the column coercers and the skipped validation against the row path."""
+        variants = [
+            {'layover_locations': 'LOCA', 'wifi': 'Yes', 'booking_cd': 1234, 'fare': 250},
+            {'layover_locations': ' LOCA , ,LOCB', 'wifi': 'Available', 'class': float('nan')},
+            {'layover_locations': '', 'wifi': float('nan'), 'fare': 99.5},
+            {'layover_locations': float('nan'), 'wifi': True, 'passngr_nm': 42},
+        ]
+        events = [make_event(100 + i, **overrides) for i, overrides in enumerate(variants)]
+        expected = list(OntologyTransformer(self.schema_mapper).transform(events))
+        batches = list(OntologyTransformer(self.schema_mapper, batch_size=10, emit='rows').transform(events))
+
+        rows = [dict(zip(batch.columns, row)) for batch in batches for row in batch.rows]
+        self.assertEqual(rows, [flight.model_dump() for flight in expected])
+        self.assertEqual([row['layover_locations'] for row in rows], [['LOCA'], ['LOCA', 'LOCB'], [], None])
+        self.assertIsInstance(rows[0]['passenger']['fare'], float)
+
+    def test_batch_preserves_order_of_mixed_records(self):
+        """Test that airlines, flights and unknown records keep their order."""
+        airline = Entity(entity_id='1', entity_type='airline', source='csv',
+                         attributes={'airlie_id': 1, 'airline_name': 'Test Airline 1'})
+        other = Event(event_id='x', event_type='other', timestamp=datetime.datetime(2023, 1, 1),
+                      source='csv', payload={})
+        output = list(OntologyTransformer(self.schema_mapper, batch_size=10).transform(
+            [airline, self.events[0], other, self.events[1]]))
+
+        self.assertEqual([type(item) for item in output], [Airline, Flight, Event, Flight])
+
+    def test_batch_reports_same_validation_error(self):
+        """Test that a bad row in a batch raises the row path's error."""
+        events = self.events + [make_event(404, departure_dt='not a date')]
+        with self.assertRaises(ValidationError) as row_error:
+            list(OntologyTransformer(self.schema_mapper).transform(events))
+        with self.assertRaises(ValidationError) as batch_error:
+            list(OntologyTransformer(self.schema_mapper, batch_size=10, emit='rows').transform(events))
+
+        self.assertEqual(batch_error.exception.errors(), row_error.exception.errors())
+
+    def test_invalid_rows_become_dead_letters(self):
+        """Test that in dead-letter mode a bad row is set aside and the rest still load."""
+        events = [self.events[0], make_event(404, departure_dt='not a date'), self.events[1]]
+        for batch_size in (None, 10):
+            with self.subTest(batch_size=batch_size):
+                output = list(OntologyTransformer(self.schema_mapper, batch_size=batch_size,
+                                                  on_error='dead_letter').transform(events))
+
+                self.assertEqual([type(item) for item in output], [Flight, DeadLetter, Flight])
+                dead_letter = output[1]
+                self.assertEqual((dead_letter.stage, dead_letter.kind, dead_letter.record_id),
+                                 ('transform', 'flight', '404'))
+                self.assertEqual(dead_letter.payload['departure_dt'], 'not a date')
+                self.assertIn('departure_datetime', dead_letter.error)
+
+    def test_slotted_records_match_models(self):
+        """Test that records sharing a column index transform like the pydantic events."""
+        columns = ColumnIndex(self.events[0].payload)
+        records = [EventRecord(event.event_id, event.event_type, event.timestamp, event.source, columns,
+                               tuple(event.payload.values())) for event in self.events]
+        self.assertEqual(records[0].payload, self.events[0].payload)
+        self.assertEqual(records[0].to_model(), self.events[0])
+        # Worker processes receive the shared index once per pickled shard.
+        shipped = pickle.loads(pickle.dumps(records))
+        self.assertIs(shipped[0].columns, shipped[-1].columns)
+
+        for batch_size in (None, 2):
+            for emit in ('models', 'rows'):
+                with self.subTest(batch_size=batch_size, emit=emit):
+                    transformer = OntologyTransformer(self.schema_mapper, batch_size=batch_size, emit=emit)
+                    expected = list(transformer.transform(self.events))
+                    self.assertEqual(list(transformer.transform(records)), expected)
+                    self.assertEqual(list(transformer.transform(shipped)), expected)
+
+    def test_prefetch_resolves_mappings_in_one_call(self):
+        """Test that prefetching asks the schema mapper for every kind at once."""
+        self.schema_mapper.get_schema_mappings.side_effect = lambda sources: [
+            self.schema_mapper.get_schema_mapping.side_effect(*source) for source in sources]
+        transformer = OntologyTransformer(self.schema_mapper)
+        mappings = transformer.prefetch_mappings({'airline': ['airlie_id', 'airline_name'],
+                                                  'flight': list(FLIGHT_MAPPING)})
+
+        self.assertEqual(mappings['flight', tuple(FLIGHT_MAPPING)], FLIGHT_MAPPING)
+        self.schema_mapper.get_schema_mappings.assert_called_once()
+        list(transformer.transform(self.events))
+        self.schema_mapper.get_schema_mapping.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+from unittest.mock import MagicMock
+from src.etl.models import Flight
+from src.etl.transformers.ontology_transformer import OntologyTransformer
+from src.etl.transformers.parallel_transformer import ParallelTransformer
+from tests.test_ontology_transformer import FLIGHT_MAPPING, make_event
+
+
+class TestParallelTransformer(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a batch transformer with a stubbed schema mapper."""
+        self.schema_mapper = MagicMock()
+        self.schema_mapper.get_schema_mapping.return_value = FLIGHT_MAPPING
+        self.events = [make_event(flight_number) for flight_number in range(100, 110)]
+
+    def test_sharded_transform_keeps_order(self):
+        """Test that shards transformed in worker processes come back in input order."""
+        transformer = OntologyTransformer(self.schema_mapper, batch_size=2)
+        expected = list(transformer.transform(self.events))
+
+        output = list(ParallelTransformer(transformer, workers=2, shard_size=3).transform(self.events))
+
+        self.assertEqual(output, expected)
+        self.schema_mapper.get_schema_mapping.assert_called_once()
+
+    def test_small_input_runs_in_process(self):
+        """Test the serial fallback for inputs shorter than one shard."""
+        transformer = OntologyTransformer(self.schema_mapper)
+        output = list(ParallelTransformer(transformer, workers=4, shard_size=100).transform(self.events))
+
+        self.assertEqual([flight.flight_number for flight in output], [str(n) for n in range(100, 110)])
+        self.assertTrue(all(isinstance(flight, Flight) for flight in output))
+
+
+if __name__ == '__main__':
+    unittest.main()
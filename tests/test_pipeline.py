@@ -0,0 +1,66 @@
+import unittest
+from unittest.mock import patch
+from src.etl.abstractions import Extractor, Transformer, Loader
+from src.etl.pipeline import Pipeline
+
+
+class ListExtractor(Extractor):
+    def __init__(self, records):
+        self.records = records
+        self.closed = False
+
+    def extract(self):
+        try:
+            yield from self.records
+        finally:
+            self.closed = True
+
+
+class DoublingTransformer(Transformer):
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+
+    def transform(self, data):
+        for item in data:
+            if item == self.fail_on:
+                raise ValueError(f"bad record {item}")
+            yield item * 2
+
+
+class ListLoader(Loader):
+    def __init__(self):
+        self.loaded = []
+
+    def load(self, data):
+        self.loaded.extend(data)
+
+
+class TestPipeline(unittest.TestCase):
+
+    def test_concurrent_run_matches_serial(self):
+        """Test that the threaded run loads the same records in the same order."""
+        serial_loader, concurrent_loader = ListLoader(), ListLoader()
+        self.assertIsNone(Pipeline(ListExtractor(range(1000)), DoublingTransformer(), serial_loader).run())
+        pipeline = Pipeline(ListExtractor(range(1000)), DoublingTransformer(), concurrent_loader,
+                            concurrent=True, queue_depth=2, batch_size=7)
+        with patch('builtins.print') as mock_print:
+            self.assertIsNone(pipeline.run())
+
+        self.assertEqual(concurrent_loader.loaded, serial_loader.loaded)
+        self.assertEqual(set(pipeline.stage_timings), {'extract', 'transform', 'load', 'total'})
+        mock_print.assert_not_called()
+
+    def test_concurrent_run_propagates_stage_errors(self):
+        """Test that a failing stage stops the others and re-raises its error."""
+        extractor, loader = ListExtractor(range(100_000)), ListLoader()
+        pipeline = Pipeline(extractor, DoublingTransformer(fail_on=50), loader,
+                            concurrent=True, queue_depth=1, batch_size=10)
+
+        with self.assertRaisesRegex(ValueError, 'bad record 50'):
+            pipeline.run()
+        self.assertTrue(extractor.closed)
+        self.assertLess(len(loader.loaded), 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
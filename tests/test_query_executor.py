@@ -0,0 +1,122 @@
+import threading
+import time
+import unittest
+import pandas as pd
+from src.query_executor import QueryError, QueryExecutor, QueryTimeout, _share_frame, resource
+
+
+class TestQueryExecutor(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """Start one pool of two workers over small flights and airlines frames."""
+        cls.flights_df = pd.DataFrame({
+            'airline_id': [1, 1, 2],
+            'flight_number': [101, 102, 201],
+            'departure_datetime': pd.to_datetime(['2023-01-01', '2023-01-02', '2023-01-03']),
+            'status': ['Confirmed', 'Cancelled', 'Confirmed'],
+        })
+        cls.airlines_df = pd.DataFrame({'airline_id': [1, 2], 'airline_name': ['Test Airline 1', 'Test Airline 2']})
+        cls.executor = QueryExecutor({'flights_df': cls.flights_df, 'airlines_df': cls.airlines_df}, workers=2,
+                                     timeout_seconds=5, cpu_seconds=1, memory_mb=256)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.executor.close()
+
+    def test_queries_see_the_shared_frames(self):
+        """Test that workers evaluate queries over the parent's frames, dtypes intact."""
+        query = "flights_df.merge(airlines_df, on='airline_id')['airline_name'].value_counts().idxmax()"
+        self.assertEqual(self.executor.run(query), 'Test Airline 1')
+        self.assertEqual(self.executor.run("str(flights_df['departure_datetime'].dtype)"), 'datetime64[ns]')
+        pd.testing.assert_frame_equal(self.executor.run("flights_df"), self.flights_df)
+
+    def test_string_columns_are_shared_not_pickled(self):
+        """Test that text columns reach the workers through shared memory, missing values intact."""
+        df = pd.DataFrame({'name': ['Zoë', None, 'Ann'], 'code': ['A1', 'B2', 'C3'], 'tags': [['a'], [], ['b']]})
+        spec, blocks = _share_frame(df)
+        for block in blocks:
+            block.close()
+            block.unlink()
+        self.assertEqual([kind for _, (kind, *_) in spec['columns']], ['string', 'string', 'pickled'])
+
+        with QueryExecutor({'df': df}, workers=1) as executor:
+            pd.testing.assert_frame_equal(executor.run("df"), df)
+            self.assertIsNone(executor.run("df['name'][1]"))
+
+    def test_categorical_columns_stay_shared(self):
+        """Test that workers keep category codes in shared memory and still answer as over plain columns."""
+        plain = pd.DataFrame({
+            'status': ['Pending', 'Confirmed', 'Cancelled', 'Confirmed', 'Pending', 'Delayed', 'Cancelled'],
+            'cabin': ['Economy', 'Business', 'Economy', 'First', 'Economy', 'Business', 'First'],
+            'fare': [100.0, 900.0, 120.0, 2000.0, 110.0, 950.0, 1800.0],
+        })
+        categorical = plain.astype({'status': 'category', 'cabin': 'category'})
+        categorical['status'] = categorical['status'].cat.reorder_categories(
+            ['Pending', 'Delayed', 'Confirmed', 'Cancelled'])
+        queries = [
+            "df[df['status'] != 'Delayed']['status'].value_counts()",
+            "df[df['cabin'] == 'Economy'].groupby('status')['fare'].mean()",
+            "pd.crosstab(df[df['cabin'] != 'First']['cabin'], df[df['cabin'] != 'First']['status'])",
+            "df['status'].unique()",
+            "df['status'].max()",
+            "(df['cabin'] + '/' + df['status']).tolist()",
+        ]
+        with QueryExecutor({'df': categorical}, workers=1) as executor:
+            self.assertEqual(executor.run("str(df['status'].dtype)"), 'category')
+            # A decoded or converted copy would be writeable; the shared codes are not.
+            self.assertFalse(executor.run("df['status'].array.codes.flags.writeable"))
+            for query in queries:
+                with self.subTest(query=query):
+                    self.assertEqual(repr(executor.run(query)), repr(eval(query, {'df': plain, 'pd': pd})))
+
+    def test_frames_are_read_only(self):
+        """Test that a query cannot change the data other queries see."""
+        with self.assertRaisesRegex(QueryError, 'read-only'):
+            self.executor.run("flights_df['flight_number'].to_numpy().__setitem__(0, 0)")
+        self.assertEqual(self.executor.run("int(flights_df['flight_number'].sum())"), 404)
+
+    def test_errors_leave_the_worker_reusable(self):
+        """Test that a failing query is reported and its worker answers the next one."""
+        with self.assertRaisesRegex(QueryError, 'KeyError'):
+            self.executor.run("flights_df['missing']")
+        pids = {self.executor.run("__import__('os').getpid()") for _ in range(6)}
+        self.assertLessEqual(len(pids), 2)
+
+    def test_runaway_query_is_cancelled_without_blocking_others(self):
+        """Test that a query past the timeout is killed and the pool keeps serving."""
+        with QueryExecutor({'flights_df': self.flights_df}, workers=2, timeout_seconds=2) as executor:
+            for _ in range(2):
+                executor.run("len(flights_df)")
+            errors = []
+
+            def run_away():
+                try:
+                    executor.run("__import__('time').sleep(30)")
+                except QueryError as e:
+                    errors.append(e)
+
+            thread = threading.Thread(target=run_away)
+            started = time.monotonic()
+            thread.start()
+            # Answered by the other worker while the runaway query is still running.
+            self.assertEqual(executor.run("len(flights_df)"), 3)
+            self.assertLess(time.monotonic() - started, 2)
+            thread.join()
+            self.assertLess(time.monotonic() - started, 10)
+            self.assertEqual([type(e) for e in errors], [QueryTimeout])
+            # The killed worker was replaced.
+            self.assertEqual({executor.run("len(flights_df) * 2") for _ in range(3)}, {6})
+
+    @unittest.skipIf(resource is None, "per-query limits need the resource module")
+    def test_cpu_and_memory_limits(self):
+        """Test that queries over their CPU or memory budget fail and the worker recovers."""
+        with self.assertRaisesRegex(QueryError, 'CPU time limit'):
+            self.executor.run("sum(i * i for i in range(10 ** 10))")
+        with self.assertRaisesRegex(QueryError, 'memory limit'):
+            self.executor.run("bytearray(512 * 1024 * 1024)")
+        self.assertEqual(self.executor.run("len(airlines_df)"), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
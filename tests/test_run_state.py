@@ -0,0 +1,84 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+import pandas as pd
+from src.etl.extractors.csv_extractor import CsvExtractor
+from src.etl.loaders.sqlite_loader import SqliteLoader
+from src.etl.pipeline import Pipeline
+from src.etl.run_state import RunStateStore
+from src.etl.transformers.ontology_transformer import OntologyTransformer
+
+FLIGHT_MAPPING = {
+    'airlie_id': 'airline_id', 'flght#': 'flight_number', 'departure_dt': 'departure_datetime',
+    'arrival_dt': 'arrival_datetime', 'dep_time': 'departure_time', 'arrivl_time': 'arrival_time',
+    'booking_cd': 'booking_code', 'passngr_nm': 'name', 'status': 'status', 'duration_hrs': 'duration_hours',
+}
+
+
+class TestRunState(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a flights file of 100 rows, one of them invalid, and an empty warehouse."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.flights_file = os.path.join(self.temp_dir.name, 'flights.csv')
+        self.db_path = os.path.join(self.temp_dir.name, 'warehouse.db')
+        count = 100
+        frame = pd.DataFrame({
+            'airlie_id': [1] * count,
+            'flght#': range(1000, 1000 + count),
+            'departure_dt': ['2023-01-01 10:00:00'] * count,
+            'arrival_dt': ['2023-01-01 12:00:00'] * count,
+            'dep_time': ['10:00:00'] * count,
+            'arrivl_time': ['12:00:00'] * count,
+            'booking_cd': ['ABCD'] * count,
+            'passngr_nm': ['Name_TEST'] * count,
+            'status': ['Confirmed'] * count,
+            'duration_hrs': [2.0] * 55 + ['unknown'] + [2.0] * (count - 56),
+        })
+        frame.to_csv(self.flights_file, index=False)
+        self.schema_mapper = MagicMock()
+        self.schema_mapper.get_schema_mapping.return_value = FLIGHT_MAPPING
+
+    def run_pipeline(self) -> None:
+        extractor = CsvExtractor(self.flights_file, source='csv', chunksize=10, incremental=True,
+                                 watermarks=RunStateStore(self.db_path))
+        transformer = OntologyTransformer(self.schema_mapper, batch_size=4, emit='rows', on_error='dead_letter')
+        loader = SqliteLoader(self.db_path, batch_size=3, on_error='dead_letter')
+        Pipeline(extractor, transformer, loader, concurrent=True, batch_size=7).run()
+
+    def query(self, sql: str) -> list:
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute(sql).fetchall()
+
+    def test_failed_run_resumes_from_last_checkpoint(self):
+        """Test that a run failing mid-file keeps its committed chunks and the rerun loads only the rest."""
+        checkpoint = SqliteLoader._checkpoint
+        calls = []
+
+        def fail_on_fifth_chunk(loader, connection, item):
+            calls.append(item)
+            if len(calls) == 6:
+                raise OSError("disk full")
+            checkpoint(loader, connection, item)
+
+        with patch.object(SqliteLoader, '_checkpoint', fail_on_fifth_chunk):
+            with self.assertRaises(OSError):
+                self.run_pipeline()
+        self.assertEqual(self.query("SELECT COUNT(*) FROM flights"), [(40,)])
+        store = RunStateStore(self.db_path)
+        source_id = CsvExtractor(self.flights_file, source='csv').source_id
+        self.assertEqual(store.get(source_id), calls[4].watermark)
+
+        self.run_pipeline()
+        # Re-extracted rows would collide with committed ones and show up as 'load' dead letters.
+        self.assertEqual(self.query("SELECT COUNT(*), MIN(flight_number), MAX(flight_number) FROM flights"),
+                         [(99, '1000', '1099')])
+        self.assertEqual(self.query("SELECT stage, record_id FROM dead_letters"), [('transform', '1055')])
+        self.assertEqual(store.get(source_id)['offset'], os.path.getsize(self.flights_file))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import tempfile
+import unittest
+from src.disk_cache import DiskCache
+from src.etl.column_matcher import ColumnMatcher
+from src.etl.models import Airline, Flight
+from src.etl.schema_mapper import SchemaMapper
+from src.llm_client import FunctionTransport, LLMClient
+
+FLIGHTS_COLUMNS = [
+    'airlie_id', 'flght#', 'departure_dt', 'arrival_dt', 'dep_time', 'arrivl_time', 'booking_cd',
+    'passngr_nm', 'seat_no', 'class', 'fare', 'extras', 'loyalty_pts', 'status', 'gate', 'terminal',
+    'baggage_claim', 'duration_hrs', 'layovers', 'layover_locations', 'aircraft_type', 'pilot',
+    'cabin_crew', 'inflight_ent', 'meal_option', 'wifi', 'window_seat', 'aisle_seat',
+    'emergency_exit_row', 'number_of_stops', 'reward_program_member',
+]
+
+
+class TestSchemaMapper(unittest.TestCase):
+
+    def setUp(self):
+        """Use a throwaway mapping cache."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = DiskCache(self.temp_dir.name)
+        self.prompts = []
+        self.client = LLMClient(FunctionTransport(self.respond))
+
+    def tearDown(self):
+        """Clean up test data."""
+        self.client.close()
+        self.temp_dir.cleanup()
+
+    def respond(self, prompt):
+        self.prompts.append(prompt)
+        if "'carrier'" in prompt:
+            return '```json{"carrier": "name"}```'
+        return '{"fltno": "flight_number"}'
+
+    def test_column_matcher_scores(self):
+        """Test typo, abbreviation and token rules of the local matcher."""
+        matcher = ColumnMatcher()
+        self.assertGreaterEqual(matcher.score('arrivl_time', 'arrival_time'), 0.8)
+        self.assertGreaterEqual(matcher.score('flght#', 'flight_number'), 0.8)
+        self.assertGreaterEqual(matcher.score('inflight_ent', 'in_flight_entertainment'), 0.8)
+        self.assertLess(matcher.score('arrival_dt', 'arrival_time'), 0.8)
+
+    def test_flights_headers_resolve_offline(self):
+        """Test that the raw flights headers map without any Gemini call."""
+        mapping = SchemaMapper(cache=self.cache, client=self.client).get_schema_mapping(FLIGHTS_COLUMNS, Flight)
+
+        self.assertEqual(len(mapping), len(FLIGHTS_COLUMNS))
+        self.assertEqual(mapping['airlie_id'], 'airline_id')
+        self.assertEqual(mapping['flght#'], 'flight_number')
+        self.assertEqual(mapping['dep_time'], 'departure_time')
+        self.assertEqual(mapping['class'], 'class_of_service')
+        self.assertEqual(mapping['wifi'], 'wifi_available')
+        self.assertEqual(self.client.requests_sent, 0)
+
+    def test_unresolved_columns_fall_back_to_gemini(self):
+        """Test that only unresolved columns are sent, and the result is cached."""
+        schema_mapper = SchemaMapper(model_name='test-model', cache=self.cache, client=self.client)
+
+        first = schema_mapper.get_schema_mapping(['airlie_id', 'carrier'], Airline)
+        second = schema_mapper.get_schema_mapping(['carrier', 'airlie_id'], Airline)
+
+        self.assertEqual(first, {'airlie_id': 'airline_id', 'carrier': 'name'})
+        self.assertEqual(second, first)
+        self.assertEqual(len(self.prompts), 1)
+        self.assertIn("['carrier']", self.prompts[0])
+        self.assertNotIn('airlie_id', self.prompts[0])
+
+    def test_several_sources_resolve_together(self):
+        """Test that mappings for several sources come back in order, each asking once."""
+        schema_mapper = SchemaMapper(cache=self.cache, client=self.client)
+
+        airline, flight = schema_mapper.get_schema_mappings([
+            (['airlie_id', 'carrier'], Airline),
+            (['fltno', 'airlie_id'], Flight),
+        ])
+
+        self.assertEqual(airline, {'airlie_id': 'airline_id', 'carrier': 'name'})
+        self.assertEqual(flight, {'airlie_id': 'airline_id', 'fltno': 'flight_number'})
+        self.assertEqual(len(self.prompts), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
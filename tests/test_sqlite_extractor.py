@@ -0,0 +1,54 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from src.etl.extractors.sqlite_extractor import SqliteExtractor
+
+
+class TestSqliteExtractor(unittest.TestCase):
+
+    def setUp(self):
+        """Create a small events table."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, 'source.db')
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("CREATE TABLE events (event_id TEXT, event_type TEXT, timestamp TEXT, detail TEXT)")
+            conn.executemany("INSERT INTO events VALUES (?, ?, ?, ?)", [
+                (str(i), 'test_event' if i % 2 else 'other_event', f'2025-09-09T{i:02d}:00:00', f'detail {i}')
+                for i in range(10)
+            ])
+
+    def tearDown(self):
+        """Clean up test data."""
+        self.temp_dir.cleanup()
+
+    def test_projection_and_predicate(self):
+        """Test that only projected columns and matching rows are returned."""
+        extractor = SqliteExtractor(self.db_path, 'events', source='sqlite', batch_size=2, columns=['event_id'],
+                                    where="event_type = ?", params=['test_event'])
+        events = list(extractor.extract())
+
+        self.assertEqual([event.event_id for event in events], ['1', '3', '5', '7', '9'])
+        self.assertEqual(set(events[0].payload), {'event_id', 'event_type', 'timestamp'})
+
+    def test_connection_closed_when_consumer_stops_early(self):
+        """Test that closing the generator early closes the read-only connection."""
+        connections = []
+
+        class RecordingExtractor(SqliteExtractor):
+            def _connect(self):
+                connections.append(super()._connect())
+                return connections[-1]
+
+        events = RecordingExtractor(self.db_path, 'events', source='sqlite', batch_size=3).extract()
+        next(events)
+        with self.assertRaises(sqlite3.OperationalError):
+            connections[0].execute("DELETE FROM events")
+        events.close()
+
+        with self.assertRaises(sqlite3.ProgrammingError):
+            connections[0].execute("SELECT 1")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,267 @@
+import datetime
+import os
+import sqlite3
+import tempfile
+import unittest
+from sqlalchemy.exc import IntegrityError
+from src.etl.loaders.sqlite_loader import SqliteLoader, FAST_WRITE_PRAGMAS
+from src.etl.models import Airline, Flight, Passenger, RowBatch
+from src.etl.records import DeadLetter
+
+
+def make_flight(
+    flight_number: str,
+    airline_id: int = 1,
+    status: str = 'Confirmed',
+    class_of_service: str = 'Economy',
+    fare: float | None = 250.0,
+    loyalty_points: int | None = None,
+    reward_program_member: bool | None = None,
+) -> Flight:
+    return Flight(
+        flight_number=flight_number,
+        airline_id=airline_id,
+        departure_datetime=datetime.datetime(2023, 1, 1, 10, 0),
+        arrival_datetime=datetime.datetime(2023, 1, 1, 12, 0),
+        departure_time=datetime.time(10, 0),
+        arrival_time=datetime.time(12, 0),
+        booking_code='ABCD',
+        status=status,
+        duration_hours=2.0,
+        passenger=Passenger(
+            name='Name_TEST',
+            class_of_service=class_of_service,
+            fare=fare,
+            loyalty_points=loyalty_points,
+            reward_program_member=reward_program_member,
+        ),
+    )
+
+
+class TestSqliteLoader(unittest.TestCase):
+
+    def setUp(self):
+        """Create a fresh warehouse in a temporary directory."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, 'warehouse.db')
+
+    def tearDown(self):
+        """Clean up test data."""
+        self.temp_dir.cleanup()
+
+    def query(self, sql: str) -> list:
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute(sql).fetchall()
+
+    def test_batched_load(self):
+        """Test that rows spanning several batches are all inserted."""
+        loader = SqliteLoader(self.db_path, batch_size=2, pragmas=FAST_WRITE_PRAGMAS)
+        loader.load([Airline(airline_id=1, name='Test Airline 1')] + [make_flight(str(i)) for i in range(3)])
+
+        self.assertEqual(self.query("SELECT airline_id, name FROM airlines"), [(1, 'Test Airline 1')])
+        self.assertEqual(self.query("SELECT COUNT(*) FROM flights"), [(3,)])
+        self.assertEqual(self.query("PRAGMA journal_mode"), [('wal',)])
+
+    def test_failed_rows_become_dead_letters(self):
+        """Test that duplicate keys are set aside, and only inserted rows are summarized."""
+        for batch_size in (None, 2):
+            with self.subTest(batch_size=batch_size):
+                self.db_path = os.path.join(self.temp_dir.name, f'warehouse_{batch_size}.db')
+                loader = SqliteLoader(self.db_path, batch_size=batch_size, on_error='dead_letter')
+                loader.load([
+                    make_flight('1'),
+                    make_flight('2', status='Cancelled'),
+                    make_flight('1', status='Cancelled'),
+                    DeadLetter('transform', 'flight', '9', 'csv', {'fare': float('nan')}, 'invalid fare'),
+                    make_flight('3'),
+                ])
+
+                self.assertEqual(self.query("SELECT COUNT(*) FROM flights"), [(3,)])
+                self.assertEqual(self.query("SELECT SUM(flights) FROM flight_status_counts"), [(3,)])
+                self.assertEqual(self.query("SELECT payload FROM dead_letters WHERE stage = 'transform'"),
+                                 [('{"fare": null}',)])
+                self.assertEqual(sorted(self.query("SELECT stage, kind, record_id FROM dead_letters")),
+                                 [('load', 'flight', '1'), ('transform', 'flight', '9')])
+                self.assertEqual(loader.dead_letter_count, 2)
+
+    def test_duplicate_rows_raise_by_default(self):
+        """Test that without dead-lettering a constraint violation still aborts the load."""
+        with self.assertRaises(IntegrityError):
+            SqliteLoader(self.db_path).load([make_flight('1'), make_flight('1')])
+
+    def test_row_batch_load(self):
+        """Test that transformer row batches are inserted without models."""
+        flight = make_flight('101')
+        batch = RowBatch(schema=Flight, columns=list(Flight.model_fields), rows=[tuple(flight.model_dump().values())])
+        SqliteLoader(self.db_path).load([batch])
+
+        self.assertEqual(self.query("SELECT flight_number, status FROM flights"), [('101', 'Confirmed')])
+
+    def test_row_by_row_load(self):
+        """Test the unbatched path used when batch_size is None."""
+        SqliteLoader(self.db_path, batch_size=None).load([make_flight('101')])
+
+        self.assertEqual(self.query("SELECT flight_number, departure_time FROM flights"), [('101', '10:00:00.000000')])
+
+    def test_secondary_indexes_created_after_load(self):
+        """Test that the analysis indexes exist after a load and are reused by later loads."""
+        loader = SqliteLoader(self.db_path)
+        self.assertEqual(self.query("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'ix_%'"), [])
+
+        loader.load([make_flight('101')])
+        loader.load([make_flight('102')])
+
+        self.assertEqual(
+            self.query("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'ix_%' ORDER BY name"),
+            [('ix_flights_airline_id',), ('ix_flights_departure_datetime',), ('ix_flights_status',)],
+        )
+        plan = self.query("EXPLAIN QUERY PLAN SELECT COUNT(*) FROM flights WHERE status = 'Confirmed'")
+        # The view looks the status up once, then searches the coded column's index.
+        self.assertIn('lookup_status', plan[0][-1])
+        self.assertIn('ix_flights_status', plan[1][-1])
+
+    def test_dictionary_columns_stored_as_codes(self):
+        """Test that low-cardinality columns are coded in flight_facts and readable through the view."""
+        loader = SqliteLoader(self.db_path, batch_size=2)
+        loader.load([make_flight('101'), make_flight('102', status='Cancelled'), make_flight('103')])
+        loader.load([make_flight('104', status='Cancelled'), make_flight('105', status='Delayed')])
+
+        self.assertEqual(self.query("SELECT code, value FROM lookup_status ORDER BY code"),
+                         [(1, 'Confirmed'), (2, 'Cancelled'), (3, 'Delayed')])
+        self.assertEqual(self.query("SELECT status FROM flight_facts ORDER BY flight_number"), [(1,), (2,), (1,), (2,), (3,)])
+        self.assertEqual(self.query("SELECT status, terminal FROM flights ORDER BY flight_number"),
+                         [('Confirmed', None), ('Cancelled', None), ('Confirmed', None), ('Cancelled', None),
+                          ('Delayed', None)])
+        self.assertEqual(self.query("SELECT status, flights FROM flight_status_counts ORDER BY 1"),
+                         [('Cancelled', 2), ('Confirmed', 2), ('Delayed', 1)])
+
+    def test_plain_flights_table_migrated(self):
+        """Test that a warehouse with flights as a plain table is moved to flight_facts."""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("CREATE TABLE flights (flight_number VARCHAR PRIMARY KEY, airline_id INTEGER, "
+                         "status VARCHAR, terminal VARCHAR, meal_option VARCHAR)")
+            conn.execute("CREATE INDEX ix_flights_status ON flights (status)")
+            conn.executemany("INSERT INTO flights VALUES (?, ?, ?, ?, ?)",
+                             [('101', 1, 'Confirmed', 'A', None), ('102', 1, 'Cancelled', 'A', 'Vegetarian')])
+        conn.close()
+
+        loader = SqliteLoader(self.db_path)
+        loader.load([make_flight('103')])
+
+        self.assertEqual(self.query("SELECT type FROM sqlite_master WHERE name = 'flights'"), [('view',)])
+        self.assertEqual(self.query("SELECT flight_number, status, terminal, meal_option FROM flights ORDER BY 1"),
+                         [('101', 'Confirmed', 'A', None), ('102', 'Cancelled', 'A', 'Vegetarian'),
+                          ('103', 'Confirmed', None, None)])
+        self.assertEqual(self.query("SELECT airline_id, status, flights FROM flight_status_counts ORDER BY 2"),
+                         [(1, 'Cancelled', 1), (1, 'Confirmed', 2)])
+        self.assertEqual(self.query("SELECT tbl_name FROM sqlite_master WHERE name = 'ix_flights_status'"),
+                         [('flight_facts',)])
+
+    def test_summary_tables_track_loads(self):
+        """Test that summaries updated batch by batch match a full recomputation."""
+        flights = [
+            make_flight('101', airline_id=1, class_of_service='Economy', fare=100.0,
+                        loyalty_points=10, reward_program_member=True),
+            make_flight('102', airline_id=1, status='Cancelled', class_of_service='Business', fare=900.0,
+                        loyalty_points=0, reward_program_member=False),
+            make_flight('103', airline_id=2, class_of_service='Economy', fare=300.0,
+                        loyalty_points=30, reward_program_member=True),
+            make_flight('104', airline_id=2, class_of_service='Economy', fare=None),
+        ]
+        loader = SqliteLoader(self.db_path, batch_size=2)
+        loader.load(flights[:3])
+        loader.load(flights[3:])
+
+        self.assertEqual(
+            self.query("SELECT airline_id, status, flights FROM flight_status_counts ORDER BY 1, 2"),
+            [(1, 'Cancelled', 1), (1, 'Confirmed', 1), (2, 'Confirmed', 2)],
+        )
+        self.assertEqual(
+            self.query("SELECT * FROM class_fare_stats WHERE class_of_service = 'Economy'"),
+            [('Economy', 3, 2, 400.0, 100.0, 300.0)],
+        )
+        self.assertEqual(
+            self.query("SELECT * FROM loyalty_points_by_membership ORDER BY 1"),
+            [(0, 1, 1, 0), (1, 2, 2, 40)],
+        )
+        self.assert_summaries_rebuild_unchanged(loader)
+
+    def test_summary_tables_backfilled(self):
+        """Test that summary tables added to a loaded warehouse are filled from flights."""
+        SqliteLoader(self.db_path, maintain_summaries=False).load([make_flight('101'), make_flight('102')])
+        SqliteLoader(self.db_path)
+
+        self.assertEqual(self.query("SELECT airline_id, status, flights FROM flight_status_counts"), [(1, 'Confirmed', 2)])
+
+    def assert_summaries_rebuild_unchanged(self, loader):
+        incremental = {table: self.query(f"SELECT * FROM {table} ORDER BY 1, 2") for table in loader.summary_tables}
+        loader.rebuild_summaries()
+        for table, rows in incremental.items():
+            self.assertEqual(self.query(f"SELECT * FROM {table} ORDER BY 1, 2"), rows)
+
+    def test_upsert_reload_is_idempotent(self):
+        """Test that loading the same rows twice in upsert mode changes nothing."""
+        rows = [Airline(airline_id=1, name='Test Airline 1')] + [make_flight(str(i)) for i in range(3)]
+        for batch_size in (None, 2):
+            with self.subTest(batch_size=batch_size):
+                self.db_path = os.path.join(self.temp_dir.name, f'warehouse_{batch_size}.db')
+                loader = SqliteLoader(self.db_path, batch_size=batch_size, mode='upsert')
+                loader.load(rows)
+                loader.load(rows)
+
+                self.assertEqual(self.query("SELECT COUNT(*) FROM airlines"), [(1,)])
+                self.assertEqual(self.query("SELECT COUNT(*) FROM flights"), [(3,)])
+                self.assertEqual(self.query("SELECT airline_id, status, flights FROM flight_status_counts"),
+                                 [(1, 'Confirmed', 3)])
+                self.assertEqual(self.query("SELECT COUNT(*) FROM dead_letters"), [(0,)])
+
+    def test_upsert_last_row_wins(self):
+        """Test that repeated keys keep the last row, and summaries retract the rows replaced."""
+        loader = SqliteLoader(self.db_path, batch_size=3, mode='upsert')
+        loader.load([
+            make_flight('101', class_of_service='Economy', fare=100.0),
+            make_flight('102', class_of_service='Economy', fare=900.0),
+            make_flight('103', class_of_service='Business', fare=500.0),
+        ])
+        loader.load([
+            make_flight('102', status='Cancelled', class_of_service='Economy', fare=200.0),
+            make_flight('103', airline_id=2, class_of_service='Economy', fare=300.0),
+            make_flight('103', airline_id=2, status='Cancelled', class_of_service='Economy', fare=400.0),
+        ])
+
+        self.assertEqual(
+            self.query("SELECT flight_number, airline_id, status FROM flights ORDER BY 1"),
+            [('101', 1, 'Confirmed'), ('102', 1, 'Cancelled'), ('103', 2, 'Cancelled')],
+        )
+        self.assertEqual(
+            self.query("SELECT airline_id, status, flights FROM flight_status_counts ORDER BY 1, 2"),
+            [(1, 'Cancelled', 1), (1, 'Confirmed', 1), (2, 'Cancelled', 1)],
+        )
+        # Business lost its only flight; the Economy maximum of 900 was overwritten.
+        self.assertEqual(self.query("SELECT * FROM class_fare_stats"), [('Economy', 3, 3, 700.0, 100.0, 400.0)])
+        self.assert_summaries_rebuild_unchanged(loader)
+
+    def test_upsert_version_column(self):
+        """Test that a row with an older version never replaces a newer one."""
+        def departing(flight_number, day, status):
+            flight = make_flight(flight_number, status=status)
+            return flight.model_copy(update={'departure_datetime': datetime.datetime(2023, 1, day, 10, 0)})
+
+        loader = SqliteLoader(self.db_path, mode='upsert', version_column='departure_datetime')
+        loader.load([departing('101', 2, 'Confirmed'), departing('101', 1, 'Cancelled'), departing('102', 1, 'Confirmed')])
+        loader.load([departing('101', 1, 'Delayed'), departing('102', 3, 'Cancelled')])
+
+        self.assertEqual(self.query("SELECT flight_number, status FROM flights ORDER BY 1"),
+                         [('101', 'Confirmed'), ('102', 'Cancelled')])
+        self.assertEqual(self.query("SELECT status, flights FROM flight_status_counts ORDER BY 1"),
+                         [('Cancelled', 1), ('Confirmed', 1)])
+        self.assert_summaries_rebuild_unchanged(loader)
+
+    def test_invalid_mode_rejected(self):
+        """Test that an unknown load mode is rejected up front."""
+        with self.assertRaises(ValueError):
+            SqliteLoader(self.db_path, mode='replace')
+
+
+if __name__ == '__main__':
+    unittest.main()
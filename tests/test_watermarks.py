@@ -0,0 +1,123 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+import pandas as pd
+from src.etl.abstractions import Loader, Transformer
+from src.etl.extractors.csv_extractor import CsvExtractor
+from src.etl.extractors.sqlite_extractor import SqliteExtractor
+from src.etl.pipeline import Pipeline
+from src.etl.records import EventRecord
+from src.etl.watermarks import WatermarkStore
+
+
+class PassThroughTransformer(Transformer):
+    def transform(self, data):
+        return data
+
+
+class FirstRecordLoader(Loader):
+    def load(self, data):
+        next(iter(data))
+
+
+class TestIncrementalExtraction(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a watermark store and sources in a temporary directory."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.watermarks = WatermarkStore(os.path.join(self.temp_dir.name, 'watermarks.json'))
+        self.flights_file = os.path.join(self.temp_dir.name, 'flights.csv')
+        self.db_path = os.path.join(self.temp_dir.name, 'source.db')
+
+    def tearDown(self):
+        """Clean up test data."""
+        self.temp_dir.cleanup()
+
+    def write_flights(self, flight_numbers: list[int], mode: str = 'w') -> None:
+        pd.DataFrame({
+            'flght#': flight_numbers,
+            'departure_dt': ['2023-01-01 10:00:00'] * len(flight_numbers),
+        }).to_csv(self.flights_file, index=False, mode=mode, header=(mode == 'w'))
+
+    def extract_flights(self) -> list[str]:
+        extractor = CsvExtractor(self.flights_file, source='csv', incremental=True, watermarks=self.watermarks)
+        event_ids = [event.event_id for event in extractor.extract() if isinstance(event, EventRecord)]
+        extractor.commit()
+        return event_ids
+
+    def test_csv_reads_only_appended_rows(self):
+        """Test that appended rows are extracted and earlier rows are skipped."""
+        self.write_flights([101, 202])
+        self.assertEqual(self.extract_flights(), ['101', '202'])
+        self.assertEqual(self.extract_flights(), [])
+
+        self.write_flights([303], mode='a')
+        self.assertEqual(self.extract_flights(), ['303'])
+
+    def test_csv_rewrite_triggers_full_reload(self):
+        """Test that a rewritten file is extracted again from the start."""
+        self.write_flights([101, 202])
+        self.extract_flights()
+
+        self.write_flights([909, 808, 707])
+        self.assertEqual(self.extract_flights(), ['909', '808', '707'])
+
+    def test_uncommitted_run_is_repeated(self):
+        """Test that the watermark only advances on commit."""
+        self.write_flights([101])
+        extractor = CsvExtractor(self.flights_file, source='csv', incremental=True, watermarks=self.watermarks)
+        list(extractor.extract())
+
+        self.assertEqual(self.extract_flights(), ['101'])
+
+    def test_stopped_extraction_commits_only_handed_on_chunks(self):
+        """Test that a consumer stopping early leaves the rest of the file for the next run."""
+        self.write_flights([101, 202, 303, 404, 505])
+        extractor = CsvExtractor(self.flights_file, source='csv', chunksize=2, incremental=True,
+                                 watermarks=self.watermarks)
+        records = extractor.extract()
+        taken = [next(records) for _ in range(4)]
+        extractor.commit()
+        self.assertIsNone(self.watermarks.get(extractor.source_id))
+
+        # Past the first chunk's checkpoint: only that chunk's rows are committed.
+        taken.append(next(records))
+        extractor.commit()
+        self.assertEqual([event.event_id for event in taken if isinstance(event, EventRecord)], ['101', '202', '303'])
+        self.assertEqual(self.extract_flights(), ['303', '404', '505'])
+
+    def test_pipeline_commits_only_fully_loaded_streams(self):
+        """Test that a loader returning early, in either pipeline mode, leaves the watermark alone."""
+        self.write_flights([101, 202, 303])
+        for concurrent in (False, True):
+            with self.subTest(concurrent=concurrent):
+                extractor = CsvExtractor(self.flights_file, source='csv', incremental=True,
+                                         watermarks=self.watermarks)
+                Pipeline(extractor, PassThroughTransformer(), FirstRecordLoader(), concurrent=concurrent).run()
+                self.assertIsNone(self.watermarks.get(extractor.source_id))
+
+        self.assertEqual(self.extract_flights(), ['101', '202', '303'])
+
+    def test_sqlite_reads_rows_past_watermark(self):
+        """Test that SQLite extraction resumes after the last committed rowid."""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("CREATE TABLE events (event_id TEXT, event_type TEXT, timestamp TEXT)")
+            conn.execute("INSERT INTO events VALUES ('1', 'test_event', '2025-09-09T10:00:00')")
+
+        def extract() -> list[str]:
+            extractor = SqliteExtractor(self.db_path, 'events', source='sqlite', incremental=True,
+                                        watermarks=self.watermarks)
+            events = list(extractor.extract())
+            extractor.commit()
+            return [event.event_id for event in events]
+
+        self.assertEqual(extract(), ['1'])
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("INSERT INTO events VALUES ('2', 'another_event', '2025-09-09T11:00:00')")
+        self.assertEqual(extract(), ['2'])
+        self.assertEqual(extract(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()